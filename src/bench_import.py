@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+"""File Information
+@file_name: bench_import.py
+@author: Dylan "dyl-m" Monfret
+Import time regression benchmark ('python -X importtime'): cold import of a module must stay fast and must not load
+heavy dependencies, which are only needed once work starts.
+Usage: 'python bench_import.py [--module youtube_req] [--runs 5] [--max-ms 150]'.
+"""
+
+"GLOBAL"
+
+HEAVY_MODULES = ['bs4', 'github', 'google.auth', 'google_auth_oauthlib', 'googleapiclient.discovery',
+                 'googleapiclient.errors', 'isodate', 'pandas', 'requests', 'tqdm']  # Loaded on first use only
+
+"FUNCTIONS"
+
+
+def import_time(module: str):
+    """Import a module in a new interpreter with '-X importtime'
+    :param module: module name
+    :return: cumulative import time of the module (microseconds) and {imported module: cumulative time}.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True)
+    timings = {}
+
+    for line in result.stderr.splitlines():  # 'import time: self [us] | cumulative | imported package'
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)', line)
+        if match:
+            timings[match.group(4)] = int(match.group(2))
+
+    return timings[module], timings
+
+
+def run_benchmark(module: str, runs: int = 5, max_ms: float = None):
+    """Measure cold import time of a module and check heavy dependencies are not imported
+    :param module: module name
+    :param runs: number of measured imports
+    :param max_ms: maximum median import time allowed in milliseconds (no limit if None)
+    :return: True if the module passes the checks.
+    """
+    measures = [import_time(module) for _ in range(runs)]
+    median_ms = statistics.median(total for total, _ in measures) / 1000
+    _, timings = measures[-1]
+    heaviest = sorted(timings.items(), key=lambda item: item[1], reverse=True)[1:11]
+    loaded = [heavy for heavy in HEAVY_MODULES if heavy in timings]
+
+    print(f'{module}: {median_ms:.1f} ms (median of {runs} cold imports)')
+    for name, cumulative in heaviest:
+        print(f'    {name:<40}{cumulative / 1000:>8.1f} ms')
+
+    passed = True
+
+    if loaded:
+        print(f'FAILED: heavy dependencies imported eagerly: {", ".join(loaded)}')
+        passed = False
+
+    if max_ms is not None and median_ms > max_ms:
+        print(f'FAILED: import time above {max_ms} ms')
+        passed = False
+
+    return passed
+
+
+"MAIN"
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import time regression benchmark.')
+    parser.add_argument('--module', default='youtube_req', help='module to import')
+    parser.add_argument('--runs', type=int, default=5, help='number of measured imports')
+    parser.add_argument('--max-ms', type=float, default=None, help='maximum median import time (ms)')
+    args = parser.parse_args()
+
+    if not run_benchmark(args.module, runs=args.runs, max_ms=args.max_ms):
+        sys.exit(1)
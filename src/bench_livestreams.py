@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import bs4
+import json
+import os
+import random
+import requests
+import statistics
+import sys
+import time
+import tracemalloc
+
+import youtube_req
+
+"""File Information
+@file_name: bench_livestreams.py
+@author: Dylan "dyl-m" Monfret
+Benchmark of channel page parsing: legacy BeautifulSoup parse vs. 'youtube_req.extract_featured_videos', both parsers
+having to return the same featured videos on every page.
+Usage: 'python bench_livestreams.py --record' once to save channel pages, then 'python bench_livestreams.py'.
+"""
+
+"GLOBAL"
+
+FIXTURES_DIR = '../data/fixtures/channel_pages'
+
+"FUNCTIONS"
+
+
+def legacy_featured_videos(page: bytes):
+    """Former 'find_livestreams' parsing: whole page parsed with BeautifulSoup then whole 'ytInitialData' decoded
+    :param page: channel page content as bytes
+    :return: list of featured video IDs.
+    """
+    soup = bs4.BeautifulSoup(page.decode('utf8'), 'html.parser')
+    js_scripts = [script for script in soup.find_all('script') if 'sectionListRenderer' in str(script)][0].text
+    sections_as_dict = json.loads(js_scripts.replace('var ytInitialData = ', '')[:-1])
+    tab = sections_as_dict['contents']['twoColumnBrowseResultsRenderer']['tabs'][0]['tabRenderer']['content']
+
+    try:
+        section = tab['sectionListRenderer']['contents'][0]['itemSectionRenderer']['contents'][0]
+        if 'channelFeaturedContentRenderer' in section.keys():
+            return [item['videoRenderer']['videoId'] for item in section['channelFeaturedContentRenderer']['items']]
+
+    except KeyError:
+        return []
+
+    return []
+
+
+def record_pages(channel_list: list, fixtures_dir: str = FIXTURES_DIR):
+    """Save channel pages as fixtures
+    :param channel_list: list of YouTube channel IDs
+    :param fixtures_dir: directory where pages are saved.
+    """
+    os.makedirs(fixtures_dir, exist_ok=True)
+
+    with youtube_req.create_session() as session:
+        for channel_id in channel_list:
+            cookies = {'CONSENT': f'YES+cb.20210328-17-p0.en-GB+FX+{random.randint(100, 999)}'}
+            try:
+                page = session.get(f'https://www.youtube.com/channel/{channel_id}', cookies=cookies, timeout=(5, 5))
+            except requests.exceptions.RequestException as error:
+                print(f'{channel_id}: {error}')
+                continue
+
+            with open(f'{fixtures_dir}/{channel_id}.html', 'wb') as page_file:
+                page_file.write(page.content)
+
+
+def measure(parser, page: bytes, repeat: int):
+    """Measure parsing time and peak memory of a parser on a page
+    :param parser: parsing function
+    :param page: channel page content as bytes
+    :param repeat: number of timed runs
+    :return: median time in milliseconds, peak memory in KiB and parser result.
+    """
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser(page)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        result = parser(page)
+    except (IndexError, KeyError, ValueError):
+        result = None
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return statistics.median(timings) * 1000, peak / 1024, result
+
+
+def run_benchmark(fixtures_dir: str = FIXTURES_DIR, repeat: int = 5):
+    """Compare both parsers on every saved page and print results
+    :param fixtures_dir: directory containing saved pages
+    :param repeat: number of timed runs per page and per parser
+    :return mismatches: list of pages where parsers results differ.
+    """
+    pages = sorted(file for file in os.listdir(fixtures_dir) if file.endswith('.html'))
+    totals = {'legacy': [0, 0], 'fast': [0, 0]}
+    mismatches = []
+
+    print(f'{"page":<30}{"size (KiB)":>12}{"legacy (ms)":>14}{"fast (ms)":>12}{"legacy (KiB)":>15}{"fast (KiB)":>13}')
+
+    for page_name in pages:
+        with open(f'{fixtures_dir}/{page_name}', 'rb') as page_file:
+            page = page_file.read()
+
+        try:
+            legacy_ms, legacy_kib, legacy_res = measure(legacy_featured_videos, page, repeat)
+        except (IndexError, KeyError, ValueError):  # Page without channel content
+            continue
+
+        fast_ms, fast_kib, fast_res = measure(youtube_req.extract_featured_videos, page, repeat)
+        totals['legacy'] = [totals['legacy'][0] + legacy_ms, max(totals['legacy'][1], legacy_kib)]
+        totals['fast'] = [totals['fast'][0] + fast_ms, max(totals['fast'][1], fast_kib)]
+        mismatch = '' if legacy_res == fast_res else f'  MISMATCH (legacy: {legacy_res}, fast: {fast_res})'
+
+        if mismatch:
+            mismatches.append(page_name)
+
+        print(f'{page_name[:-5]:<30}{len(page) / 1024:>12.0f}{legacy_ms:>14.2f}{fast_ms:>12.2f}'
+              f'{legacy_kib:>15.0f}{fast_kib:>13.0f}{mismatch}')
+
+    if pages:
+        print(f'{"TOTAL (time) / MAX (memory)":<42}{totals["legacy"][0]:>14.2f}{totals["fast"][0]:>12.2f}'
+              f'{totals["legacy"][1]:>15.0f}{totals["fast"][1]:>13.0f}')
+
+    if mismatches:
+        print(f'FAILED: parsers results differ on {len(mismatches)} page(s): {", ".join(mismatches)}')
+
+    return mismatches
+
+
+"MAIN"
+
+if __name__ == '__main__':
+    parser_args = argparse.ArgumentParser(description='Channel page parsing benchmark.')
+    parser_args.add_argument('--record', action='store_true', help='save channel pages as fixtures first')
+    parser_args.add_argument('--repeat', type=int, default=5, help='timed runs per page and per parser')
+    args = parser_args.parse_args()
+
+    if args.record:
+        with open('../data/pocket_tube.json', 'r', encoding='utf8') as pt_file:
+            music_channels = json.load(pt_file)['MUSIQUE']
+
+        record_pages(music_channels + youtube_req.ADD_ON['certified'])
+
+    if run_benchmark(repeat=args.repeat):
+        sys.exit(1)
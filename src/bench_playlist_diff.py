@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import datetime as dt
+import importlib
+import json
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+"""File Information
+@file_name: bench_playlist_diff.py
+@author: Dylan "dyl-m" Monfret
+Benchmark of the mixes playlist update plan: legacy pandas merge pipeline vs. 'playlist_diff' engine, each one in a
+new interpreter (import time, plan time and peak RSS), on synthetic playlists.
+Usage: 'python bench_playlist_diff.py [--playlist-size 60] [--candidates 30] [--scales 1 100]'.
+"""
+
+"GLOBAL"
+
+NOW = dt.datetime(2024, 1, 8, tzinfo=dt.timezone.utc)
+
+"FUNCTIONS"
+
+
+def make_data(playlist_size: int, n_candidates: int, seed: int = 0):
+    """Generate a playlist, candidates and API results
+    :param playlist_size: number of videos in the playlist
+    :param n_candidates: number of videos to potentially add
+    :param seed: random seed
+    :return: playlist items, candidates, {video ID: stats} and {channel ID: subscribers}.
+    """
+    rng = random.Random(seed)
+    channels = [f'UC{i:022d}' for i in range(max(1, playlist_size // 4))]
+    in_playlist = [{'video_id': f'v{i:010d}', 'item_id': f'item{i}',
+                    'release_date': NOW - dt.timedelta(hours=rng.randint(0, 14 * 24)),
+                    'status': rng.choice(['public'] * 19 + ['private']), 'channel_id': rng.choice(channels),
+                    'channel_name': 'name'} for i in range(playlist_size)]
+    candidates = [{'video_id': f'v{i:010d}', 'channel_id': rng.choice(channels)}  # A few already in playlist
+                  for i in range(playlist_size - n_candidates // 10, playlist_size + n_candidates)]
+    stats = {video['video_id']: {'video_id': video['video_id'], 'views': str(rng.randint(0, 10 ** 6)), 'likes': '0',
+                                 'comments': '0', 'duration': rng.randint(60, 7200),
+                                 'live_status': rng.choice(['none'] * 9 + ['upcoming'])}
+             for video in in_playlist + candidates}
+    subscribers = {channel_id: str(rng.randint(0, 10 ** 7)) for channel_id in channels}
+    return in_playlist, candidates, stats, subscribers
+
+
+def legacy_plan(pd, in_playlist: list, candidates: list, stats: dict, subscribers: dict, min_duration: int = 10):
+    """Former 'update_playlist' pipeline (mixes playlist)
+    :param pd: pandas module
+    :param in_playlist: playlist items
+    :param candidates: videos to potentially add
+    :param stats: {video ID: stats}
+    :param subscribers: {channel ID: subscribers}
+    :param min_duration: minimal video duration (minutes)
+    :return: video IDs to add, item IDs to delete and number of history records.
+    """
+    in_playlist = pd.DataFrame(in_playlist)
+    video_stats = pd.DataFrame([stats[video_id] for video_id in in_playlist.video_id])
+    channel_stats = pd.DataFrame([{'channel_id': channel_id, 'subscribers': subscribers[channel_id]}
+                                  for channel_id in in_playlist.channel_id.dropna().unique()])
+    in_playlist = in_playlist.merge(channel_stats, how='outer').merge(video_stats, how='outer').drop_duplicates()
+
+    del_cond = (in_playlist.status == 'private') | (in_playlist.release_date < NOW - dt.timedelta(days=7))
+    to_del = in_playlist.loc[del_cond]
+    records = to_del.loc[to_del.channel_id.notna()].to_dict('records')
+
+    to_add = pd.DataFrame(candidates)
+    to_add = to_add.merge(pd.DataFrame([stats[video['video_id']] for video in candidates]))
+    to_add = to_add.loc[(to_add.duration >= min_duration * 60) & (to_add.live_status != 'upcoming')]
+    to_add = to_add.loc[~to_add.video_id.isin(in_playlist.video_id)]
+
+    return to_add.video_id.tolist(), to_del.item_id.tolist(), len(records)
+
+
+def diff_plan(playlist_diff, in_playlist: list, candidates: list, stats: dict, subscribers: dict,
+              min_duration: int = 10):
+    """'update_playlist' pipeline with the diff engine (mixes playlist)
+    :param playlist_diff: playlist_diff module
+    :param in_playlist: playlist items
+    :param candidates: videos to potentially add
+    :param stats: {video ID: stats}
+    :param subscribers: {channel ID: subscribers}
+    :param min_duration: minimal video duration (minutes)
+    :return: video IDs to add, item IDs to delete and number of history records.
+    """
+    items = playlist_diff.to_items(in_playlist)
+    to_del = playlist_diff.expired_items(items, NOW - dt.timedelta(days=7))
+    records = playlist_diff.history_records([item for item in to_del if item.channel_id is not None], subscribers,
+                                            stats)
+    to_add = playlist_diff.new_videos(candidates, items, stats=stats, min_duration=min_duration)
+
+    return to_add, [item.item_id for item in to_del], len(records)
+
+
+def run_child(engine: str, playlist_size: int, n_candidates: int, repeat: int):
+    """Measure one engine in the current interpreter and print results as JSON
+    :param engine: 'legacy' or 'diff'
+    :param playlist_size: number of videos in the playlist
+    :param n_candidates: number of videos to potentially add
+    :param repeat: number of timed runs.
+    """
+    data = make_data(playlist_size, n_candidates)
+    start = time.perf_counter()
+    module = importlib.import_module('pandas' if engine == 'legacy' else 'playlist_diff')
+    import_ms = (time.perf_counter() - start) * 1000
+    plan = legacy_plan if engine == 'legacy' else diff_plan
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = plan(module, *data)
+        timings.append(time.perf_counter() - start)
+
+    print(json.dumps({'import_ms': import_ms, 'plan_ms': statistics.median(timings) * 1000,
+                      'rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # KiB on Linux
+                      'result': [sorted(result[0]), sorted(result[1]), result[2]]}))
+
+
+def run_benchmark(playlist_size: int, n_candidates: int, scales: list, repeat: int = 5):
+    """Compare both engines at several scales and print results
+    :param playlist_size: number of videos in the playlist at scale 1
+    :param n_candidates: number of videos to potentially add at scale 1
+    :param scales: list of scale factors
+    :param repeat: number of timed runs per engine and per scale.
+    """
+    print(f'{"scale":<8}{"videos":>8}{"engine":>8}{"import (ms)":>13}{"plan (ms)":>11}{"total (ms)":>12}'
+          f'{"peak RSS (MiB)":>16}')
+
+    for scale in scales:
+        results = {}
+
+        for engine in ('legacy', 'diff'):
+            command = [sys.executable, __file__, '--child', engine, '--playlist-size', str(playlist_size * scale),
+                       '--candidates', str(n_candidates * scale), '--repeat', str(repeat)]
+            results[engine] = json.loads(subprocess.run(command, capture_output=True, text=True, check=True).stdout)
+            res = results[engine]
+            print(f'{scale:<8}{playlist_size * scale:>8}{engine:>8}{res["import_ms"]:>13.1f}{res["plan_ms"]:>11.2f}'
+                  f'{res["import_ms"] + res["plan_ms"]:>12.1f}{res["rss_mib"]:>16.1f}')
+
+        if results['legacy']['result'] != results['diff']['result']:
+            print('MISMATCH between legacy and diff plans')
+
+
+"MAIN"
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Playlist update plan benchmark.')
+    parser.add_argument('--playlist-size', type=int, default=60, help='videos in the playlist at scale 1')
+    parser.add_argument('--candidates', type=int, default=30, help='videos to potentially add at scale 1')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 100], help='scale factors')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per engine and per scale')
+    parser.add_argument('--child', choices=['legacy', 'diff'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.playlist_size, args.candidates, args.repeat)
+    else:
+        run_benchmark(args.playlist_size, args.candidates, args.scales, repeat=args.repeat)
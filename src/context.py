@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+import dataclasses
+import datetime as dt
+import importlib.util
+import json
+import logging
+import logging.handlers
+import os
+import pathlib
+import re
+import sys
+
+from run_log import RunLog
+
+"""File Information
+@file_name: context.py
+@author: Dylan "dyl-m" Monfret
+Run context (configuration, clock, logging) created explicitly by entry points, and lazy import of heavy dependencies.
+"""
+
+"GLOBAL"
+
+# Repository root, whatever the current directory is ('AYP_ROOT_DIR' environment variable to run on another data set)
+ROOT_DIR = pathlib.Path(os.environ.get('AYP_ROOT_DIR') or pathlib.Path(__file__).resolve().parent.parent)
+
+"FUNCTIONS"
+
+
+def lazy_import(name: str):
+    """Import a module on first attribute access (see 'importlib.util.LazyLoader')
+    :param name: module name
+    :return module: module object, loaded when one of its attributes is used.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)  # Parent packages (if any) are imported here
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    parent, _, child = name.rpartition('.')
+    if parent:  # Bind submodule to its parent package, as the import statement does
+        setattr(sys.modules[parent], child, module)
+
+    return module
+
+
+def last_exe_date(path: str):
+    """Extract last execution datetime from a log file (supposing first line is containing the right datetime).
+    :param path: last execution log file path
+    :return date: last execution date.
+    """
+    with open(path, 'r', encoding='utf8') as log_file:
+        first_log = log_file.readline()  # Get first log
+
+    d_str = re.search(r'(\d{4}(-\d{2}){2})\s(\d{2}:?){3}.[\d:]+', first_log).group()  # Extract date
+    date = dt.datetime.strptime(d_str, '%Y-%m-%d %H:%M:%S%z')  # Parse to datetime object
+    return date
+
+
+def create_formatter():
+    """Create the formatter shared by history loggers
+    :return: logging.Formatter object.
+    """
+    return logging.Formatter(fmt='%(asctime)s [%(levelname)s] - %(message)s', datefmt='%Y-%m-%d %H:%M:%S%z')
+
+
+"CLASSES"
+
+
+@dataclasses.dataclass
+class RunContext:
+    """Everything a run depends on: repository location, reference date, add-on configuration and last execution."""
+
+    root_dir: pathlib.Path
+    now: dt.datetime
+    add_on: dict
+    last_exe: dt.datetime
+
+    @classmethod
+    def create(cls, root_dir: pathlib.Path = ROOT_DIR, now: dt.datetime = None, add_on: dict = None):
+        """Load configuration and freeze the run clock
+        :param root_dir: repository root directory
+        :param now: reference date of the run (current local time if None)
+        :param add_on: add-on configuration ('data/add-on.json' is read if None)
+        :return: RunContext object.
+        """
+        root_dir = pathlib.Path(root_dir)
+
+        if now is None:
+            import tzlocal  # Only needed to freeze the clock
+            now = dt.datetime.now(tz=tzlocal.get_localzone())
+
+        if add_on is None:
+            with open(root_dir / 'data' / 'add-on.json', 'r', encoding='utf8') as add_on_file:
+                add_on = json.load(add_on_file)
+
+        last_run = RunLog(log_dir=(root_dir / 'log').as_posix()).last_run()  # Last successful run from the index
+
+        if last_run:
+            last_exe = dt.datetime.fromisoformat(last_run['start'])
+        else:  # No run recorded in the index yet
+            last_exe = last_exe_date(root_dir / 'log' / 'last_exe.log')
+
+        return cls(root_dir=root_dir, now=now, add_on=add_on, last_exe=last_exe)
+
+    def path(self, *parts: str):
+        """Build a path from the repository root
+        :param parts: path components (e.g. 'data', 'quota.json')
+        :return: path as a string.
+        """
+        return self.root_dir.joinpath(*parts).as_posix()
+
+    def attach_log(self, logger: logging.Logger, file_name: str = 'history.log'):
+        """Attach the history file handler to a logger (once)
+        :param logger: logger to attach the handler to
+        :param file_name: log file name in 'log' directory.
+        """
+        path = os.path.abspath(self.path('log', file_name))
+
+        if any(getattr(handler, 'baseFilename', None) == path for handler in logger.handlers):
+            return
+
+        file_handler = logging.handlers.WatchedFileHandler(filename=path, encoding='utf8')  # Reopened if rotated
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.setFormatter(create_formatter())
+        logger.addHandler(file_handler)
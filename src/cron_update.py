@@ -1,77 +1,73 @@
 # -*- coding: utf-8 -*-
 
 import datetime as dt
-import pandas as pd
+import numpy as np
 import re
-import tzlocal
+
+from release_histogram import ReleaseHistogram
 
 """File Information
 @file_name: cron_update.py
 @author: Dylan "dyl-m" Monfret
-Script to adjust playlist update
+Script to adjust playlist update: runs are scheduled right after the hours (UTC) where new videos are usually released,
+according to the weekday x hour release histogram of the last weeks.
 """
 
+"PARAMETERS"
+
+WINDOW_WEEKS = 5  # Number of complete weeks averaged
+HISTORY_LAG = 7  # Days before a release is written in history (videos are removed from the mixes playlist after 7 days)
+MAX_RUNS = 6  # Maximum number of runs per day, midnight run excluded
+
 "FUNCTIONS"
 
 
-def get_weekday(date: dt.datetime):
-    """Get day of the week out of a datetime
-    :param date: date as datetime.datetime object.
-    :return: weekday label.
+def expected_releases(histogram: ReleaseHistogram, now: dt.datetime, weeks: int = WINDOW_WEEKS):
+    """Average the release histogram over the trailing window
+    :param histogram: release histogram
+    :param now: reference date
+    :param weeks: number of complete weeks averaged
+    :return: 7 x 24 array of expected releases (Monday first, UTC hours).
+    """
+    return np.asarray(histogram.window(now, weeks=weeks, lag=HISTORY_LAG), dtype=float).mean(axis=0)
+
+
+def run_hours(day_releases: np.ndarray, max_runs: int = MAX_RUNS):
+    """Place the runs of a day so that each one catches the same share of its expected releases: the k-th run of n
+    is scheduled right after the hour where cumulative releases reach k / n
+    :param day_releases: 24 expected releases (one per hour)
+    :param max_runs: maximum number of runs
+    :return: sorted list of run hours (midnight run excluded).
     """
-    weekday_list = ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN']
-    week_day_num = dt.datetime.isoweekday(date)
-    return weekday_list[week_day_num - 1]
+    total = day_releases.sum()
+    n_runs = int(min(max_runs, np.count_nonzero(day_releases), round(total)))
+
+    if n_runs == 0:
+        return []
+
+    cumulative = np.cumsum(day_releases) / total
+    hours = np.searchsorted(cumulative, np.arange(1, n_runs + 1) / n_runs - 1e-9) + 1  # Right after release hour
+    return sorted(set((hours % 24).tolist()) - {0})
 
 
-def make_update_pattern(n_update: int):
+def make_update_pattern(hours: list):
     """Create update pattern in CRON format
-    :param n_update: Number of updates desired
+    :param hours: run hours, midnight run excluded
     :return up_pattern: pattern in CRON format.
     """
-    if n_update == 0:
-        return '0 0 * * '
-
-    n_update = min(n_update, 6)
-    step = int(12 / n_update)
-    up_hours = list(range(12, 24, step))[-n_update:]
-    up_pattern = '0 0,' + ','.join(map(str, up_hours)) + ' * *'
-    return up_pattern
+    return '0 ' + ','.join(map(str, [0] + hours)) + ' * *'
 
 
 "MAIN"
 
 if __name__ == '__main__':
-    # Data import and reformat
-    data = pd.read_csv('../data/mix_history.csv', encoding='utf-8', low_memory=False).loc[:, ['video_id',
-                                                                                              'release_date']]
-    weekday_categories = ['SUN', 'MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT']
-
-    data.release_date = pd.to_datetime(data.loc[:, 'release_date'])
-    data['release_week'] = data.loc[:, 'release_date'].dt.isocalendar().week
-    data['release_weekday'] = data.loc[:, 'release_date'].apply(get_weekday)
-    data.release_weekday = pd.Categorical(data.release_weekday, categories=weekday_categories)
-    data.sort_values('release_weekday', inplace=True)
-
-    # Get date 5 weeks ago and filter out 5 weeks old data
-    five_weeks_ago = dt.datetime.now(tz=tzlocal.get_localzone()) - dt.timedelta(weeks=5)
-    data = data.loc[data.release_date > five_weeks_ago]
-
-    # Get average update per weekday
-    data_agg = data.groupby(['release_weekday', 'release_week'], as_index=False) \
-                   .count() \
-                   .loc[:, ['release_weekday', 'video_id']] \
-        .groupby(['release_weekday'], as_index=False) \
-        .mean() \
-        .rename(columns={'video_id': 'avg_amount'})
-
-    data_agg.avg_amount = data_agg.avg_amount.round().astype(int)
-    data_agg['day_index'] = data_agg.avg_amount.index
-    data_agg = data_agg.to_dict('records')
-
-    # Build schedules in cron format
-    new_schedules = [f'        -   cron: "{make_update_pattern(record["avg_amount"])} {record["day_index"]}"'
-                     for record in data_agg]
+    release_histogram = ReleaseHistogram()
+    expected = expected_releases(release_histogram, now=dt.datetime.now(tz=dt.timezone.utc))
+    release_histogram.save()  # Histogram built from history on first use
+
+    # Build schedules in cron format, Sunday first (cron day 0)
+    new_schedules = [f'        -   cron: "{make_update_pattern(run_hours(expected[(cron_day - 1) % 7]))} {cron_day}"'
+                     for cron_day in range(7)]
 
     new_schedules_str = '\n'.join(new_schedules)
 
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+
+import datetime as dt
+import hmac
+import http.server
+import json
+import os
+import re
+import secrets
+import threading
+
+"""File Information
+@file_name: daemon.py
+@author: Dylan "dyl-m" Monfret
+Resident mode of 'main.py': update cycles scheduled from the cron patterns of the update workflow, configuration files
+reloaded when they change on disk and a local control endpoint (status, cycle trigger, stop), authenticated by a
+per-process token.
+"""
+
+"GLOBAL"
+
+CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]  # Minute, hour, day of month, month, day of week (0: Sunday)
+CRON_PATTERN = re.compile(r'^\s*-\s*cron:\s*["\']([^"\']+)["\']', flags=re.MULTILINE)
+TOKEN_HEADER = 'X-Daemon-Token'  # Control endpoint requests must carry the token of the running daemon
+
+"FUNCTIONS"
+
+
+def parse_field(field: str, low: int, high: int):
+    """Parse a cron field ('*', values, ranges and steps, comma separated)
+    :param field: cron field (e.g. '0,12-18/2')
+    :param low: lowest value of the field
+    :param high: highest value of the field
+    :return: set of values matched by the field.
+    """
+    values = set()
+
+    for part in field.split(','):
+        span, _, step = part.partition('/')
+
+        if span == '*':
+            start, end = low, high
+        else:
+            start, _, end = span.partition('-')
+            start = int(start)
+            end = int(end) if end else (high if step else start)
+
+        values.update(range(start, end + 1, int(step or 1)))
+
+    if not values or min(values) < low or max(values) > high:
+        raise ValueError(f'Invalid cron field: {field}')
+
+    return values
+
+
+def parse_cron(pattern: str):
+    """Parse a cron pattern
+    :param pattern: cron pattern with 5 fields (e.g. '0 0,12 * * 1')
+    :return: (minutes, hours, days, months, weekdays, restricted days) - sets of values, then whether both day fields
+    are restricted (a day matching either of them is then scheduled, as cron does).
+    """
+    fields = pattern.split()
+
+    if len(fields) != 5:
+        raise ValueError(f'Invalid cron pattern: {pattern}')
+
+    sets = [parse_field(field, low, high) for field, (low, high) in zip(fields, CRON_FIELDS)]
+    return (*sets, fields[2] != '*' and fields[4] != '*')
+
+
+def read_schedules(content: str):
+    """Extract cron patterns from a GitHub workflow file
+    :param content: workflow file content
+    :return: list of parsed cron patterns (see 'parse_cron').
+    """
+    return [parse_cron(pattern) for pattern in CRON_PATTERN.findall(content)]
+
+
+def write_token(path: str):
+    """Generate the control endpoint token of the process and write it to a file only readable by its owner
+    :param path: token file path
+    :return token: token as a string.
+    """
+    token = secrets.token_urlsafe(32)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    if os.path.exists(path):  # Permissions are only set on creation
+        os.remove(path)
+
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'w', encoding='utf8') as token_file:
+        token_file.write(token)
+
+    return token
+
+
+def next_run(schedules: list, after: dt.datetime):
+    """Find the next scheduled date (cron patterns of GitHub workflows are in UTC)
+    :param schedules: list of parsed cron patterns
+    :param after: reference date
+    :return: next scheduled date (UTC), None if there is no schedule.
+    """
+    after = after.astimezone(dt.timezone.utc)
+    hour_start = after.replace(minute=0, second=0, microsecond=0)
+
+    for hour in range(366 * 24):  # Every pattern matches at least once a year, except impossible dates (e.g. 30/02)
+        candidate = hour_start + dt.timedelta(hours=hour)
+        weekday = (candidate.weekday() + 1) % 7  # Cron weekdays start on Sunday
+
+        for minutes, hours, days, months, weekdays, both_days in schedules:
+            in_days, in_weekdays = candidate.day in days, weekday in weekdays
+            day_match = (in_days or in_weekdays) if both_days else (in_days and in_weekdays)
+
+            if candidate.month not in months or candidate.hour not in hours or not day_match:
+                continue
+
+            for minute in sorted(minutes):
+                if candidate.replace(minute=minute) > after:
+                    return candidate.replace(minute=minute)
+
+    return None
+
+
+"CLASSES"
+
+
+class ConfigFiles:
+    """Configuration files kept in memory, each one being parsed again only when it changed on disk."""
+
+    def __init__(self, files: dict):
+        """Register configuration files (loaded on first access)
+        :param files: {name: (path, parser)}, parser being a function of the file content (e.g. 'json.loads').
+        """
+        self.files = files
+        self._loaded = {}  # {name: (modification signature, parsed content)}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def signature(path: str):
+        """Get the modification signature of a file
+        :param path: file path
+        :return: (modification time in nanoseconds, size).
+        """
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, name: str):
+        """Get a configuration file content, parsed again if the file changed since it was last loaded (previous
+        content being kept if the file is now invalid)
+        :param name: configuration name
+        :return: parsed content.
+        """
+        try:
+            return self.refresh(name)[1]
+
+        except (OSError, ValueError):  # File being written or invalid
+            with self._lock:
+                loaded = self._loaded.get(name)
+
+            if loaded is None:
+                raise
+
+            return loaded[1]
+
+    def refresh(self, name: str):
+        """Load a configuration file if it changed since it was last loaded
+        :param name: configuration name
+        :return: (True if the file has been (re)loaded, parsed content).
+        """
+        path, parser = self.files[name]
+        signature = self.signature(path)
+
+        with self._lock:
+            loaded = self._loaded.get(name)
+
+            if loaded is not None and loaded[0] == signature:
+                return False, loaded[1]
+
+        with open(path, 'r', encoding='utf8') as config_file:
+            content = parser(config_file.read())
+
+        with self._lock:
+            self._loaded[name] = (signature, content)
+
+        return True, content
+
+    def reload(self):
+        """Reload every configuration file which changed on disk (previous content being kept if a file is invalid)
+        :return: list of reloaded configuration names.
+        """
+        reloaded = []
+
+        for name in self.files:
+            try:
+                if self.refresh(name)[0]:
+                    reloaded.append(name)
+
+            except (OSError, ValueError):  # File being written or invalid, loaded again on next change
+                continue
+
+        return reloaded
+
+
+class Controller:
+    """Cycle triggers shared by the daemon loop and the control endpoint, with the daemon status."""
+
+    def __init__(self):
+        """Initialize the controller."""
+        self.status = {'state': 'starting', 'cycles': 0, 'last_cycle': None, 'next_cycle': None}
+        self._triggered = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def stopped(self):
+        """True once a stop has been requested."""
+        return self._stopped.is_set()
+
+    def trigger(self):
+        """Request a cycle as soon as possible."""
+        self._triggered.set()
+
+    def stop(self):
+        """Request the daemon to stop after the current cycle."""
+        self._stopped.set()
+        self._triggered.set()
+
+    def wait(self, until: dt.datetime = None):
+        """Wait for the next cycle
+        :param until: scheduled date of the next cycle (wait for a trigger only if None)
+        :return: 'triggered', 'scheduled' or 'stopped'.
+        """
+        self.update(state='idle', next_cycle=until.isoformat(timespec='seconds') if until else None)
+
+        while not self._stopped.is_set():
+            timeout = None if until is None else (until - dt.datetime.now(tz=dt.timezone.utc)).total_seconds()
+
+            if timeout is not None and timeout <= 0:
+                return 'scheduled'
+
+            if self._triggered.wait(timeout=None if timeout is None else min(timeout, 60)):  # Clock changes caught
+                self._triggered.clear()
+                return 'stopped' if self._stopped.is_set() else 'triggered'
+
+        return 'stopped'
+
+    def update(self, **status):
+        """Update the daemon status
+        :param status: status fields.
+        """
+        with self._lock:
+            self.status.update(status)
+
+    def snapshot(self):
+        """Get the daemon status
+        :return: status as a dictionary.
+        """
+        with self._lock:
+            return dict(self.status)
+
+
+class ControlHandler(http.server.BaseHTTPRequestHandler):
+    """HTTP handler of the control endpoint: 'GET /status', 'POST /run' and 'POST /stop'. Requests must carry the
+    daemon token in the 'X-Daemon-Token' header, and requests sent by browsers (with an 'Origin' header) are rejected
+    so that web pages can not trigger cycles."""
+
+    def log_message(self, *args):  # skipcq: PYL-W0221 - Silent server
+        pass
+
+    def _send(self, status: int, content: dict):
+        """Send a JSON response
+        :param status: HTTP status code
+        :param content: response content.
+        """
+        body = json.dumps(content).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        """Check the request origin and token, sending an error response if it is rejected
+        :return: True if the request is authorized.
+        """
+        if self.headers.get('Origin') is not None:  # Cross-site request sent by a web page
+            self._send(403, {'error': 'Browser requests are not allowed'})
+            return False
+
+        if not hmac.compare_digest(self.headers.get(TOKEN_HEADER, '').encode('utf8'), self.server.token.encode('utf8')):
+            self._send(401, {'error': f'Missing or invalid {TOKEN_HEADER} header'})
+            return False
+
+        return True
+
+    def do_GET(self):  # skipcq: PYL-C0103
+        if not self._authorized():
+            return
+
+        if self.path == '/status':
+            self._send(200, self.server.controller.snapshot())
+        else:
+            self._send(404, {'error': f'Unknown path: {self.path}'})
+
+    def do_POST(self):  # skipcq: PYL-C0103
+        if not self._authorized():
+            return
+
+        controller = self.server.controller
+
+        if self.path == '/run':
+            controller.trigger()
+            self._send(202, {'queued': True, **controller.snapshot()})
+        elif self.path == '/stop':
+            controller.stop()
+            self._send(202, {'stopping': True, **controller.snapshot()})
+        else:
+            self._send(404, {'error': f'Unknown path: {self.path}'})
+
+
+def serve(controller: Controller, token: str, port: int = 8766):
+    """Start the control endpoint in a background thread, on the loopback interface only
+    :param controller: daemon controller
+    :param token: token expected in the 'X-Daemon-Token' header of requests (see 'write_token')
+    :param port: port to listen to (a free port if 0)
+    :return server: http.server.ThreadingHTTPServer object ('server.server_port' being the port used).
+    """
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), ControlHandler)
+    server.daemon_threads = True
+    server.controller = controller
+    server.token = token
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
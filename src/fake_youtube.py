@@ -0,0 +1,655 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import collections
+import datetime as dt
+import email.parser
+import hashlib
+import http.server
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import xml.sax.saxutils
+
+import quota
+
+"""File Information
+@file_name: fake_youtube.py
+@author: Dylan "dyl-m" Monfret
+Local stand-in of the YouTube Data API (playlistItems list/insert/delete/update, videos.list, channels.list, batch
+requests) and of youtube.com channel pages and feeds, with quota accounting, pagination, ETags and injectable latency
+and errors.
+State is either generated or replayed from fixtures recorded with a real service.
+Usage:
+    'python fake_youtube.py serve [--fixtures ../data/fixtures/youtube.json] [--port 8765]' to run the server
+    'python fake_youtube.py record' to record fixtures with real credentials
+    'python fake_youtube.py bench [--runs 2] [--channels 300]' to measure full 'main.py' runs against the server.
+"""
+
+"GLOBAL"
+
+FIXTURES_PATH = '../data/fixtures/youtube.json'
+PAGE_SIZE = 5  # Default 'maxResults' of list methods
+LIVE_PARTS = ['snippet', 'contentDetails', 'statistics', 'liveStreamingDetails', 'status']
+
+"FUNCTIONS"
+
+
+def iso(date: dt.datetime):
+    """Format a date as the API does
+    :param date: a datetime.datetime object
+    :return: date as a string ('YYYY-MM-DDTHH:MM:SSZ').
+    """
+    return date.astimezone(dt.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def api_error(code: int, reason: str, message: str = ''):
+    """Build an API error response body
+    :param code: HTTP status code
+    :param reason: error reason (e.g. 'quotaExceeded')
+    :param message: error message
+    :return: error as a dictionary.
+    """
+    message = message or reason
+    return {'error': {'code': code, 'message': message,
+                      'errors': [{'message': message, 'domain': 'youtube', 'reason': reason}]}}
+
+
+def parse_query(query: str):
+    """Parse a query string, repeated parameters (e.g. 'part=snippet&part=status') being joined with commas
+    :param query: query string
+    :return: parameters as a dictionary.
+    """
+    return {name: ','.join(values) for name, values in urllib.parse.parse_qs(query).items()}
+
+
+def channel_page(video_ids: list):
+    """Build a channel page, featured videos being running livestreams (see 'youtube_req.extract_featured_videos')
+    :param video_ids: featured video IDs
+    :return: page content as bytes.
+    """
+    section = {'itemSectionRenderer': {'contents': [
+        {'channelFeaturedContentRenderer': {'items': [{'videoRenderer': {'videoId': vid}} for vid in video_ids]}}
+        if video_ids else {'channelVideoPlayerRenderer': {}}]}}
+    data = {'contents': {'twoColumnBrowseResultsRenderer': {'tabs': [
+        {'tabRenderer': {'content': {'sectionListRenderer': {'contents': [section]}}}},
+        {'tabRenderer': {'title': 'Videos'}}]}}}
+    payload = json.dumps(data, separators=(',', ':'))  # Compact, as served by youtube.com
+    return f'<html><body><script>var ytInitialData = {payload};</script></body></html>'.encode('utf8')
+
+
+def generate_state(n_channels: int = 300, videos_per_channel: int = 10, n_live: int = 10, seed: int = 0,
+                   now: dt.datetime = None):
+    """Generate a synthetic state: channels with their uploads, running livestreams and both user playlists
+    :param n_channels: number of channels
+    :param videos_per_channel: number of uploads per channel (released during the last two weeks)
+    :param n_live: number of running livestreams
+    :param seed: random seed
+    :param now: reference date (current UTC time if None)
+    :return: state as a dictionary ('videos', 'channels', 'playlists', 'live').
+    """
+    rng = random.Random(seed)
+    now = now or dt.datetime.now(tz=dt.timezone.utc)
+    state = {'videos': {}, 'channels': {}, 'playlists': {}, 'live': {}}
+
+    for c_idx in range(n_channels):
+        channel_id = f'UC{hashlib.sha1(f"c{seed}-{c_idx}".encode()).hexdigest()[:22]}'
+        title = f'Channel {c_idx}'
+        state['channels'][channel_id] = {'kind': 'youtube#channel', 'id': channel_id, 'snippet': {'title': title},
+                                         'statistics': {'subscriberCount': str(rng.randint(100, 10 ** 7))}}
+        uploads = []
+
+        for v_idx in range(videos_per_channel):
+            video_id = hashlib.sha1(f'v{seed}-{c_idx}-{v_idx}'.encode()).hexdigest()[:11]
+            published = now - dt.timedelta(minutes=rng.randint(0, 14 * 24 * 60))
+            state['videos'][video_id] = {
+                'kind': 'youtube#video', 'id': video_id,
+                'snippet': {'publishedAt': iso(published), 'channelId': channel_id, 'channelTitle': title,
+                            'title': f'Video {video_id}',
+                            'liveBroadcastContent': rng.choice(['none'] * 19 + ['upcoming'])},
+                'contentDetails': {'duration': f'PT{rng.randint(1, 180)}M{rng.randint(0, 59)}S'},
+                'statistics': {'viewCount': str(rng.randint(0, 10 ** 6)), 'likeCount': str(rng.randint(0, 10 ** 4)),
+                               'commentCount': str(rng.randint(0, 10 ** 3))},
+                'status': {'privacyStatus': 'public'}}
+            uploads.append(video_id)
+
+        uploads.sort(key=lambda vid: state['videos'][vid]['snippet']['publishedAt'], reverse=True)  # Newest first
+        state['playlists'][f'UU{channel_id[2:]}'] = uploads
+
+    channel_ids = list(state['channels'])
+
+    for l_idx in range(n_live):
+        channel_id = rng.choice(channel_ids)
+        video_id = hashlib.sha1(f'l{seed}-{l_idx}'.encode()).hexdigest()[:11]
+        state['videos'][video_id] = {
+            'kind': 'youtube#video', 'id': video_id,
+            'snippet': {'publishedAt': iso(now - dt.timedelta(hours=l_idx + 1)), 'channelId': channel_id,
+                        'channelTitle': state['channels'][channel_id]['snippet']['title'],
+                        'title': f'Live {video_id}', 'liveBroadcastContent': 'live'},
+            'contentDetails': {'duration': 'P0D'}, 'statistics': {'viewCount': str(rng.randint(0, 10 ** 5))},
+            'liveStreamingDetails': {'actualStartTime': iso(now - dt.timedelta(hours=l_idx + 1)),
+                                     'concurrentViewers': str(rng.randint(0, 5000))},
+            'status': {'privacyStatus': 'public'}}
+        state['live'].setdefault(channel_id, []).append(video_id)
+
+    state['playlists']['mixes'] = []
+    state['playlists']['lives'] = []
+    return state
+
+
+"CLASSES"
+
+
+class FakeYouTube:
+    """In-memory YouTube: resources, playlists contents, quota accounting, latency and errors injection."""
+
+    def __init__(self, state: dict, latency: float = 0.0, error_rate: float = 0.0, daily_quota: int = 10000,
+                 seed: int = 0):
+        """Load a state
+        :param state: state as a dictionary ('videos', 'channels', 'playlists', 'live'), playlists being lists of
+        video IDs
+        :param latency: delay (seconds) added to each HTTP round trip
+        :param error_rate: probability of a 'backendError' for each API request
+        :param daily_quota: quota units available, 'quotaExceeded' errors are returned beyond
+        :param seed: random seed of errors injection.
+        """
+        self.videos = state['videos']
+        self.channels = state['channels']
+        self.live = state.get('live', {})
+        self.latency = latency
+        self.error_rate = error_rate
+        self.daily_quota = daily_quota
+        self.units = 0
+        self.calls = collections.Counter()
+        self.round_trips = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next_item = 0
+        self.playlists = {playlist_id: [self._new_item(playlist_id, video_id) for video_id in video_ids]
+                          for playlist_id, video_ids in state['playlists'].items()}
+
+    def _new_item(self, playlist_id: str, video_id: str):
+        """Create a playlist item
+        :param playlist_id: playlist ID
+        :param video_id: video ID
+        :return: playlistItem resource.
+        """
+        self._next_item += 1
+        video = self.videos.get(video_id, {})
+        snippet = video.get('snippet', {})
+        content = {'videoId': video_id}
+
+        if snippet.get('liveBroadcastContent') != 'upcoming' and 'publishedAt' in snippet:
+            content['videoPublishedAt'] = snippet['publishedAt']
+
+        return {'kind': 'youtube#playlistItem', 'id': f'PLI{self._next_item:08d}',
+                'snippet': {'playlistId': playlist_id, 'title': snippet.get('title', ''),
+                            'videoOwnerChannelId': snippet.get('channelId'),
+                            'videoOwnerChannelTitle': snippet.get('channelTitle'),
+                            'resourceId': {'kind': 'youtube#video', 'videoId': video_id}},
+                'contentDetails': content,
+                'status': {'privacyStatus': video.get('status', {}).get('privacyStatus', 'private')}}
+
+    def round_trip(self):
+        """Count an HTTP round trip and wait for the injected latency."""
+        with self._lock:
+            self.round_trips += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+    def stats(self):
+        """Get server counters
+        :return: counters as a dictionary.
+        """
+        with self._lock:
+            return {'round_trips': self.round_trips, 'requests': sum(self.calls.values()), 'units': self.units,
+                    'errors': self.errors, 'calls': dict(self.calls)}
+
+    def call(self, method: str, path: str, query: dict, body: dict):
+        """Execute an API request
+        :param method: HTTP method
+        :param path: request path (e.g. '/youtube/v3/videos')
+        :param query: query parameters {name: value}
+        :param body: request body (dictionary), None if there is none
+        :return status, response: HTTP status code and response body (None for empty responses).
+        """
+        resource = path.rstrip('/').rsplit('/', 1)[-1]
+        action = {'GET': 'list', 'POST': 'insert', 'PUT': 'update', 'DELETE': 'delete'}[method]
+        method_id = f'youtube.{resource}.{action}'
+
+        with self._lock:
+            self.calls[method_id] += 1
+
+            if self.units + quota.COSTS.get(method_id, 1) > self.daily_quota:
+                self.errors += 1
+                return 403, api_error(403, 'quotaExceeded', 'The request cannot be completed because you have '
+                                                            'exceeded your quota.')
+
+            self.units += quota.COSTS.get(method_id, 1)
+
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self.errors += 1
+                return 500, api_error(500, 'backendError', 'Backend Error')
+
+            handler = getattr(self, f'_{resource}_{action}', None)
+
+            if handler is None:
+                return 404, api_error(404, 'notFound', f'Unknown method: {method_id}')
+
+            return handler(query, body)
+
+    def feed(self, channel_id: str, size: int = 15):
+        """Build the uploads feed of a channel (newest uploads first, as served by youtube.com/feeds/videos.xml)
+        :param channel_id: a YouTube channel ID
+        :param size: number of entries
+        :return: feed content as bytes, None if the channel does not exist.
+        """
+        with self._lock:
+            uploads = self.playlists.get(f'UU{channel_id[2:]}')
+
+            if uploads is None:
+                return None
+
+            video_ids = [item['contentDetails']['videoId'] for item in uploads[:size]]
+
+        title = xml.sax.saxutils.escape(self.channels.get(channel_id, {}).get('snippet', {}).get('title', ''))
+        entries = []
+
+        for video_id in video_ids:
+            published = self.videos.get(video_id, {}).get('snippet', {}).get('publishedAt', '').replace('Z', '+00:00')
+            entries.append(f'<entry><id>yt:video:{video_id}</id><yt:videoId>{video_id}</yt:videoId>'
+                           f'<yt:channelId>{channel_id}</yt:channelId><title>Video {video_id}</title>'
+                           f'<author><name>{title}</name></author><published>{published}</published></entry>')
+
+        return ('<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" '
+                f'xmlns="http://www.w3.org/2005/Atom"><title>{title}</title>{"".join(entries)}</feed>').encode('utf8')
+
+    def _page(self, items: list, query: dict, kind: str):
+        """Paginate a list response
+        :param items: resources
+        :param query: query parameters ('pageToken', 'maxResults')
+        :param kind: response kind
+        :return: HTTP status code and response body.
+        """
+        start = int(query.get('pageToken') or 0)
+        size = min(int(query.get('maxResults') or PAGE_SIZE), 50)
+        response = {'kind': kind, 'items': items[start:start + size],
+                    'pageInfo': {'totalResults': len(items), 'resultsPerPage': size}}
+
+        if start + size < len(items):
+            response['nextPageToken'] = str(start + size)
+
+        return 200, response
+
+    def _playlistItems_list(self, query: dict, _body: dict):  # skipcq: PYL-R0201
+        playlist = self.playlists.get(query.get('playlistId'))
+        if playlist is None:
+            return 404, api_error(404, 'playlistNotFound', 'The playlist identified with the request\'s playlistId '
+                                                           'parameter cannot be found.')
+        return self._page(playlist, query, 'youtube#playlistItemListResponse')
+
+    def _playlistItems_insert(self, _query: dict, body: dict):
+        playlist_id = body['snippet']['playlistId']
+        item = self._new_item(playlist_id, body['snippet']['resourceId']['videoId'])
+        playlist = self.playlists.setdefault(playlist_id, [])
+        position = body['snippet'].get('position', len(playlist))
+        playlist.insert(position, item)
+        return 200, item
+
+    def _playlistItems_delete(self, query: dict, _body: dict):
+        for playlist in self.playlists.values():
+            for idx, item in enumerate(playlist):
+                if item['id'] == query.get('id'):
+                    del playlist[idx]
+                    return 204, None
+        return 404, api_error(404, 'playlistItemNotFound')
+
+    def _playlistItems_update(self, _query: dict, body: dict):
+        playlist = self.playlists.get(body['snippet']['playlistId'], [])
+
+        for idx, item in enumerate(playlist):
+            if item['id'] == body['id']:
+                del playlist[idx]
+                playlist.insert(min(body['snippet'].get('position', idx), len(playlist)), item)
+                return 200, item
+        return 404, api_error(404, 'playlistItemNotFound')
+
+    def _select(self, resources: dict, query: dict, kind: str):
+        """Get resources by ID, with requested parts only
+        :param resources: {ID: resource}
+        :param query: query parameters ('id', 'part')
+        :param kind: response kind
+        :return: HTTP status code and response body.
+        """
+        parts = set(query.get('part', '').split(',')) | {'kind', 'id'}
+        items = [{key: value for key, value in resources[res_id].items() if key in parts}
+                 for res_id in query.get('id', '').split(',') if res_id in resources]
+        return 200, {'kind': kind, 'items': items, 'pageInfo': {'totalResults': len(items), 'resultsPerPage': 50}}
+
+    def _videos_list(self, query: dict, _body: dict):
+        return self._select(self.videos, query, 'youtube#videoListResponse')
+
+    def _channels_list(self, query: dict, _body: dict):
+        return self._select(self.channels, query, 'youtube#channelListResponse')
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """HTTP handler routing API requests, batch requests and channel pages to the 'FakeYouTube' of the server."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):  # skipcq: PYL-W0221 - Silent server
+        pass
+
+    def _send(self, status: int, body: bytes = b'', content_type: str = 'application/json', headers: dict = None):
+        """Send a response
+        :param status: HTTP status code
+        :param body: response body
+        :param content_type: response content type
+        :param headers: additional headers.
+        """
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method: str):
+        """Route a request
+        :param method: HTTP method.
+        """
+        youtube = self.server.youtube
+        parsed = urllib.parse.urlparse(self.path)
+        query = parse_query(parsed.query)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+        youtube.round_trip()
+
+        if parsed.path.startswith('/channel/'):  # youtube.com channel page
+            self._send(200, channel_page(youtube.live.get(parsed.path.split('/')[2], [])), 'text/html; charset=utf-8')
+
+        elif parsed.path == '/feeds/videos.xml':  # youtube.com channel feed, with ETag support
+            feed = youtube.feed(query.get('channel_id', ''))
+
+            if feed is None:
+                self._send(404, b'', 'text/html; charset=utf-8')
+            else:
+                etag = '"' + hashlib.sha1(feed).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    self._send(304, headers={'ETag': etag})
+                else:
+                    self._send(200, feed, 'application/atom+xml; charset=UTF-8', headers={'ETag': etag})
+
+        elif parsed.path == '/_stats':
+            self._send(200, json.dumps(youtube.stats()).encode('utf8'))
+
+        elif parsed.path == '/batch':
+            self._batch(body)
+
+        elif parsed.path.startswith('/youtube/v3/'):
+            status, response, headers = self._api(method, parsed.path, query, body, self.headers.get('If-None-Match'))
+            self._send(status, response, headers=headers)
+
+        else:
+            self._send(404, json.dumps(api_error(404, 'notFound')).encode('utf8'))
+
+    def _api(self, method: str, path: str, query: dict, body: bytes, if_none_match: str = None):
+        """Execute an API request, with ETag support on list methods
+        :param method: HTTP method
+        :param path: request path
+        :param query: query parameters
+        :param body: request body
+        :param if_none_match: ETag sent by the client
+        :return: HTTP status code, response body and headers.
+        """
+        status, response = self.server.youtube.call(method, path, query, json.loads(body) if body else None)
+
+        if response is None:
+            return status, b'', {}
+
+        if status == 200 and method == 'GET':
+            etag = '"' + hashlib.sha1(json.dumps(response, sort_keys=True).encode('utf8')).hexdigest() + '"'
+            response['etag'] = etag
+            if if_none_match == etag:
+                return 304, b'', {'ETag': etag}
+            return status, json.dumps(response).encode('utf8'), {'ETag': etag}
+
+        return status, json.dumps(response).encode('utf8'), {}
+
+    def _batch(self, body: bytes):
+        """Execute a batch request ('multipart/mixed' of 'application/http' parts)
+        :param body: request body.
+        """
+        message = email.parser.BytesParser().parsebytes(
+            f'Content-Type: {self.headers["Content-Type"]}\r\n\r\n'.encode('utf8') + body)
+        boundary = 'batch_fake_youtube'
+        parts = []
+
+        for part in message.get_payload():
+            request_line, _, rest = part.get_payload().partition('\n')
+            method, target, _ = request_line.strip().split(' ')
+            sub_body = rest.replace('\r\n', '\n').partition('\n\n')[2].strip()
+            parsed = urllib.parse.urlparse(target)
+            status, response, _ = self._api(method, parsed.path, parse_query(parsed.query),
+                                            sub_body.encode('utf8'))
+            content_id = part['Content-ID'][1:-1]
+            parts.append(f'--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n'
+                         f'\r\nHTTP/1.1 {status} {http.HTTPStatus(status).phrase}\r\n'
+                         f'Content-Type: application/json\r\n\r\n{response.decode("utf8")}\r\n')
+
+        payload = (''.join(parts) + f'--{boundary}--\r\n').encode('utf8')
+        self._send(200, payload, f'multipart/mixed; boundary={boundary}')
+
+    def do_GET(self):  # skipcq: PYL-C0103
+        self._handle('GET')
+
+    def do_POST(self):  # skipcq: PYL-C0103
+        self._handle('POST')
+
+    def do_PUT(self):  # skipcq: PYL-C0103
+        self._handle('PUT')
+
+    def do_DELETE(self):  # skipcq: PYL-C0103
+        self._handle('DELETE')
+
+
+def serve(youtube: FakeYouTube, port: int = 0):
+    """Start the server in a background thread
+    :param youtube: FakeYouTube object
+    :param port: port to listen to (a free port if 0)
+    :return server: http.server.ThreadingHTTPServer object ('server.server_port' being the port used).
+    """
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    server.youtube = youtube
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def record(service, channels: list, playlist_ids: dict, path: str = FIXTURES_PATH, max_pages: int = 2):
+    """Record fixtures with a real service: newest uploads of channels, user playlists, videos, channels and running
+    livestreams (from channel pages)
+    :param service: a YouTube service build with 'googleapiclient.discovery'
+    :param channels: list of YouTube channel IDs
+    :param playlist_ids: {name in fixtures: YouTube playlist ID} of user playlists (e.g. 'mixes', 'lives')
+    :param path: fixtures file path
+    :param max_pages: maximum number of pages recorded per uploads playlist.
+    """
+    import requests  # Only needed to record channel pages
+
+    import youtube_req
+
+    state = {'videos': {}, 'channels': {}, 'playlists': {}, 'live': {}}
+    to_browse = {f'UU{channel_id[2:]}': f'UU{channel_id[2:]}' for channel_id in channels}
+    to_browse.update({playlist_id: name for name, playlist_id in playlist_ids.items()})
+
+    for playlist_id, name in to_browse.items():
+        video_ids, token, pages = [], None, 0
+
+        while pages == 0 or (token and (name in playlist_ids or pages < max_pages)):
+            try:
+                response = service.playlistItems().list(part=['contentDetails'], playlistId=playlist_id,
+                                                        maxResults=50, pageToken=token).execute()
+            except Exception:  # skipcq: PYL-W0703 - Playlist not found, recorded as missing
+                break
+            video_ids += [item['contentDetails']['videoId'] for item in response.get('items', [])]
+            token, pages = response.get('nextPageToken'), pages + 1
+
+        if pages:
+            state['playlists'][name] = video_ids
+
+    for channel_id in channels:
+        page = requests.get(f'https://www.youtube.com/channel/{channel_id}', timeout=(5, 5)).content
+        try:
+            featured = youtube_req.extract_featured_videos(page)
+        except ValueError:
+            continue
+        if featured:
+            state['live'][channel_id] = featured
+
+    video_ids = list(dict.fromkeys(vid for ids in list(state['playlists'].values()) + list(state['live'].values())
+                                   for vid in ids))
+
+    for i in range(0, len(video_ids), 50):
+        response = service.videos().list(part=LIVE_PARTS, id=','.join(video_ids[i:i + 50]), maxResults=50).execute()
+        state['videos'].update((item['id'], item) for item in response.get('items', []))
+
+    for i in range(0, len(channels), 50):
+        response = service.channels().list(part=['snippet', 'statistics'], id=','.join(channels[i:i + 50]),
+                                           maxResults=50).execute()
+        state['channels'].update((item['id'], item) for item in response.get('items', []))
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    with open(path, 'w', encoding='utf8') as fixtures_file:
+        json.dump(state, fixtures_file)
+
+
+def make_root(state: dict, root_dir: str, now: dt.datetime):
+    """Create a repository root for 'main.py' runs against the server (configuration and data files only)
+    :param state: server state
+    :param root_dir: directory to create files in
+    :param now: reference date (last execution is set a day before).
+    """
+    for sub_dir in ('data', 'log', 'cache'):
+        os.makedirs(f'{root_dir}/{sub_dir}', exist_ok=True)
+
+    channels = [f'UC{playlist_id[2:]}' for playlist_id in state['playlists'] if playlist_id.startswith('UU')]
+    files = {'data/add-on.json': {'certified': [], 'toPass': [], 'playlistNotFoundPass': []},
+             'data/pocket_tube.json': {'MUSIQUE': channels},
+             'data/playlists.json': {'mixes': {'id': 'mixes'}, 'lives': {'id': 'lives'}}}
+
+    for file_path, content in files.items():
+        with open(f'{root_dir}/{file_path}', 'w', encoding='utf8') as json_file:
+            json.dump(content, json_file)
+
+    last_exe = (now - dt.timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S%z')
+
+    with open(f'{root_dir}/log/last_exe.log', 'w', encoding='utf8') as log_file:
+        log_file.write(f'{last_exe} [INFO] - Process started.\n')
+
+
+def run_benchmark(state: dict, runs: int = 2, latency: float = 0.0, error_rate: float = 0.0):
+    """Run 'main.py' against the server (first run with cold caches, next ones warm) and print wall time, requests and
+    quota units of each run
+    :param state: server state
+    :param runs: number of consecutive runs
+    :param latency: delay (seconds) added to each HTTP round trip
+    :param error_rate: probability of a 'backendError' for each API request.
+    """
+    youtube = FakeYouTube(state, latency=latency, error_rate=error_rate, daily_quota=10 ** 9)
+    server = serve(youtube)
+    root_dir = tempfile.mkdtemp(prefix='fake_youtube_')
+    make_root(state, root_dir, now=dt.datetime.now(tz=dt.timezone.utc))
+    env = {**os.environ, 'AYP_ROOT_DIR': root_dir, 'YOUTUBE_API_URL': f'http://127.0.0.1:{server.server_port}/'}
+    print(f'{"run":<5}{"wall (s)":>10}{"round trips":>13}{"requests":>10}{"units":>8}{"errors":>8}  calls')
+
+    try:
+        for run in range(1, runs + 1):
+            quota_path = f'{root_dir}/data/quota.json'
+
+            if os.path.exists(quota_path):  # Each run is measured as the first of its day
+                with open(quota_path, 'r', encoding='utf8') as quota_file:
+                    ledger_state = json.load(quota_file)
+                with open(quota_path, 'w', encoding='utf8') as quota_file:
+                    json.dump({**ledger_state, 'day_units': 0}, quota_file)
+
+            before = youtube.stats()
+            start = time.perf_counter()
+            subprocess.run([sys.executable, 'main.py', 'fake'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                           env=env, check=True)
+            wall = time.perf_counter() - start
+            after = youtube.stats()
+            calls = {method: count - before['calls'].get(method, 0) for method, count in after['calls'].items()}
+            calls = ', '.join(f'{method.split(".", 1)[1]}={count}' for method, count in sorted(calls.items()) if count)
+            print(f'{run:<5}{wall:>10.2f}{after["round_trips"] - before["round_trips"]:>13}'
+                  f'{after["requests"] - before["requests"]:>10}{after["units"] - before["units"]:>8}'
+                  f'{after["errors"] - before["errors"]:>8}  {calls}')
+
+    finally:
+        server.shutdown()
+        shutil.rmtree(root_dir, ignore_errors=True)
+
+
+def load_state(fixtures: str = None, **generate_args):
+    """Load fixtures, or generate a state
+    :param fixtures: fixtures file path (a state is generated if None)
+    :param generate_args: 'generate_state' arguments
+    :return: state as a dictionary.
+    """
+    if fixtures:
+        with open(fixtures, 'r', encoding='utf8') as fixtures_file:
+            return json.load(fixtures_file)
+    return generate_state(**generate_args)
+
+
+"MAIN"
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local fake YouTube Data API.')
+    parser.add_argument('command', choices=['serve', 'record', 'bench'])
+    parser.add_argument('--fixtures', default=None, help='fixtures file to replay (generated state if omitted)')
+    parser.add_argument('--channels', type=int, default=300, help='number of channels of a generated state')
+    parser.add_argument('--videos', type=int, default=3, help='uploads per channel of a generated state')
+    parser.add_argument('--port', type=int, default=8765, help='server port (serve)')
+    parser.add_argument('--latency', type=float, default=0.0, help='delay (seconds) per HTTP round trip')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probability of backend errors')
+    parser.add_argument('--quota', type=int, default=10000, help='daily quota units (serve)')
+    parser.add_argument('--runs', type=int, default=2, help='consecutive runs (bench)')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        import youtube_req
+
+        context = youtube_req.init()
+
+        with open(context.path('data', 'pocket_tube.json'), 'r', encoding='utf8') as pt_file:
+            music_channels = json.load(pt_file)['MUSIQUE'] + context.add_on['certified']
+
+        with open(context.path('data', 'playlists.json'), 'r', encoding='utf8') as playlists_file:
+            user_playlists = {name: playlist['id'] for name, playlist in json.load(playlists_file).items()}
+
+        record(youtube_req.create_service_local(), music_channels, user_playlists, path=args.fixtures or FIXTURES_PATH)
+
+    else:
+        fake_state = load_state(args.fixtures, n_channels=args.channels, videos_per_channel=args.videos)
+
+        if args.command == 'serve':
+            fake_server = serve(FakeYouTube(fake_state, latency=args.latency, error_rate=args.error_rate,
+                                            daily_quota=args.quota), port=args.port)
+            print(f'Fake YouTube API listening on http://127.0.0.1:{fake_server.server_port}/')
+            threading.Event().wait()
+
+        else:
+            run_benchmark(fake_state, runs=args.runs, latency=args.latency, error_rate=args.error_rate)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+import datetime as dt
+import json
+import os
+import threading
+import xml.etree.ElementTree as ElementTree
+
+"""File Information
+@file_name: feeds.py
+@author: Dylan "dyl-m" Monfret
+Channel uploads Atom feeds (youtube.com/feeds/videos.xml, no API quota): streaming parser and conditional GET
+validators.
+"""
+
+"GLOBAL"
+
+FEED_SIZE = 15  # Number of newest uploads listed in a channel feed
+ATOM = '{http://www.w3.org/2005/Atom}'
+YT = '{http://www.youtube.com/xml/schemas/2015}'
+
+"FUNCTIONS"
+
+
+def parse_feed(chunks):
+    """Parse a channel feed incrementally, entries being yielded as soon as they are complete (newest first)
+    :param chunks: iterable of feed content chunks (bytes)
+    :return: generator of entries as dictionaries ('video_id', 'release_date', 'channel_id', 'channel_name').
+    """
+    parser = ElementTree.XMLPullParser(events=('end',))
+
+    for chunk in chunks:
+        parser.feed(chunk)
+
+        for _, element in parser.read_events():
+            if element.tag != f'{ATOM}entry':
+                continue
+
+            published = element.findtext(f'{ATOM}published')
+            yield {'video_id': element.findtext(f'{YT}videoId'),
+                   'release_date': dt.datetime.fromisoformat(published) if published else None,
+                   'channel_id': element.findtext(f'{YT}channelId'),
+                   'channel_name': element.findtext(f'{ATOM}author/{ATOM}name')}
+            element.clear()  # Entries already parsed are not kept in memory
+
+    parser.close()  # Raise 'ElementTree.ParseError' on truncated feeds
+
+
+"CLASSES"
+
+
+class FeedCache:
+    """Conditional GET validators (ETag, Last-Modified) of channel feeds, staged during a run and only saved once the
+    run succeeded (an unchanged feed means its entries have already been processed)."""
+
+    def __init__(self, path: str = '../cache/feeds.json'):
+        """Load validators
+        :param path: validators JSON file path.
+        """
+        self.path = path
+        self.fetched, self.unchanged, self.fallbacks = 0, 0, 0
+        self._staged = {}
+        self._lock = threading.Lock()
+        self._validators = {}
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf8') as feeds_file:
+                self._validators = json.load(feeds_file)
+
+    def headers(self, channel_id: str):
+        """Get conditional request headers of a feed
+        :param channel_id: a YouTube channel ID
+        :return: headers as a dictionary (empty if the feed has never been fetched).
+        """
+        validators = self._validators.get(channel_id, {})
+        headers = {}
+
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        return headers
+
+    def stage(self, channel_id: str, etag: str = None, last_modified: str = None):
+        """Stage the validators of a feed after processing it
+        :param channel_id: a YouTube channel ID
+        :param etag: 'ETag' response header
+        :param last_modified: 'Last-Modified' response header.
+        """
+        with self._lock:
+            self._staged[channel_id] = {'etag': etag, 'last_modified': last_modified}
+
+    def count(self, outcome: str):
+        """Count a feed request outcome
+        :param outcome: 'fetched', 'unchanged' or 'fallbacks'.
+        """
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def report(self):
+        """Summarize feed requests
+        :return: report as a string.
+        """
+        return f'Feeds: {self.fetched} fetched, {self.unchanged} unchanged, {self.fallbacks} fallback(s) to the API.'
+
+    def save(self):
+        """Apply staged validators and save them."""
+        with self._lock:
+            self._validators.update(self._staged)
+            self._staged = {}
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        with open(self.path, 'w', encoding='utf8') as feeds_file:
+            json.dump(dict(sorted(self._validators.items())), feeds_file)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import datetime as dt
+import glob
+import os
+
+"""File Information
+@file_name: history_store.py
+@author: Dylan "dyl-m" Monfret
+Append-only history of videos removed from the mixes playlist, partitioned by release month ('YYYY-MM.csv' files,
+rows without release date being kept in 'undated.csv').
+"""
+
+"GLOBAL"
+
+HISTORY_DIR = '../data/history'
+FIELDS = ['video_id', 'item_id', 'release_date', 'status', 'channel_id', 'channel_name', 'subscribers', 'views',
+          'likes', 'comments', 'duration', 'live_status']
+UNDATED = 'undated'  # Partition of rows without release date
+
+"FUNCTIONS"
+
+
+def format_value(value):
+    """Format a value as written in history files (missing values as empty strings)
+    :param value: a value of any type
+    :return: value as a string.
+    """
+    if value is None or value != value:  # None or NaN
+        return ''
+    return str(value)
+
+
+def partition_path(release_date, history_dir: str = HISTORY_DIR):
+    """Get the partition file path of a release date
+    :param release_date: release date as datetime.datetime object or string ('YYYY-MM-DD ...'), None or empty if unknown
+    :param history_dir: history directory
+    :return: partition file path.
+    """
+    return f'{history_dir}/{str(release_date)[:7] if release_date else UNDATED}.csv'
+
+
+def append(records: list, history_dir: str = HISTORY_DIR):
+    """Append records to their release month partition, without reading existing rows
+    :param records: list of dictionaries with (at least some of) 'FIELDS' keys
+    :param history_dir: history directory
+    :return: records written as strings (to update aggregates built on history).
+    """
+    os.makedirs(history_dir, exist_ok=True)
+    partitions = {}
+
+    for record in records:
+        row = {field: format_value(record.get(field)) for field in FIELDS}
+        partitions.setdefault(partition_path(row['release_date'], history_dir), []).append(row)
+
+    for path, rows in partitions.items():
+        new_file = not os.path.exists(path)
+
+        with open(path, 'a', encoding='utf8', newline='') as partition_file:
+            writer = csv.DictWriter(partition_file, fieldnames=FIELDS, lineterminator='\n')
+            if new_file:
+                writer.writeheader()
+            writer.writerows(rows)
+
+    return [row for rows in partitions.values() for row in rows]
+
+
+def read(start: dt.datetime = None, end: dt.datetime = None, columns: list = None, history_dir: str = HISTORY_DIR):
+    """Read history rows released in a date range, only opening the partitions overlapping this range (rows without
+    release date are only read without range)
+    :param start: oldest release date (included), no lower bound if None
+    :param end: latest release date (excluded), no upper bound if None
+    :param columns: columns to keep (all columns if None)
+    :param history_dir: history directory
+    :return rows: list of dictionaries (values as strings).
+    """
+    rows = []
+    first, last = (start.strftime('%Y-%m') if start else None), (end.strftime('%Y-%m') if end else None)
+    paths = sorted(glob.glob(f'{history_dir}/[0-9][0-9][0-9][0-9]-[0-9][0-9].csv'))
+
+    if not (start or end) and os.path.exists(partition_path(None, history_dir)):
+        paths.append(partition_path(None, history_dir))
+
+    for path in paths:
+        month = os.path.basename(path)[:7]
+
+        if (first and month < first) or (last and month > last):
+            continue
+
+        with open(path, 'r', encoding='utf8', newline='') as partition_file:
+            for row in csv.DictReader(partition_file):
+                if start or end:
+                    release_date = dt.datetime.fromisoformat(row['release_date'])
+                    if (start and release_date < start) or (end and release_date >= end):
+                        continue
+
+                rows.append({column: row[column] for column in columns} if columns else row)
+
+    return rows
+
+
+def export_csv(path: str = '../data/mix_history.csv', history_dir: str = HISTORY_DIR):
+    """Export the whole history as a single CSV file (former 'mix_history.csv' format)
+    :param path: export file path
+    :param history_dir: history directory.
+    """
+    with open(path, 'w', encoding='utf8', newline='') as export_file:
+        writer = csv.DictWriter(export_file, fieldnames=FIELDS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(read(history_dir=history_dir))
+
+
+"MAIN"
+
+if __name__ == '__main__':
+    export_csv()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from context import lazy_import
+
+googleapiclient = lazy_import('googleapiclient')  # Loaded on first use
+lazy_import('googleapiclient.errors')
+
+"""File Information
+@file_name: http_cache.py
+@author: Dylan "dyl-m" Monfret
+Persistent cache of YouTube API responses, revalidated with ETags ('If-None-Match' / '304 Not Modified').
+"""
+
+"CLASSES"
+
+
+class ResponseCache:
+    """On-disk (SQLite) response cache keyed on request method and parameters, bounded in size."""
+
+    def __init__(self, path: str = '../cache/responses.sqlite', max_size: int = 64 * 1024 ** 2):
+        """Open (or create) the cache database
+        :param path: SQLite database file path
+        :param max_size: maximum size of stored responses in bytes, least recently used ones are evicted beyond.
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, etag TEXT NOT NULL, '
+                                 'body BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)')
+
+    @staticmethod
+    def make_key(request):
+        """Build the cache key of a request
+        :param request: a googleapiclient.http.HttpRequest object
+        :return: hexadecimal digest of the API method and request URI (containing parameters).
+        """
+        return hashlib.sha1(f'{request.methodId} {request.uri}'.encode('utf8')).hexdigest()
+
+    def execute(self, request):
+        """Execute a request, sending the cached ETag and serving the stored response on '304 Not Modified'
+        :param request: a googleapiclient.http.HttpRequest object
+        :return: response as a dictionary.
+        """
+        key = self.make_key(request)
+
+        with self._lock:
+            row = self._connection.execute('SELECT etag, body FROM responses WHERE key = ?', (key,)).fetchone()
+
+        if row:
+            request.headers['If-None-Match'] = row[0]
+
+        try:
+            response = request.execute()
+
+        except googleapiclient.errors.HttpError as http_error:
+            if row and http_error.resp.status == 304:  # Not modified since last run
+                with self._lock:
+                    self.hits += 1
+                    self._connection.execute('UPDATE responses SET accessed = ? WHERE key = ?', (time.time(), key))
+                return json.loads(zlib.decompress(row[1]))
+            raise
+
+        with self._lock:
+            self.misses += 1
+
+            if 'etag' in response:
+                body = zlib.compress(json.dumps(response).encode('utf8'))
+                self._connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                                         (key, response['etag'], body, len(body), time.time()))
+
+        return response
+
+    def evict(self):
+        """Remove least recently used responses until the cache fits its maximum size."""
+        with self._lock:
+            total = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            rows = self._connection.execute('SELECT key, size FROM responses ORDER BY accessed').fetchall()
+            to_delete = []
+
+            for key, size in rows:
+                if total <= self.max_size:
+                    break
+                to_delete.append((key,))
+                total -= size
+
+            self._connection.executemany('DELETE FROM responses WHERE key = ?', to_delete)
+
+    def report(self):
+        """Summarize cache usage for the current run
+        :return: report as a string.
+        """
+        requests_count = self.hits + self.misses
+        hit_rate = 100 * self.hits / requests_count if requests_count else 0
+
+        with self._lock:
+            count, size = self._connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+
+        return f'Response cache: {self.hits} hit(s), {self.misses} miss(es) ({hit_rate:.0f}% hit rate), ' \
+               f'{count} response(s) stored ({size / 1024:.0f} KiB).'
+
+    def save(self):
+        """Apply eviction and save the cache database (it stays open)."""
+        self.evict()
+
+        with self._lock:
+            self._connection.commit()
+
+    def close(self):
+        """Apply eviction, save and close the cache database."""
+        self.save()
+
+        with self._lock:
+            self._connection.close()
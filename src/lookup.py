@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+"""File Information
+@file_name: lookup.py
+@author: Dylan "dyl-m" Monfret
+Run-scoped lookup of YouTube resources by ID ('videos.list', 'channels.list'): requests from every call site are
+deduplicated and packed into full batches of 50 IDs with the union of required parts, so that each distinct ID is
+requested at most once per run.
+"""
+
+"GLOBAL"
+
+BATCH_SIZE = 50  # Maximum number of IDs in a 'list' request
+DEFAULT_PARTS = {'videos': ['snippet', 'contentDetails', 'statistics', 'liveStreamingDetails'],
+                 'channels': ['statistics']}  # Parts requested for every ID, whatever the call site
+
+"CLASSES"
+
+
+class LookupService:
+    """Collect IDs requested by callers, fetch them once and serve every caller from the same result set."""
+
+    def __init__(self, execute=None, parts: dict = None, batch_size: int = BATCH_SIZE):
+        """Initialize the lookup service
+        :param execute: function executing an API request and returning its response ('request.execute()' if None)
+        :param parts: {resource: parts always requested}, 'DEFAULT_PARTS' if None
+        :param batch_size: maximum number of IDs per request.
+        """
+        self.execute = execute or (lambda request: request.execute())
+        self.batch_size = batch_size
+        self.parts = {resource: set(res_parts) for resource, res_parts in (parts or DEFAULT_PARTS).items()}
+        self.requests = 0
+        self.lookups = 0
+        self._lock = threading.Lock()
+        self._items = {}  # {resource: {ID: item}}
+        self._fetched = {}  # {resource: {ID: parts the ID was fetched with}}, IDs not found included
+        self._pending = {}  # {resource: {ID: True if required, False if only used to fill a batch}}
+        self._inflight = {}  # {resource: {ID: (completion event, parts requested, required)}}, IDs being fetched
+
+    def _resource(self, resource: str):
+        """Get (and create if needed) the state of a resource
+        :param resource: resource name ('videos', 'channels')
+        :return: items, fetched parts, pending IDs and IDs being fetched of the resource.
+        """
+        return (self._items.setdefault(resource, {}), self._fetched.setdefault(resource, {}),
+                self._pending.setdefault(resource, {}), self._inflight.setdefault(resource, {}))
+
+    def prefetch(self, resource: str, ids: list, parts: list = None, optional: bool = False):
+        """Register IDs to fetch with the next request of a resource
+        :param resource: resource name ('videos', 'channels')
+        :param ids: IDs to fetch
+        :param parts: parts needed by the caller (added to parts requested for every ID)
+        :param optional: to only use these IDs to fill incomplete batches (they cost no additional request).
+        """
+        with self._lock:
+            self._register(resource, ids, parts, optional)
+
+    def _register(self, resource: str, ids: list, parts: list, optional: bool):
+        """Register IDs to fetch (lock must be held)
+        :param resource: resource name
+        :param ids: IDs to fetch
+        :param parts: parts needed by the caller
+        :param optional: to only use these IDs to fill incomplete batches.
+        """
+        _, fetched, pending, inflight = self._resource(resource)
+        res_parts = self.parts.setdefault(resource, set())
+        res_parts.update(parts or [])
+
+        for an_id in ids:
+            if an_id in fetched and res_parts <= fetched[an_id]:  # Already fetched with every needed part
+                continue
+            if an_id in inflight and res_parts <= inflight[an_id][1]:  # Being fetched with every needed part
+                continue
+            pending[an_id] = pending.get(an_id, False) or not optional
+
+    def _reserve(self, resource: str):
+        """Take required pending IDs, filling the last batch with optional IDs, and flag them as being fetched (lock
+        must be held)
+        :param resource: resource name
+        :return: (IDs to fetch, parts to request, completion event), ([], None, None) if no ID is required.
+        """
+        _, _, pending, inflight = self._resource(resource)
+        required = [an_id for an_id, is_required in pending.items() if is_required]
+
+        if not required:
+            return [], None, None
+
+        optional = [an_id for an_id, is_required in pending.items() if not is_required]
+        n_slots = -len(required) % self.batch_size
+        to_fetch = required + optional[:n_slots]
+        parts, event = set(self.parts[resource]), threading.Event()
+
+        for an_id in to_fetch:
+            inflight[an_id] = (event, parts, pending.pop(an_id))
+
+        return to_fetch, sorted(parts), event
+
+    def _fetch(self, service, resource: str, to_fetch: list, parts: list, event: threading.Event):
+        """Fetch reserved IDs in full batches, without holding the lock during requests, and publish each batch once
+        received (IDs of a failed request are pending again)
+        :param service: a YouTube service build with 'googleapiclient.discovery'
+        :param resource: resource name
+        :param to_fetch: IDs reserved with '_reserve'
+        :param parts: parts to request
+        :param event: completion event of the reservation, set once every ID is published or pending again.
+        """
+        items, fetched, pending, inflight = self._resource(resource)
+
+        try:
+            for i in range(0, len(to_fetch), self.batch_size):
+                chunk = to_fetch[i:i + self.batch_size]
+                request = getattr(service, resource)().list(part=parts, id=','.join(chunk), maxResults=self.batch_size)
+                response = self.execute(request)
+                found = {item['id']: item for item in response.get('items', [])}
+
+                with self._lock:
+                    self.requests += 1
+
+                    for an_id in chunk:  # IDs not returned (deleted, private...) are not requested again
+                        if inflight.get(an_id, (None,))[0] is not event:  # Fetched again since, with more parts
+                            continue
+                        if an_id in found:
+                            items[an_id] = found[an_id]
+                        fetched[an_id] = set(parts)
+                        del inflight[an_id]
+
+        finally:
+            with self._lock:
+                for an_id in to_fetch:
+                    if inflight.get(an_id, (None,))[0] is event:  # Request failed
+                        is_required = inflight.pop(an_id)[2]
+                        pending[an_id] = pending.get(an_id, False) or is_required
+
+            event.set()
+
+    def get(self, service, resource: str, ids: list, parts: list = None):
+        """Get items of a resource, requesting only IDs never fetched during the run (IDs being fetched by another
+        caller are waited for instead)
+        :param service: a YouTube service build with 'googleapiclient.discovery'
+        :param resource: resource name ('videos', 'channels')
+        :param ids: IDs to get
+        :param parts: parts needed by the caller
+        :return: list of items (IDs not found are skipped), in 'ids' order and without duplicates.
+        """
+        ids = list(dict.fromkeys(ids))
+
+        with self._lock:
+            self.lookups += len(ids)
+            self._register(resource, ids, parts, optional=False)
+
+        while True:
+            with self._lock:
+                items, _, pending, inflight = self._resource(resource)
+                to_fetch, fetch_parts, event = [], None, None
+
+                if any(an_id in pending for an_id in ids):
+                    to_fetch, fetch_parts, event = self._reserve(resource)
+
+                waiting = {inflight[an_id][0] for an_id in ids if an_id in inflight} - {event}
+
+                if not to_fetch and not waiting:
+                    return [items[an_id] for an_id in ids if an_id in items]
+
+            if to_fetch:
+                self._fetch(service, resource, to_fetch, fetch_parts, event)
+
+            for other_event in waiting:
+                other_event.wait()
+
+    def report(self):
+        """Summarize lookups of the current run
+        :return: report as a string.
+        """
+        n_fetched = sum(len(fetched) for fetched in self._fetched.values())
+        return f'Lookup service: {self.lookups} ID lookup(s) served by {self.requests} request(s), ' \
+               f'{n_fetched} distinct ID(s) fetched.'
@@ -1,15 +1,34 @@
 # -*- coding: utf-8 -*-
 
-import github
+import atexit
+import datetime as dt
 import json
 import logging
 import os
-import re
-import requests
+import signal
 import sys
 
+import daemon
+import http_cache
+import feeds
+import lookup
+import metadata_cache
+import metrics
+import pipeline
+import poll_scheduler
+import quota
+import release_histogram
+import run_log
+import seen_index
+import transport
+import watermarks
 import youtube_req
 
+from context import RunContext, lazy_import
+
+github = lazy_import('github')
+requests = lazy_import('requests')
+
 """File Information
 @file_name: main.py
 @author: Dylan "dyl-m" Monfret
@@ -33,20 +52,28 @@ try:
 except IndexError:
     exe_mode = 'local'
 
-"FUNCTIONS"
-
-
-def copy_last_exe_log():
-    """Copy last execution logging from main history file."""
-    with open('../log/history.log', 'r', encoding='utf8') as history_file:
-        history = history_file.read()
+daemon_mode = 'daemon' in sys.argv[2:]  # Resident process (e.g. 'python main.py local daemon'), see 'run_daemon'
+
+"PARAMETERS"
+
+LIVE_WORKERS = 16  # Number of channel pages requested concurrently while looking for livestreams
+LIVE_RATE = 10  # Maximum number of channel pages requested per second
+LIVE_DEADLINE = 120  # Maximum duration (in seconds) of livestreams discovery
+CHANNEL_WORKERS = 8  # Number of uploads playlists browsed concurrently
+API_RATE = 20  # Maximum number of YouTube API requests per second sent by workers
+MAX_STALENESS = 72  # Maximum delay (in hours) between two polls of a rarely active channel
+FEEDS_DISCOVERY = True  # To discover new uploads with channel feeds (no API quota) instead of uploads playlists
+MIXES_STREAMING = True  # To update mixes playlist with the streaming pipeline (batch mode otherwise)
+CACHE_MAX_SIZE = 64 * 1024 ** 2  # Maximum size (in bytes) of the API response cache
+CHANNEL_CACHE_TTL = 24 * 3600  # Lifetime (in seconds) of cached subscribers counts
+CHANNEL_CACHE_SIZE = 5000  # Maximum number of channels kept in cache
+VIDEO_CACHE_SIZE = 20000  # Maximum number of videos kept in caches
+VOLATILE_CACHE_TTL = 6 * 3600  # Lifetime (in seconds) of cached video counters and live status
+RETRY_BUDGET = 50  # Maximum number of retried API requests per run (transient errors)
+DAEMON_PORT = 8766  # Port of the daemon control endpoint (loopback interface only)
+PHASES_PRIORITY = ['mixes', 'lives', 'lives_sort']  # Phases by priority, lowest ones are skipped first
 
-    last_exe = re.findall(r".*?Process started\.", history)[-1]
-    last_exe_idx = history.rfind(last_exe)
-    last_exe_log = history[last_exe_idx:]
-
-    with open('../log/last_exe.log', 'w', encoding='utf8') as last_exe_file:
-        last_exe_file.write(last_exe_log)
+"FUNCTIONS"
 
 
 def update_repo_secrets(secret_name: str, new_value: str, logger: logging.Logger = None):
@@ -71,63 +98,273 @@ def update_repo_secrets(secret_name: str, new_value: str, logger: logging.Logger
         sys.exit()
 
 
-if __name__ == '__main__':
-    # Create loggers
-    history_main = logging.Logger(name='history_main', level=0)
+def export_metrics(run_metrics: metrics.Metrics, log_dir: str, logger: logging.Logger):
+    """Log run metrics summary, then save them as a JSON document and a Prometheus textfile
+    :param run_metrics: run metrics
+    :param log_dir: logs directory
+    :param logger: object for logging.
+    """
+    logger.info(run_metrics.summary())
+    run_metrics.save_json(os.path.join(log_dir, 'metrics.json'))
+    run_metrics.save_prometheus(os.path.join(log_dir, 'metrics.prom'))
+
+
+def config_files(run_context: RunContext):
+    """Register data files, parsed on first use and again when they change on disk (see 'daemon.ConfigFiles')
+    :param run_context: run context
+    :return: daemon.ConfigFiles object.
+    """
+    return daemon.ConfigFiles({'pocket_tube': (run_context.path('data', 'pocket_tube.json'), json.loads),
+                               'playlists': (run_context.path('data', 'playlists.json'), json.loads),
+                               'add_on': (run_context.path('data', 'add-on.json'), json.loads),
+                               'schedules': (run_context.path('.github', 'workflows', 'update_workflow.yml'),
+                                             daemon.read_schedules)})
+
 
-    # Create file handlers
-    history_main_file = logging.FileHandler(filename='../log/history.log')  # mode='a'
+def open_caches(run_context: RunContext):
+    """Open caches and indexes, kept in memory between the cycles of a resident process
+    :param run_context: run context.
+    """
+    youtube_req.RESPONSE_CACHE = http_cache.ResponseCache(path=run_context.path('cache', 'responses.sqlite'),
+                                                          max_size=CACHE_MAX_SIZE)
+    youtube_req.CHANNEL_CACHE = metadata_cache.MetadataCache(path=run_context.path('cache', 'channels.json'),
+                                                             ttl=CHANNEL_CACHE_TTL, max_size=CHANNEL_CACHE_SIZE,
+                                                             name='Channel')
+    youtube_req.VIDEO_CACHE = metadata_cache.MetadataCache(path=run_context.path('cache', 'videos.json'),
+                                                           max_size=VIDEO_CACHE_SIZE, name='Video')
+    youtube_req.VOLATILE_CACHE = metadata_cache.MetadataCache(path=run_context.path('cache', 'video_stats.json'),
+                                                              ttl=VOLATILE_CACHE_TTL, max_size=VIDEO_CACHE_SIZE,
+                                                              name='Video stats')
+    youtube_req.RELEASE_HISTOGRAM = release_histogram.ReleaseHistogram(
+        path=run_context.path('data', 'release_histogram.json'), history_dir=run_context.path('data', 'history'))
+    youtube_req.SEEN_INDEX = seen_index.SeenIndex(path=run_context.path('cache', 'seen_videos'))
+
+
+def save_caches(logger: logging.Logger):
+    """Log caches usage and save them (the response cache database stays open)
+    :param logger: object for logging.
+    """
+    logger.info(youtube_req.RESPONSE_CACHE.report())
+    youtube_req.RESPONSE_CACHE.save()
+    logger.info(youtube_req.CHANNEL_CACHE.report())
+    youtube_req.CHANNEL_CACHE.save()
+
+    logger.info(youtube_req.LOOKUP.report())
+    logger.info(youtube_req.SEEN_INDEX.report())
+    youtube_req.SEEN_INDEX.save()
 
-    # Create formatter
-    formatter_main = logging.Formatter(fmt='%(asctime)s [%(levelname)s] - %(message)s', datefmt='%Y-%m-%d %H:%M:%S%z')
+    for video_cache in (youtube_req.VIDEO_CACHE, youtube_req.VOLATILE_CACHE):
+        logger.info(video_cache.report())
+        video_cache.save()
 
-    # Set file handlers' level
-    history_main_file.setLevel(logging.DEBUG)
 
-    # Assign file handlers and formatter to loggers
-    history_main_file.setFormatter(formatter_main)
-    history_main.addHandler(history_main_file)
+def create_service():
+    """Create the YouTube service of the execution mode
+    :return: (service, base64 credentials (workflow mode only), to display progress bars or not).
+    """
+    if exe_mode == 'local':  # YouTube service in local mode, with progress bars
+        return youtube_req.create_service_local(), None, True
+
+    if exe_mode == 'fake':  # Local fake API, see 'fake_youtube.py'
+        return youtube_req.create_service_fake(os.environ['YOUTUBE_API_URL']), None, False
 
-    # Open and read data files
-    with open('../data/pocket_tube.json', 'r', encoding='utf8') as pt_file:
-        music_channels = json.load(pt_file)["MUSIQUE"]
+    return *youtube_req.create_service_workflow(), False  # YouTube service with GitHub workflow + Credentials
 
-    with open('../data/playlists.json', 'r', encoding='utf8') as playlists_file:
-        playlists = json.load(playlists_file)
 
+def run_cycle(run_context: RunContext, runs: run_log.RunLog, config: daemon.ConfigFiles, warm: dict,
+              logger: logging.Logger):
+    """Run an update cycle: livestreams then mixes playlists, within the remaining daily quota
+    :param run_context: run context of the cycle
+    :param runs: run log
+    :param config: data files
+    :param warm: YouTube service kept between cycles ('service', 'creds_b64', 'prog_bar'), filled on first use and
+    created again when its access token expires
+    :param logger: object for logging.
+    """
+    music_channels = config.get('pocket_tube')["MUSIQUE"]
+    playlists = config.get('playlists')
     playlists_mixes, playlists_lives = playlists['mixes']['id'], playlists['lives']['id']
 
     # Start
-    history_main.info('Process started.')
+    runs.start(now=run_context.now)  # Record run start offset in the run index
+    logger.info('Process started.')
+    run_metrics = youtube_req.METRICS = metrics.Metrics()
+    atexit.register(export_metrics, run_metrics, run_context.path('log'), logger)  # Also if interrupted
+    youtube_req.RETRY_POLICY = transport.RetryPolicy(budget=RETRY_BUDGET)
+    youtube_req.LOOKUP = lookup.LookupService(execute=youtube_req.execute_request)  # Run-scoped videos/channels lookup
+
+    with run_metrics.phase('service'):
+        if 'service' not in warm or youtube_req.service_expiring(warm['service']):
+            warm['service'], warm['creds_b64'], warm['prog_bar'] = create_service()
+
+    service, prog_bar = warm['service'], warm['prog_bar']
+
+    # Quota budget: skip lower-priority phases which would not fit in the remaining daily quota
+    ledger = youtube_req.QUOTA_LEDGER = quota.QuotaLedger(path=run_context.path('data', 'quota.json'))
+    n_channels = len(music_channels) + len(run_context.add_on['certified'])
+    phases, skipped_phases = ledger.plan(PHASES_PRIORITY, n_channels=n_channels)
+
+    for phase_name, phase_cost in skipped_phases.items():
+        logger.warning('QUOTA: %s phase skipped (%s unit(s) estimated, %s remaining).', phase_name, phase_cost,
+                       ledger.remaining)
+
+    completed = False
+
+    try:  # Units spent are saved even if the cycle fails
+        if 'lives' in phases:
+            try:  # Try to update & sort livestreams playlist
+                with ledger.phase('lives'), run_metrics.phase('lives'):
+                    current_live = youtube_req.iter_livestreams(music_channels, prog_bar=prog_bar, workers=LIVE_WORKERS,
+                                                                rate=LIVE_RATE, deadline=LIVE_DEADLINE)
+                    youtube_req.update_playlist(service, playlists_lives, current_live, is_live=True, prog_bar=prog_bar)
+
+                if 'lives_sort' in phases:  # Livestream sorting
+                    with ledger.phase('lives_sort'), run_metrics.phase('lives_sort'):
+                        youtube_req.sort_livestreams(service, playlists_lives, prog_bar=prog_bar)
+
+            except requests.exceptions.ReadTimeout:
+                logger.warning('TIMEOUT ERROR: Livestreams playlist update cancelled.')
+
+            except transport.QuotaExceededError:
+                logger.warning('Quota exceeded for YouTube projects.')
+                phases = []  # Remaining phases skipped
+
+        if 'mixes' in phases:  # Update mixes playlist
+            channel_marks = watermarks.WatermarkStore(path=run_context.path('data', 'watermarks.json'))
+            channel_polls = poll_scheduler.PollScheduler(channel_marks,
+                                                         path=run_context.path('data', 'poll_schedule.json'),
+                                                         history_dir=run_context.path('data', 'history'),
+                                                         now=run_context.now, max_staleness=MAX_STALENESS)
+            feed_cache = feeds.FeedCache(path=run_context.path('cache', 'feeds.json')) if FEEDS_DISCOVERY else None
+
+            try:
+                with ledger.phase('mixes'), run_metrics.phase('mixes'):
+                    if MIXES_STREAMING:  # Videos are inserted as soon as they are discovered
+                        pipeline.update_mixes(service, playlists_mixes, music_channels, watermarks=channel_marks,
+                                              workers=CHANNEL_WORKERS, rate=API_RATE, scheduler=channel_polls,
+                                              feed_cache=feed_cache)
+                    else:
+                        to_add = youtube_req.iter_channels(service, music_channels, prog_bar=prog_bar,
+                                                           watermarks=channel_marks, workers=CHANNEL_WORKERS,
+                                                           rate=API_RATE, scheduler=channel_polls,
+                                                           feed_cache=feed_cache)
+                        youtube_req.update_playlist(service, playlists_mixes, to_add, prog_bar=prog_bar)
+
+            except transport.QuotaExceededError:  # New videos are discovered again in the next run
+                logger.warning('Quota exceeded for YouTube projects.')
+
+            else:
+                channel_marks.save()  # Watermarks only move forward once new videos have been processed
+                channel_polls.save()
+
+                if feed_cache is not None:
+                    feed_cache.save()
+                    logger.info(feed_cache.report())
+
+                logger.info(channel_polls.report())
+
+            youtube_req.RELEASE_HISTOGRAM.save(now=run_context.now)
+
+        completed = True
+
+    finally:
+        logger.info(youtube_req.RETRY_POLICY.report())
+        logger.info(ledger.report())
+        ledger.save(n_channels=n_channels, completed=completed)
 
-    if exe_mode == 'local':  # YouTube service creation
-        YOUTUBE_OAUTH, CREDS_B64 = youtube_req.create_service_local(), None  # YouTube service in local mode
-        PROG_BAR = True  # Display progress bar
+    if exe_mode == 'local':  # Credentials in base64 update - Local option
+        youtube_req.encode_key(json_path=run_context.path('tokens', 'credentials.json'))
+        youtube_req.encode_key(json_path=run_context.path('tokens', 'oauth.json'))
+
+    elif exe_mode != 'fake':  # Credentials in base64 update - Remote option
+        update_repo_secrets(secret_name='CREDS_B64', new_value=warm['creds_b64'], logger=logger)
+
+    save_caches(logger)
+    atexit.unregister(export_metrics)
+    export_metrics(run_metrics, run_context.path('log'), logger)
+    runs.status = 'ended'
+    logger.info('Process ended.')  # End
+    runs.copy_run(run_context.path('log', 'last_exe.log'))  # Copy what happened during process execution
+    runs.end()
+
+
+def run_daemon(runs: run_log.RunLog, config: daemon.ConfigFiles, logger: logging.Logger, token_path: str):
+    """Run update cycles in a resident process: a first cycle right away, then on the update workflow schedule or when
+    triggered through the control endpoint. The YouTube service, caches and data files are kept in memory, data files
+    being parsed again when they change on disk
+    :param runs: run log
+    :param config: data files
+    :param logger: object for logging
+    :param token_path: control endpoint token file path (requests carry it in the 'X-Daemon-Token' header).
+    """
+    controller = daemon.Controller()
+    server = daemon.serve(controller, token=daemon.write_token(token_path), port=DAEMON_PORT)
+    signal.signal(signal.SIGTERM, lambda *_: controller.stop())  # Stop after the current cycle
+    logger.info('Daemon started, control endpoint listening on http://127.0.0.1:%s (token in %s).', server.server_port,
+                token_path)
+    warm = {}
 
-    else:
-        # YouTube service with GitHub workflow + Credentials
-        YOUTUBE_OAUTH, CREDS_B64 = youtube_req.create_service_workflow()
-        PROG_BAR = False  # Do not display progress bar
+    try:
+        while not controller.stopped:
+            reloaded = config.reload()
 
-    try:  # Try to update & sort livestreams playlist
-        current_live = youtube_req.iter_livestreams(music_channels, prog_bar=PROG_BAR)
-        youtube_req.update_playlist(YOUTUBE_OAUTH, playlists_lives, current_live, is_live=True, prog_bar=PROG_BAR)
-        # Livestream sorting
-        youtube_req.sort_livestreams(YOUTUBE_OAUTH, playlists_lives, prog_bar=PROG_BAR)
+            if reloaded and controller.status['cycles']:
+                logger.info('Data files reloaded: %s.', ', '.join(reloaded))
 
-    except requests.exceptions.ReadTimeout as timeout_error:
-        history_main.warning('TIMEOUT ERROR: Livestreams playlist update cancelled.')
+            run_context = youtube_req.init(RunContext.create(add_on=config.get('add_on')), log=False)
+            runs.rotate(now=run_context.now)  # History log handlers reopen the file if it is rotated
+            controller.update(state='running')
 
-    # Update mixes playlist
-    to_add = youtube_req.iter_channels(YOUTUBE_OAUTH, music_channels, prog_bar=PROG_BAR)
-    youtube_req.update_playlist(YOUTUBE_OAUTH, playlists_mixes, to_add, prog_bar=PROG_BAR)
+            try:
+                run_cycle(run_context, runs, config, warm, logger)
 
-    if exe_mode == 'local':  # Credentials in base64 update - Local option
-        youtube_req.encode_key(json_path='../tokens/credentials.json')
-        youtube_req.encode_key(json_path='../tokens/oauth.json')
+            except (Exception, SystemExit) as error:  # skipcq: PYL-W0703 - A failed cycle does not stop the daemon
+                logger.error('Cycle failed: %r', error)
+                atexit.unregister(export_metrics)
+                export_metrics(youtube_req.METRICS, run_context.path('log'), logger)
+                runs.end()
+
+            last_run = runs.run or {}
+            controller.update(cycles=controller.status['cycles'] + 1, last_cycle={
+                'start': last_run.get('start'), 'end': last_run.get('end'), 'status': runs.status})
+
+            try:
+                schedules = config.get('schedules')
+            except OSError:  # No workflow file, cycles are only triggered through the control endpoint
+                schedules = []
+
+            if controller.wait(daemon.next_run(schedules, dt.datetime.now(tz=dt.timezone.utc))) == 'triggered':
+                logger.info('Cycle triggered through the control endpoint.')
 
-    else:  # Credentials in base64 update - Remote option
-        update_repo_secrets(secret_name='CREDS_B64', new_value=CREDS_B64, logger=history_main)
+    except KeyboardInterrupt:
+        pass
 
-    history_main.info('Process ended.')  # End
-    copy_last_exe_log()  # Copy what happened during process execution to the associated file.
+    finally:
+        server.shutdown()
+        os.remove(token_path)
+        youtube_req.RESPONSE_CACHE.close()
+        logger.info('Daemon stopped.')
+
+
+if __name__ == '__main__':
+    # Run context: configuration and clock, then history log rotation (by size or month) before loggers open it
+    main_context = youtube_req.init(log=False)
+    run_index = run_log.RunLog(log_dir=main_context.path('log'))
+    run_index.rotate(now=main_context.now)
+
+    # Create loggers
+    history_main = logging.Logger(name='history_main', level=0)
+    main_context.attach_log(youtube_req.history)
+    main_context.attach_log(history_main)
+
+    # Data files and caches
+    data_files = config_files(main_context)
+    atexit.register(run_index.end)  # Run end is recorded even if the process is interrupted
+    open_caches(main_context)
+
+    if daemon_mode:
+        run_daemon(run_index, data_files, history_main, token_path=main_context.path('cache', 'daemon_token'))
+
+    else:
+        run_cycle(main_context, run_index, data_files, {}, history_main)
+        youtube_req.RESPONSE_CACHE.close()
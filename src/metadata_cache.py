@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import json
+import os
+import threading
+import time
+
+"""File Information
+@file_name: metadata_cache.py
+@author: Dylan "dyl-m" Monfret
+Persistent cache of YouTube metadata (channels, videos) with time-to-live and least recently used eviction.
+"""
+
+"CLASSES"
+
+
+class MetadataCache:
+    """JSON-backed key/value cache: entries expire after 'ttl' seconds, least recently used ones are evicted beyond
+    'max_size' entries."""
+
+    def __init__(self, path: str, ttl: float = None, max_size: int = 10000, name: str = 'Metadata'):
+        """Load the cache
+        :param path: cache JSON file path
+        :param ttl: entries lifetime in seconds (entries never expire if None)
+        :param max_size: maximum number of entries
+        :param name: cache name used in report.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # {key: [updated (timestamp), value]}, least recently used first
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf8') as cache_file:
+                self._entries.update((key, entry) for key, entry in json.load(cache_file))
+
+    def __contains__(self, key: str):
+        return key in self._entries
+
+    def get(self, key: str, now: float = None):
+        """Get a fresh value
+        :param key: entry key
+        :param now: current timestamp (time.time() if None)
+        :return: cached value, None if missing or expired.
+        """
+        now = time.time() if now is None else now
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if self.ttl is not None and now - entry[0] > self.ttl:
+                self.stale += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def get_many(self, keys: list, now: float = None):
+        """Get fresh values of several keys
+        :param keys: entries keys
+        :param now: current timestamp (time.time() if None)
+        :return found, missing: {key: value} of fresh entries, list of missing or expired keys.
+        """
+        found, missing = {}, []
+
+        for key in keys:
+            value = self.get(key, now=now)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+
+        return found, missing
+
+    def set(self, key: str, value, now: float = None):
+        """Store a value
+        :param key: entry key
+        :param value: JSON-serializable value
+        :param now: current timestamp (time.time() if None).
+        """
+        with self._lock:
+            self._entries[key] = [time.time() if now is None else now, value]
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def report(self):
+        """Summarize cache usage for the current run
+        :return: report as a string.
+        """
+        lookups = self.hits + self.misses + self.stale
+        hit_rate = 100 * self.hits / lookups if lookups else 0
+        return f'{self.name} cache: {self.hits} hit(s), {self.stale} stale, {self.misses} miss(es) ' \
+               f'({hit_rate:.0f}% hit rate), {len(self._entries)} entries.'
+
+    def save(self):
+        """Save the cache (entries order is kept for LRU eviction)."""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        with self._lock:
+            entries = list(self._entries.items())
+
+        with open(self.path, 'w', encoding='utf8') as cache_file:
+            json.dump(entries, cache_file)
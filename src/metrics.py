@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+"""File Information
+@file_name: metrics.py
+@author: Dylan "dyl-m" Monfret
+Run instrumentation: duration of phases, and per phase and per method counts, latency histograms, bytes, retries,
+errors and quota units. Exported per run as a JSON document and a Prometheus textfile, and summarized in one line.
+"""
+
+"GLOBAL"
+
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # Latency histogram upper bounds (seconds), '+Inf' excluded
+PREFIX = 'ayp'  # Prometheus metrics prefix
+
+"CLASSES"
+
+
+class Metrics:
+    """Thread-safe collector of phase durations and per-call measures."""
+
+    def __init__(self):
+        """Initialize an empty collector, run clock starting now."""
+        self.start = time.time()
+        self.phases = {}  # {phase: duration (seconds)}
+        self.calls = {}  # {(phase, method): measures}
+        self.current_phase = None
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """Time a phase and attribute calls made within the context to it
+        :param name: phase name.
+        """
+        previous, self.current_phase = self.current_phase, name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current_phase = previous
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+
+    def observe(self, method: str, seconds: float, count: int = 1, size: int = 0, units: int = 0, retries: int = 0,
+                errors: int = 0):
+        """Record a call (or a batch of calls sent in one round trip)
+        :param method: method name (e.g. 'youtube.videos.list')
+        :param seconds: call duration
+        :param count: number of requests sent
+        :param size: response size (bytes)
+        :param units: quota units spent
+        :param retries: number of retries
+        :param errors: number of failed requests.
+        """
+        key = (self.current_phase or 'other', method)
+
+        with self._lock:
+            measures = self.calls.setdefault(key, {'count': 0, 'round_trips': 0, 'seconds': 0.0, 'bytes': 0,
+                                                   'units': 0, 'retries': 0, 'errors': 0,
+                                                   'buckets': [0] * (len(BUCKETS) + 1)})
+            measures['count'] += count
+            measures['round_trips'] += 1
+            measures['seconds'] += seconds
+            measures['bytes'] += size
+            measures['units'] += units
+            measures['retries'] += retries
+            measures['errors'] += errors
+            measures['buckets'][next((idx for idx, bound in enumerate(BUCKETS) if seconds <= bound),
+                                     len(BUCKETS))] += 1
+
+    @contextlib.contextmanager
+    def timer(self, method: str, count: int = 1, units: int = 0):
+        """Time a call made within the context (failed if an exception is raised)
+        :param method: method name
+        :param count: number of requests sent
+        :param units: quota units spent
+        :return measure: dictionary to set response 'size', 'retries' and 'errors' counts of the call into.
+        """
+        measure = {'size': 0, 'retries': 0, 'errors': 0}
+        start = time.perf_counter()
+        failed = True
+        try:
+            yield measure
+            failed = False
+        finally:
+            self.observe(method, time.perf_counter() - start, count=count, size=measure['size'], units=units,
+                         retries=measure['retries'], errors=max(measure['errors'], int(failed)))
+
+    def totals(self):
+        """Sum measures of every phase and method
+        :return: totals as a dictionary.
+        """
+        keys = ('count', 'round_trips', 'seconds', 'bytes', 'units', 'retries', 'errors')
+
+        with self._lock:
+            return {key: sum(measures[key] for measures in self.calls.values()) for key in keys}
+
+    def to_dict(self):
+        """Export measures
+        :return: run document (JSON-serializable dictionary).
+        """
+        with self._lock:
+            calls = [{'phase': phase, 'method': method, **measures,
+                      'buckets': dict(zip([str(bound) for bound in BUCKETS] + ['+Inf'], measures['buckets']))}
+                     for (phase, method), measures in sorted(self.calls.items())]
+            phases = dict(self.phases)
+
+        return {'start': self.start, 'duration': time.time() - self.start, 'phases': phases, 'calls': calls,
+                'totals': self.totals()}
+
+    def save_json(self, path: str):
+        """Save measures as a JSON document
+        :param path: file path.
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        with open(path, 'w', encoding='utf8') as json_file:
+            json.dump(self.to_dict(), json_file, indent=2)
+
+    def save_prometheus(self, path: str):
+        """Save measures as a Prometheus textfile (node exporter textfile collector format)
+        :param path: file path.
+        """
+        document = self.to_dict()
+        lines = [f'# TYPE {PREFIX}_run_duration_seconds gauge',
+                 f'{PREFIX}_run_duration_seconds {document["duration"]:.3f}',
+                 f'# TYPE {PREFIX}_run_start_timestamp_seconds gauge',
+                 f'{PREFIX}_run_start_timestamp_seconds {document["start"]:.0f}',
+                 f'# TYPE {PREFIX}_phase_duration_seconds gauge']
+        lines += [f'{PREFIX}_phase_duration_seconds{{phase="{phase}"}} {seconds:.3f}'
+                  for phase, seconds in document['phases'].items()]
+        counters = {'count': 'requests_total', 'round_trips': 'round_trips_total', 'bytes': 'response_bytes_total',
+                    'units': 'quota_units_total', 'retries': 'retries_total', 'errors': 'errors_total'}
+
+        for key, name in counters.items():
+            lines.append(f'# TYPE {PREFIX}_{name} counter')
+            lines += [f'{PREFIX}_{name}{{phase="{call["phase"]}",method="{call["method"]}"}} {call[key]}'
+                      for call in document['calls']]
+
+        lines.append(f'# TYPE {PREFIX}_call_duration_seconds histogram')
+
+        for call in document['calls']:
+            labels = f'phase="{call["phase"]}",method="{call["method"]}"'
+            cumulative = 0
+
+            for bound, count in call['buckets'].items():
+                cumulative += count
+                lines.append(f'{PREFIX}_call_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+
+            lines += [f'{PREFIX}_call_duration_seconds_sum{{{labels}}} {call["seconds"]:.3f}',
+                      f'{PREFIX}_call_duration_seconds_count{{{labels}}} {call["round_trips"]}']
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        with open(f'{path}.tmp', 'w', encoding='utf8') as prom_file:  # Atomic replacement, as expected by collectors
+            prom_file.write('\n'.join(lines) + '\n')
+
+        os.replace(f'{path}.tmp', path)
+
+    def summary(self):
+        """Summarize the run in one line
+        :return: summary as a string.
+        """
+        document = self.to_dict()
+        totals = document['totals']
+        phases = ', '.join(f'{phase} {seconds:.1f}s' for phase, seconds in document['phases'].items())
+        return f'Metrics: {document["duration"]:.1f}s ({phases or "no phase"}), {totals["count"]} request(s) in ' \
+               f'{totals["round_trips"]} round trip(s), {totals["seconds"]:.1f}s waiting, ' \
+               f'{totals["bytes"] / 1024 ** 2:.1f} MiB, {totals["units"]} unit(s), {totals["retries"]} retry(ies), ' \
+               f'{totals["errors"]} error(s).'
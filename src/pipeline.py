@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+import contextlib
+import queue
+import threading
+
+import playlist_diff
+import youtube_req
+
+from feeds import FeedCache
+from poll_scheduler import PollScheduler
+from rate_limit import TokenBucket
+
+"""File Information
+@file_name: pipeline.py
+@author: Dylan "dyl-m" Monfret
+Streaming update of the mixes playlist: discovery -> stats enrichment and filtering -> insertion, each stage running in
+its own thread and connected to the next one by a bounded queue (a slow stage makes the previous ones wait).
+"""
+
+"GLOBAL"
+
+END = object()  # End of stream marker
+
+"LOGGERS"
+
+history = youtube_req.history
+
+"CLASSES"
+
+
+class Stage(threading.Thread):
+    """Pipeline stage: a thread running a function, failures (including 'sys.exit') being kept for the caller."""
+
+    def __init__(self, name: str, function, stop: threading.Event):
+        """Initialize the stage
+        :param name: stage name
+        :param function: function run by the stage
+        :param stop: event set when a stage fails, for the other stages to stop.
+        """
+        super().__init__(name=name, daemon=True)
+        self.function = function
+        self.stop = stop
+        self.error = None
+
+    def run(self):
+        """Run the stage function."""
+        try:
+            self.function()
+        except BaseException as error:  # skipcq: PYL-W0703 - Re-raised by the caller, in the main thread
+            self.error = error
+            self.stop.set()
+
+
+"FUNCTIONS"
+
+
+def put(a_queue: queue.Queue, value, stop: threading.Event):
+    """Put a value in a bounded queue, waiting for a free slot unless the pipeline is stopped
+    :param a_queue: queue
+    :param value: value to put
+    :param stop: pipeline stop event.
+    """
+    while not stop.is_set():
+        try:
+            a_queue.put(value, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def get_chunk(a_queue: queue.Queue, size: int, flush_after: float, stop: threading.Event):
+    """Get up to 'size' values from a queue, returning early when no value came for 'flush_after' seconds
+    :param a_queue: queue
+    :param size: maximum number of values
+    :param flush_after: idle time (seconds) after which an incomplete chunk is returned
+    :param stop: pipeline stop event
+    :return chunk, ended: list of values and True if the end of stream has been reached.
+    """
+    chunk = []
+
+    while len(chunk) < size and not stop.is_set():
+        try:
+            value = a_queue.get(timeout=flush_after if chunk else 0.1)
+        except queue.Empty:
+            if chunk:
+                break
+            continue
+
+        if value is END:
+            return chunk, True
+        chunk.append(value)
+
+    return chunk, stop.is_set()
+
+
+def update_mixes(service, playlist_id: str, channels: list, watermarks=None, workers: int = 1, rate: float = None,
+                 queue_size: int = 200, flush_after: float = 2.0, min_duration: int = 10, log: bool = True,
+                 scheduler: PollScheduler = None, feed_cache: FeedCache = None):
+    """Update the mixes playlist in streaming: new videos of each channel are enriched, filtered and inserted as soon
+    as they are discovered. The final playlist is the same as with 'iter_channels' then 'update_playlist'
+    :param service: a YouTube service build with 'googleapiclient.discovery'
+    :param playlist_id: a YouTube playlist ID
+    :param channels: list of YouTube channel IDs
+    :param watermarks: per-playlist watermarks (see 'youtube_req.iter_channel_items')
+    :param workers: number of playlists browsed concurrently
+    :param rate: maximum number of API requests per second, shared by workers (no limit if None)
+    :param queue_size: maximum number of values waiting between two stages
+    :param flush_after: idle time (seconds) after which an incomplete chunk of videos is processed
+    :param min_duration: minimal video duration filter (minutes)
+    :param log: to apply logging or not
+    :param scheduler: poll scheduler selecting the playlists browsed (all playlists if None)
+    :param feed_cache: feeds validators, to discover new uploads with channel feeds (see
+    'youtube_req.iter_channel_items')
+    :return: list of video IDs added.
+    """
+    in_playlist = youtube_req.get_playlist_items(service=service, playlist_id=playlist_id)
+    seen = {item['video_id'] for item in in_playlist}  # Videos already in the playlist or selected
+    requested = set()  # Videos whose stats have been requested
+    added = []
+    stop = threading.Event()
+    candidates, selected = queue.Queue(maxsize=queue_size), queue.Queue(maxsize=queue_size)
+    limiter = TokenBucket(rate=rate, burst=workers) if rate else None
+
+    def discover():
+        """Discovery stage: browse uploads playlists and send their new items."""
+        playlists = youtube_req.channel_playlists(channels)
+
+        if scheduler is not None:
+            playlists = scheduler.select(playlists)
+
+        item_it = youtube_req.iter_channel_items(service, playlists, watermarks=watermarks, workers=workers,
+                                                 limiter=limiter, scheduler=scheduler, feed_cache=feed_cache)
+
+        with contextlib.closing(item_it):  # Pending playlists are dropped if the pipeline stops
+            for items in item_it:
+                for item in items:
+                    put(candidates, item, stop)
+
+                if stop.is_set():
+                    return
+
+        put(candidates, END, stop)
+
+    def enrich():
+        """Enrichment stage: get stats of new candidates by chunks of 50, then apply duration and premiere filters."""
+        youtube_req.init_worker(service, limiter)
+        ended = False
+
+        while not ended:
+            chunk, ended = get_chunk(candidates, youtube_req.BATCH_SIZE, flush_after, stop)
+            chunk = [item for item in chunk if item['video_id'] not in seen and item['video_id'] not in requested]
+            chunk = youtube_req.unseen_videos(chunk)  # Videos already evaluated in a previous run
+            requested.update(item['video_id'] for item in chunk)
+
+            if chunk and not stop.is_set():
+                stats = {item['video_id']: item for item in youtube_req.get_stats(service=service, videos_list=chunk)}
+
+                to_add = playlist_diff.new_videos(chunk, [], stats=stats, min_duration=min_duration, seen=seen)
+                youtube_req.mark_seen([], stats, min_duration)  # Videos are marked as added once inserted
+
+                for video_id in to_add:
+                    put(selected, video_id, stop)
+
+        put(selected, END, stop)
+
+    def insert():
+        """Insertion stage: add selected videos by batches of 50."""
+        youtube_req.init_worker(service, limiter)
+        ended = False
+
+        while not ended:
+            chunk, ended = get_chunk(selected, youtube_req.BATCH_SIZE, flush_after, stop)
+
+            if chunk and not stop.is_set():
+                inserted = youtube_req.add_to_playlist(service=service, playlist_id=playlist_id, videos_list=chunk,
+                                                       prog_bar=False)
+                youtube_req.mark_seen(inserted, {}, min_duration)  # Failed insertions are evaluated again next run
+                added.extend(inserted)
+
+    stages = [Stage('discover', discover, stop), Stage('enrich', enrich, stop), Stage('insert', insert, stop)]
+
+    for stage in stages:
+        stage.start()
+
+    for stage in stages:
+        stage.join()
+
+    for stage in stages:  # First failure (e.g. quota exceeded) is raised in the main thread
+        if stage.error is not None:
+            raise stage.error
+
+    # Removal of old videos, from the listing made before insertions (inserted videos are not concerned)
+    plan = youtube_req.update_playlist(service, playlist_id, [], prog_bar=False, log=False, in_playlist=in_playlist)
+
+    if log:
+        if added:
+            history.info('%s new video(s) added.', len(added))
+        if plan.to_del:
+            history.info('%s video(s) removed.', len(plan.to_del))
+        if not added and not plan.to_del:
+            history.info('No video added or removed.')
+
+    return added
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+import bisect
+import datetime as dt
+import typing
+
+"""File Information
+@file_name: playlist_diff.py
+@author: Dylan "dyl-m" Monfret
+Playlist diff engine: videos to add to and to remove from a playlist, computed with keyed dictionaries and sets.
+"""
+
+"CLASSES"
+
+
+class PlaylistItem(typing.NamedTuple):
+    """A video in a playlist, as returned by 'youtube_req.get_playlist_items'."""
+
+    video_id: str
+    item_id: str
+    release_date: dt.datetime
+    status: str
+    channel_id: str
+    channel_name: str
+
+
+class Plan(typing.NamedTuple):
+    """Playlist update plan: video IDs to add and playlist items to delete."""
+
+    to_add: list
+    to_del: list
+
+
+"FUNCTIONS"
+
+
+def to_items(items: list):
+    """Convert playlist items to records
+    :param items: list of dictionaries from 'youtube_req.get_playlist_items'
+    :return: list of PlaylistItem.
+    """
+    return [PlaylistItem._make(map(item.get, PlaylistItem._fields)) for item in items]
+
+
+def expired_items(items: list, date_delta: dt.datetime):
+    """Select private videos and videos released before a date
+    :param items: list of PlaylistItem
+    :param date_delta: oldest release date kept
+    :return: list of PlaylistItem to delete.
+    """
+    return [item for item in items
+            if item.status == 'private' or (item.release_date is not None and item.release_date < date_delta)]
+
+
+def ended_livestreams(items: list, live_status: dict):
+    """Select livestreams which are not public or not live anymore
+    :param items: list of PlaylistItem
+    :param live_status: {video ID: broadcast status}, videos not found being missing
+    :return: list of PlaylistItem to delete.
+    """
+    return [item for item in items
+            if item.status in {'private', 'privacyStatusUnspecified'} or live_status.get(item.video_id) != 'live']
+
+
+def new_videos(candidates: list, items: list, stats: dict = None, min_duration: int = 0, seen: set = None):
+    """Select candidates not already in a playlist, keeping order and dropping duplicates
+    :param candidates: list of dictionaries with (at least) a 'video_id' key
+    :param items: list of PlaylistItem already in the playlist
+    :param stats: {video ID: 'youtube_req.get_stats' item}, to filter out short videos, premieres and videos not found
+    (no filter if None)
+    :param min_duration: minimal video duration (minutes), when 'stats' is given
+    :param seen: video IDs already selected, updated with new ones (to select videos chunk by chunk)
+    :return: list of video IDs to add.
+    """
+    seen = set() if seen is None else seen
+    seen.update(item.video_id for item in items)
+    to_add = []
+
+    for candidate in candidates:
+        video_id = candidate['video_id']
+
+        if video_id in seen:
+            continue
+
+        if stats is not None:
+            video_stats = stats.get(video_id)
+            if video_stats is None or video_stats['duration'] < min_duration * 60 or \
+                    video_stats['live_status'] == 'upcoming':
+                continue
+
+        seen.add(video_id)
+        to_add.append(video_id)
+
+    return to_add
+
+
+def short_videos(stats: dict, min_duration: int):
+    """Select videos rejected for their duration (livestreams and premieres, without duration yet, excluded)
+    :param stats: {video ID: 'youtube_req.get_stats' item}
+    :param min_duration: minimal video duration (minutes)
+    :return: list of video IDs.
+    """
+    return [video_id for video_id, video_stats in stats.items()
+            if video_stats['live_status'] == 'none' and video_stats['duration'] < min_duration * 60]
+
+
+def history_records(items: list, subscribers: dict, stats: dict):
+    """Build history records of deleted videos
+    :param items: list of PlaylistItem
+    :param subscribers: {channel ID: subscribers count}
+    :param stats: {video ID: 'youtube_req.get_stats' item}
+    :return: list of dictionaries (see 'history_store.FIELDS'), one per distinct item.
+    """
+    records = {}
+
+    for item in items:
+        if item.item_id in records:  # Same playlist item listed twice
+            continue
+
+        video_stats = stats.get(item.video_id, {})
+        records[item.item_id] = {**item._asdict(), 'subscribers': subscribers.get(item.channel_id),
+                                 **{key: value for key, value in video_stats.items() if key != 'video_id'}}
+
+    return list(records.values())
+
+
+def reorder_moves(current: list, target: list):
+    """Plan the smallest set of moves sorting a playlist: items of the longest subsequence already in target order stay
+    in place, each other item is moved right after its predecessor in target order (positions simulated offline)
+    :param current: item keys in current playlist order
+    :param target: same item keys in target order
+    :return moves: list of (item key, new position) tuples, to apply one after another.
+    """
+    rank = {key: index for index, key in enumerate(target)}
+    ranks = [rank[key] for key in current]
+
+    # Longest increasing subsequence of target ranks (patience sorting), items to keep in place
+    tails, tails_idx, previous = [], [], [None] * len(ranks)
+
+    for index, value in enumerate(ranks):
+        position = bisect.bisect_left(tails, value)
+        previous[index] = tails_idx[position - 1] if position else None
+
+        if position == len(tails):
+            tails.append(value)
+            tails_idx.append(index)
+        else:
+            tails[position] = value
+            tails_idx[position] = index
+
+    kept, index = set(), tails_idx[-1] if tails_idx else None
+
+    while index is not None:
+        kept.add(current[index])
+        index = previous[index]
+
+    simulated, moves = list(current), []
+
+    for index, key in enumerate(target):
+        if key in kept:
+            continue
+
+        simulated.remove(key)
+        new_position = simulated.index(target[index - 1]) + 1 if index else 0
+        simulated.insert(new_position, key)
+        moves.append((key, new_position))
+
+    return moves
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import datetime as dt
+import json
+import os
+import threading
+
+import history_store
+from watermarks import WatermarkStore
+
+"""File Information
+@file_name: poll_scheduler.py
+@author: Dylan "dyl-m" Monfret
+Adaptive polling of uploads playlists: each channel upload rate and usual release hours are learned from history and
+watermarks, rarely active channels are polled less often (with a maximum staleness) and active ones on every run.
+"""
+
+"CLASSES"
+
+
+class PollScheduler:
+    """Select the uploads playlists worth browsing in a run, last poll dates being staged then saved like watermarks."""
+
+    def __init__(self, watermarks: WatermarkStore, path: str = '../data/poll_schedule.json',
+                 history_dir: str = history_store.HISTORY_DIR, now: dt.datetime = None, window: int = 28, lag: int = 7,
+                 hot_rate: float = 1.0, min_expected: float = 0.25, max_staleness: float = 72):
+        """Load last poll dates and learn channels activity
+        :param watermarks: per-playlist watermarks (playlists without watermark are always polled)
+        :param path: poll schedule JSON file path
+        :param history_dir: history directory
+        :param now: reference date (current date if None)
+        :param window: number of days of history used to learn activity
+        :param lag: days before a release is written in history (recent releases are known from watermarks)
+        :param hot_rate: uploads per day from which a channel is polled on every run
+        :param min_expected: expected new uploads since the last poll from which a channel is polled
+        :param max_staleness: maximum delay (hours) between two polls of a channel.
+        """
+        self.path = path
+        self.watermarks = watermarks
+        self.now = now or dt.datetime.now(tz=dt.timezone.utc)
+        self.hot_rate = hot_rate
+        self.min_expected = min_expected
+        self.max_staleness = dt.timedelta(hours=max_staleness)
+        self.last_polled = {}
+        self.reasons = collections.Counter()
+        self._staged = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf8') as schedule_file:
+                self.last_polled = {playlist_id: dt.datetime.fromisoformat(date)
+                                    for playlist_id, date in json.load(schedule_file).items()}
+
+        # Uploads per channel and per UTC hour, over the complete part of the history window
+        end = self.now - dt.timedelta(days=lag)
+        self.window = window
+        self.hours = {}  # {playlist ID: uploads per UTC hour}
+
+        for row in history_store.read(start=end - dt.timedelta(days=window), end=end,
+                                      columns=['channel_id', 'release_date'], history_dir=history_dir):
+            if row['channel_id']:
+                release_date = dt.datetime.fromisoformat(row['release_date']).astimezone(dt.timezone.utc)
+                self.hours.setdefault(f'UU{row["channel_id"][2:]}', [0] * 24)[release_date.hour] += 1
+
+    def upload_rate(self, playlist_id: str):
+        """Estimate the upload rate of a channel, its newest upload counting if it is not in history yet
+        :param playlist_id: a YouTube uploads playlist ID
+        :return: uploads per day.
+        """
+        uploads = sum(self.hours.get(playlist_id, []))
+        watermark = self.watermarks.get(playlist_id)
+
+        if watermark and watermark['video_id'] and self.now - watermark['published_at'] < dt.timedelta(days=7):
+            uploads += 1
+
+        return uploads / self.window
+
+    def expected_uploads(self, playlist_id: str, since: dt.datetime):
+        """Expected number of uploads of a channel since a date, weighted by its usual release hours
+        :param playlist_id: a YouTube uploads playlist ID
+        :param since: last poll date
+        :return: expected number of uploads.
+        """
+        counts = self.hours.get(playlist_id, [0] * 24)
+        total = sum(counts)
+        share = [(count + 1) / (total + 24) for count in counts]  # Hours distribution, uniform without history
+        elapsed = int((self.now - since).total_seconds() // 3600)
+        first_hour = since.astimezone(dt.timezone.utc).hour
+        covered = elapsed // 24 + sum(share[(first_hour + hour) % 24] for hour in range(elapsed % 24))
+        return self.upload_rate(playlist_id) * covered
+
+    def due(self, playlist_id: str):
+        """Decide if a playlist is polled in this run
+        :param playlist_id: a YouTube uploads playlist ID
+        :return: reason to poll ('new', 'stale', 'hot' or 'expected') or None to skip it.
+        """
+        last_polled = self.last_polled.get(playlist_id)
+
+        if last_polled is None or self.watermarks.get(playlist_id) is None:  # Nothing to resume browsing from
+            return 'new'
+        if self.now - last_polled >= self.max_staleness:
+            return 'stale'
+        if self.upload_rate(playlist_id) >= self.hot_rate:
+            return 'hot'
+        if self.expected_uploads(playlist_id, last_polled) >= self.min_expected:
+            return 'expected'
+        return None
+
+    def select(self, playlists: list):
+        """Select playlists to poll in this run, keeping their order
+        :param playlists: list of YouTube uploads playlist IDs
+        :return selected: list of YouTube uploads playlist IDs to poll.
+        """
+        selected = []
+
+        for playlist_id in playlists:
+            reason = self.due(playlist_id)
+            self.reasons[reason or 'skipped'] += 1
+
+            if reason:
+                selected.append(playlist_id)
+
+        return selected
+
+    def stage(self, playlist_id: str):
+        """Stage the poll date of a playlist after browsing it
+        :param playlist_id: a YouTube uploads playlist ID.
+        """
+        with self._lock:
+            self._staged[playlist_id] = self.now
+
+    def report(self):
+        """Summarize polling decisions
+        :return: report as a string.
+        """
+        polled = sum(count for reason, count in self.reasons.items() if reason != 'skipped')
+        details = ', '.join(f'{count} {reason}' for reason, count in sorted(self.reasons.items()))
+        return f'Poll scheduler: {polled} of {sum(self.reasons.values())} channel(s) polled ({details or "none"}).'
+
+    def save(self):
+        """Apply staged poll dates and save them."""
+        with self._lock:
+            self.last_polled.update(self._staged)
+            self._staged = {}
+
+        with open(self.path, 'w', encoding='utf8') as schedule_file:
+            json.dump({playlist_id: date.isoformat() for playlist_id, date in sorted(self.last_polled.items())},
+                      schedule_file, indent=2)
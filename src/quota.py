@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import contextlib
+import datetime as dt
+import json
+import os
+import threading
+import zoneinfo
+
+"""File Information
+@file_name: quota.py
+@author: Dylan "dyl-m" Monfret
+Quota ledger of YouTube Data API units: cost of each method, units spent per run and per day, phases cost estimation.
+"""
+
+"GLOBAL"
+
+COSTS = {'youtube.channels.list': 1,
+         'youtube.playlistItems.delete': 50,
+         'youtube.playlistItems.insert': 50,
+         'youtube.playlistItems.list': 1,
+         'youtube.playlistItems.update': 50,
+         'youtube.videos.list': 1}  # Units per request (https://developers.google.com/youtube/v3/determine_quota_cost)
+
+DAILY_QUOTA = 10000  # Default quota of a Google Cloud project, reset at midnight Pacific Time
+QUOTA_TZ = zoneinfo.ZoneInfo('America/Los_Angeles')
+
+# Phase estimations used when no previous run has been recorded, 'mixes' estimation also includes a page per channel
+DEFAULT_ESTIMATES = {'lives': 300, 'lives_sort': 500, 'mixes': 500}
+
+"CLASSES"
+
+
+class QuotaLedger:
+    """Count API units spent per run, per day and per phase, then estimate phases cost from the previous run."""
+
+    def __init__(self, path: str = '../data/quota.json', daily_quota: int = DAILY_QUOTA, margin: float = 0.1):
+        """Load the ledger
+        :param path: ledger JSON file path
+        :param daily_quota: number of units available per day
+        :param margin: part of estimations added as a safety margin.
+        """
+        self.path = path
+        self.daily_quota = daily_quota
+        self.margin = margin
+        self.run_units = 0
+        self.run_calls = collections.defaultdict(collections.Counter)  # {phase: {method: calls}}
+        self.current_phase = None
+        self._lock = threading.Lock()
+
+        state = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf8') as ledger_file:
+                state = json.load(ledger_file)
+
+        self.day = self.quota_day()
+        self.day_units = state.get('day_units', 0) if state.get('day') == self.day else 0
+        self.last_run = state.get('last_run', {})
+        self.last_channels = state.get('last_channels')
+
+    @staticmethod
+    def quota_day():
+        """Get current quota day (quota is reset at midnight Pacific Time)
+        :return: date as ISO string.
+        """
+        return dt.datetime.now(tz=QUOTA_TZ).date().isoformat()
+
+    @property
+    def remaining(self):
+        """Units still available today."""
+        return self.daily_quota - self.day_units
+
+    def charge(self, method_id: str, count: int = 1):
+        """Record API requests
+        :param method_id: API method ID (e.g. 'youtube.videos.list')
+        :param count: number of requests.
+        """
+        units = COSTS.get(method_id, 1) * count
+
+        with self._lock:
+            self.run_units += units
+            self.day_units += units
+            self.run_calls[self.current_phase or 'other'][method_id] += count
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """Attribute requests sent within the context to a phase
+        :param name: phase name.
+        """
+        previous, self.current_phase = self.current_phase, name
+        try:
+            yield
+        finally:
+            self.current_phase = previous
+
+    def estimate(self, phase: str, n_channels: int = 0):
+        """Estimate the cost of a phase from the calls recorded during the previous run
+        :param phase: phase name
+        :param n_channels: number of channels browsed during the phase (to scale playlist pages)
+        :return: estimated units.
+        """
+        calls = self.last_run.get(phase)
+
+        if not calls:
+            return int(DEFAULT_ESTIMATES.get(phase, 0) + (n_channels if phase == 'mixes' else 0))
+
+        units = 0
+        for method_id, count in calls.items():
+            if method_id == 'youtube.playlistItems.list' and n_channels and self.last_channels:
+                count = count * n_channels / self.last_channels  # Pages scale with the number of channels
+            units += COSTS.get(method_id, 1) * count
+
+        return int(units * (1 + self.margin)) + 1
+
+    def plan(self, phases: list, n_channels: int = 0):
+        """Select the phases fitting in the remaining daily budget
+        :param phases: phases names, ordered by priority
+        :param n_channels: number of channels browsed
+        :return selected, skipped: dictionaries {phase: estimated units}.
+        """
+        budget = self.remaining
+        selected, skipped = {}, {}
+
+        for phase in phases:
+            cost = self.estimate(phase, n_channels=n_channels)
+            if cost <= budget:
+                selected[phase] = cost
+                budget -= cost
+            else:
+                skipped[phase] = cost
+
+        return selected, skipped
+
+    def report(self):
+        """Summarize quota usage
+        :return: report as a string.
+        """
+        return f'Quota: {self.run_units} unit(s) spent this run, {self.day_units} today ({self.remaining} remaining).'
+
+    def save(self, n_channels: int = None, completed: bool = True):
+        """Save daily consumption and calls of the current run
+        :param n_channels: number of channels browsed during the run
+        :param completed: False if the run was interrupted, its calls then not replacing the previous run estimates.
+        """
+        last_run = {phase: dict(calls) for phase, calls in self.run_calls.items()} if completed else self.last_run
+        state = {'day': self.day,
+                 'day_units': self.day_units,
+                 'last_run': last_run,
+                 'last_channels': (n_channels if completed else None) or self.last_channels}
+
+        with open(self.path, 'w', encoding='utf8') as ledger_file:
+            json.dump(state, ledger_file, indent=2)
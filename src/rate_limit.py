@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+import urllib.parse
+
+"""File Information
+@file_name: rate_limit.py
+@author: Dylan "dyl-m" Monfret
+Thread-safe token buckets used to pace requests sent by concurrent workers.
+"""
+
+"CLASSES"
+
+
+class TokenBucket:
+    """Token bucket shared between threads: 'rate' tokens are added per second, up to 'burst' tokens."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """Initialize the bucket
+        :param rate: number of tokens added per second
+        :param burst: maximum number of tokens kept in the bucket.
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float = None):
+        """Wait until a token is available then consume it
+        :param timeout: maximum waiting time in seconds (wait indefinitely if None)
+        :return: True if a token has been consumed, False if timeout has been reached.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while 1:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+
+                wait = (1 - self._tokens) / self.rate
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """Collection of token buckets, one per host."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """Initialize the limiter
+        :param rate: number of requests allowed per second and per host
+        :param burst: number of requests allowed at once for a host.
+        """
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url: str, timeout: float = None):
+        """Wait for the bucket associated to a URL host
+        :param url: requested URL
+        :param timeout: maximum waiting time in seconds (wait indefinitely if None)
+        :return: True if the request can be sent, False if timeout has been reached.
+        """
+        host = urllib.parse.urlsplit(url).netloc
+
+        with self._lock:
+            bucket = self._buckets.setdefault(host, TokenBucket(rate=self.rate, burst=self.burst))
+
+        return bucket.acquire(timeout=timeout)
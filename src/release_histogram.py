@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+import datetime as dt
+import json
+import os
+import threading
+
+import history_store
+
+"""File Information
+@file_name: release_histogram.py
+@author: Dylan "dyl-m" Monfret
+Weekday x hour (UTC) release counts of videos, kept per ISO week and updated as history is written.
+"""
+
+"CLASSES"
+
+
+class ReleaseHistogram:
+    """Persistent release counts per ISO week ({'YYYY-Www': 7 x 24 counts, Monday first}), built from history once
+    then updated with the records appended to it."""
+
+    def __init__(self, path: str = '../data/release_histogram.json', history_dir: str = history_store.HISTORY_DIR,
+                 keep_weeks: int = 10):
+        """Load the histogram, or build it from history if it has never been saved
+        :param path: histogram JSON file path
+        :param history_dir: history directory
+        :param keep_weeks: number of weeks kept (older ones are dropped when saving).
+        """
+        self.path = path
+        self.keep_weeks = keep_weeks
+        self.weeks = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf8') as histogram_file:
+                self.weeks = json.load(histogram_file)
+
+        else:
+            start = dt.datetime.now(tz=dt.timezone.utc) - dt.timedelta(weeks=keep_weeks)
+            self.add(history_store.read(start=start, columns=['release_date'], history_dir=history_dir))
+
+    @staticmethod
+    def week_key(date: dt.datetime):
+        """Get the ISO week key of a date
+        :param date: date as datetime.datetime object
+        :return: week key ('YYYY-Www').
+        """
+        year, week, _ = date.isocalendar()
+        return f'{year}-W{week:02d}'
+
+    def add(self, records: list):
+        """Count releases of history records
+        :param records: list of dictionaries with a 'release_date' (datetime.datetime object or ISO string) key
+        :return: number of releases counted.
+        """
+        counted = 0
+
+        with self._lock:
+            for record in records:
+                release_date = record.get('release_date')
+
+                if not release_date:
+                    continue
+
+                if isinstance(release_date, str):
+                    release_date = dt.datetime.fromisoformat(release_date)
+
+                release_date = release_date.astimezone(dt.timezone.utc)
+                counts = self.weeks.setdefault(self.week_key(release_date), [[0] * 24 for _ in range(7)])
+                counts[release_date.weekday()][release_date.hour] += 1
+                counted += 1
+
+        return counted
+
+    def window(self, now: dt.datetime, weeks: int = 5, lag: int = 7):
+        """Get counts of the complete weeks before a lag, weeks without any release included
+        :param now: reference date
+        :param weeks: number of weeks
+        :param lag: delay (days) before releases are written in history
+        :return: list of 7 x 24 counts, one per week (oldest first).
+        """
+        last = now.astimezone(dt.timezone.utc) - dt.timedelta(days=lag)
+        keys = [self.week_key(last - dt.timedelta(weeks=offset)) for offset in range(weeks, 0, -1)]
+
+        with self._lock:
+            return [self.weeks.get(key, [[0] * 24 for _ in range(7)]) for key in keys]
+
+    def save(self, now: dt.datetime = None):
+        """Drop old weeks, then save the histogram (one line per week)
+        :param now: reference date (current date if None).
+        """
+        now = now or dt.datetime.now(tz=dt.timezone.utc)
+        oldest = self.week_key(now - dt.timedelta(weeks=self.keep_weeks))
+
+        with self._lock:
+            self.weeks = {key: counts for key, counts in sorted(self.weeks.items()) if key >= oldest}
+            lines = [f'  {json.dumps(key)}: {json.dumps(counts)}' for key, counts in self.weeks.items()]
+
+        with open(self.path, 'w', encoding='utf8') as histogram_file:
+            histogram_file.write('{\n' + ',\n'.join(lines) + '\n}\n' if lines else '{}\n')
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+import datetime as dt
+import json
+import os
+
+"""File Information
+@file_name: run_log.py
+@author: Dylan "dyl-m" Monfret
+Run log bookkeeping: per-run index (start offset, start time, end status), backward seek in log files and history log
+rotation, so that start and end bookkeeping cost does not depend on log size.
+"""
+
+"GLOBAL"
+
+INDEX_FILE = 'runs.jsonl'  # One JSON line per event: run start ('offset', 'start') then run end ('end', 'status')
+START_MARKER = b'Process started.'
+
+"FUNCTIONS"
+
+
+def tail_lines(path: str, n_lines: int = 1, block_size: int = 4096):
+    """Read the last lines of a file, seeking backwards from its end
+    :param path: file path
+    :param n_lines: number of lines
+    :param block_size: size of blocks read backwards
+    :return: list of lines (bytes, without line break).
+    """
+    with open(path, 'rb') as file:
+        position = file.seek(0, os.SEEK_END)
+        data = b''
+
+        while position > 0 and data.count(b'\n') <= n_lines:
+            step = min(block_size, position)
+            position -= step
+            file.seek(position)
+            data = file.read(step) + data
+
+    return [line for line in data.splitlines() if line][-n_lines:]
+
+
+def find_last_marker(path: str, marker: bytes = START_MARKER, block_size: int = 65536):
+    """Find the offset of the last line containing a marker, seeking backwards from the end of a file
+    :param path: file path
+    :param marker: text to look for
+    :param block_size: size of blocks read backwards
+    :return: offset of the beginning of the line, None if the marker is not found.
+    """
+    with open(path, 'rb') as file:
+        position = file.seek(0, os.SEEK_END)
+        data = b''
+
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            file.seek(position)
+            data = file.read(step) + data
+            found = data.rfind(marker)
+
+            if found != -1:
+                line_start = data.rfind(b'\n', 0, found)
+                if line_start != -1 or position == 0:
+                    return position + line_start + 1
+                data = data[:found + len(marker)]  # Line start is in a previous block
+
+            else:
+                data = data[:len(marker)]  # Overlap for markers split between blocks
+
+    return None
+
+
+"CLASSES"
+
+
+class RunLog:
+    """Per-run index of the history log, with rotation of the history log by size or by month."""
+
+    def __init__(self, log_dir: str, log_file: str = 'history.log', max_size: int = 4 * 1024 ** 2,
+                 monthly: bool = True):
+        """Initialize the run log
+        :param log_dir: log directory
+        :param log_file: history log file name
+        :param max_size: history log size (bytes) above which it is rotated
+        :param monthly: to rotate history log when a new month starts.
+        """
+        self.log_dir = log_dir
+        self.log_file = log_file
+        self.max_size = max_size
+        self.monthly = monthly
+        self.status = 'failed'  # Until the run is flagged as ended
+        self.run = None
+
+    @property
+    def log_path(self):
+        """History log file path."""
+        return f'{self.log_dir}/{self.log_file}'
+
+    @property
+    def index_path(self):
+        """Run index file path."""
+        return f'{self.log_dir}/{INDEX_FILE}'
+
+    def last_events(self, n_events: int = 2):
+        """Read the last events of the run index
+        :param n_events: number of events
+        :return: list of events (dictionaries).
+        """
+        if not os.path.exists(self.index_path):
+            return []
+        return [json.loads(line) for line in tail_lines(self.index_path, n_lines=n_events)]
+
+    def last_run(self, ended: bool = True, n_events: int = 16):
+        """Get the last run recorded in the index, walking back through the index until one is found
+        :param ended: to only consider runs which ended successfully
+        :param n_events: number of events read first (read window grown as long as no run matches)
+        :return: run as a dictionary ('offset', 'start', 'log_file', 'end', 'status'), None if there is none.
+        """
+        while True:
+            events, ends = self.last_events(n_events=n_events), {}
+
+            for event in reversed(events):  # Most recent first, end events being met before their start event
+                if 'end' in event:
+                    ends.setdefault(event['start'], event)
+                    continue
+
+                run = {**event, **ends.get(event['start'], {'status': 'running'})}
+
+                if not ended or run['status'] == 'ended':
+                    return run
+
+            if len(events) < n_events:  # Whole index read
+                return None
+
+            n_events *= 4
+
+    def rotate(self, now: dt.datetime):
+        """Rotate the history log if it is too large or if it contains a previous month
+        :param now: current date
+        :return: rotated file name, None if the log has not been rotated.
+        """
+        if not os.path.exists(self.log_path):
+            return None
+
+        size = os.path.getsize(self.log_path)
+        last = self.last_run(ended=False)
+
+        if last:
+            last_month = last['start'][:7]
+        else:  # No run recorded yet, use last modification date instead
+            last_month = dt.datetime.fromtimestamp(os.path.getmtime(self.log_path)).strftime('%Y-%m')
+
+        if size == 0 or (size < self.max_size and not (self.monthly and last_month != now.strftime('%Y-%m'))):
+            return None
+
+        stem = self.log_file.removesuffix('.log')
+        rotated, suffix = f'{stem}_{last_month}.log', 1
+
+        while os.path.exists(f'{self.log_dir}/{rotated}'):  # Several rotations in the same month (size limit)
+            suffix += 1
+            rotated = f'{stem}_{last_month}_{suffix}.log'
+
+        os.replace(self.log_path, f'{self.log_dir}/{rotated}')
+        self.relocate(rotated)
+        return rotated
+
+    def relocate(self, rotated: str):
+        """Point the run index entries of the history log to its rotated file, so that their offsets stay valid (the
+        index is only rewritten on rotation)
+        :param rotated: rotated file name.
+        """
+        if self.run is not None and self.run.get('log_file') == self.log_file:
+            self.run['log_file'] = rotated
+
+        if not os.path.exists(self.index_path):
+            return
+
+        with open(self.index_path, 'r', encoding='utf8') as index_file:
+            events = [json.loads(line) for line in index_file if line.strip()]
+
+        for event in events:
+            if event.get('log_file') == self.log_file:
+                event['log_file'] = rotated
+
+        with open(f'{self.index_path}.tmp', 'w', encoding='utf8') as index_file:
+            index_file.writelines(json.dumps(event) + '\n' for event in events)
+
+        os.replace(f'{self.index_path}.tmp', self.index_path)
+
+    def start(self, now: dt.datetime):
+        """Record a run start (to be called just before logging the start message)
+        :param now: start date.
+        """
+        offset = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        self.status = 'failed'  # Until the run is flagged as ended (a resident process starts several runs)
+        self.run = {'log_file': self.log_file, 'offset': offset, 'start': now.isoformat(timespec='seconds')}
+
+        with open(self.index_path, 'a', encoding='utf8') as index_file:
+            index_file.write(json.dumps(self.run) + '\n')
+
+    def end(self, now: dt.datetime = None):
+        """Record the end of the current run with its status ('ended' if flagged as such, 'failed' otherwise)
+        :param now: end date (current date if None).
+        """
+        if self.run is None or 'end' in self.run:
+            return
+
+        now = now or dt.datetime.now(tz=dt.datetime.fromisoformat(self.run['start']).tzinfo)
+        event = {'start': self.run['start'], 'end': now.isoformat(timespec='seconds'), 'status': self.status}
+        self.run.update(event)
+
+        with open(self.index_path, 'a', encoding='utf8') as index_file:
+            index_file.write(json.dumps(event) + '\n')
+
+    def copy_run(self, path: str):
+        """Copy the current run's lines of the history log to a file
+        :param path: destination file path.
+        """
+        offset = self.run['offset'] if self.run else find_last_marker(self.log_path)
+
+        with open(self.log_path, 'rb') as log_file:
+            log_file.seek(offset or 0)
+            content = log_file.read()
+
+        with open(path, 'wb') as run_file:
+            run_file.write(content)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import datetime as dt
+import hashlib
+import mmap
+import os
+import struct
+import threading
+
+"""File Information
+@file_name: seen_index.py
+@author: Dylan "dyl-m" Monfret
+Index of videos already evaluated for the mixes playlist (added, rejected or archived), so that they are not enriched
+again when they resurface. Exact records (video ID, reason, date) are appended to a CSV store, from which a compact
+index of sorted 64-bit fingerprints is built and memory-mapped.
+"""
+
+"GLOBAL"
+
+RECORD = struct.Struct('<QIB3x')  # Fingerprint, evaluation day (days since 1970-01-01), reason code
+REASONS = ['added', 'short', 'archived']  # Reason codes are positions in this list, plus one
+EPOCH = dt.date(1970, 1, 1)
+
+"FUNCTIONS"
+
+
+def fingerprint(video_id: str):
+    """Hash a video ID to 64 bits (collision probability around 1e-10 for a million IDs)
+    :param video_id: a YouTube video ID
+    :return: fingerprint as an integer.
+    """
+    return int.from_bytes(hashlib.blake2b(video_id.encode('utf8'), digest_size=8).digest(), 'little')
+
+
+"CLASSES"
+
+
+class SeenIndex:
+    """Seen-video index: memory-mapped sorted records, new evaluations being kept in memory until saved."""
+
+    def __init__(self, path: str = '../cache/seen_videos'):
+        """Open the index, building it from the exact store if it is missing
+        :param path: files path without extension ('.csv' exact store, '.idx' index).
+        """
+        self.store_path, self.index_path = f'{path}.csv', f'{path}.idx'
+        self.hits, self.lookups = 0, 0
+        self._staged = {}  # {fingerprint: (video ID, reason code, day)}
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._size = 0
+
+        if not os.path.exists(self.index_path) and os.path.exists(self.store_path):
+            self._rebuild()
+
+        self._open()
+
+    def _open(self):
+        """Memory-map the index file."""
+        if self._mmap is not None:
+            self._mmap.close()
+
+        self._mmap, self._size = None, 0
+
+        if os.path.exists(self.index_path) and os.path.getsize(self.index_path):
+            with open(self.index_path, 'rb') as index_file:
+                self._mmap = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._size = len(self._mmap) // RECORD.size
+
+    def _rebuild(self):
+        """Build the index from the exact store."""
+        records = {}
+
+        with open(self.store_path, 'r', encoding='utf8', newline='') as store_file:
+            for video_id, reason, date in csv.reader(store_file):
+                day = (dt.date.fromisoformat(date) - EPOCH).days
+                records[fingerprint(video_id)] = (REASONS.index(reason) + 1, day)  # Latest evaluation kept
+
+        self._write(records)
+
+    def _write(self, records: dict):
+        """Write the index file (records sorted by fingerprint), replacing the current one
+        :param records: {fingerprint: (reason code, day)}.
+        """
+        os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+
+        with open(f'{self.index_path}.tmp', 'wb') as index_file:
+            index_file.write(b''.join(RECORD.pack(key, day, code) for key, (code, day) in sorted(records.items())))
+
+        os.replace(f'{self.index_path}.tmp', self.index_path)
+
+    def _find(self, key: int):
+        """Binary search of a fingerprint in the index
+        :param key: fingerprint
+        :return: (reason code, day) or None if not found.
+        """
+        low, high = 0, self._size
+
+        while low < high:
+            middle = (low + high) // 2
+            middle_key, day, code = RECORD.unpack_from(self._mmap, middle * RECORD.size)
+
+            if middle_key == key:
+                return code, day
+            if middle_key < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return None
+
+    def get(self, video_id: str):
+        """Get the last evaluation of a video
+        :param video_id: a YouTube video ID
+        :return: (reason, evaluation date) or None if the video has never been evaluated.
+        """
+        key = fingerprint(video_id)
+
+        with self._lock:
+            self.lookups += 1
+            staged = self._staged.get(key)
+            found = (staged[1], staged[2]) if staged else self._find(key)
+
+            if found is None:
+                return None
+
+            self.hits += 1
+
+        return REASONS[found[0] - 1], EPOCH + dt.timedelta(days=found[1])
+
+    def __contains__(self, video_id: str):
+        return self.get(video_id) is not None
+
+    def add(self, video_ids: list, reason: str, date: dt.date = None):
+        """Record evaluations
+        :param video_ids: list of YouTube video IDs
+        :param reason: one of 'REASONS'
+        :param date: evaluation date (today if None).
+        """
+        code, day = REASONS.index(reason) + 1, ((date or dt.date.today()) - EPOCH).days
+
+        with self._lock:
+            for video_id in video_ids:
+                self._staged[fingerprint(video_id)] = (video_id, code, day)
+
+    def report(self):
+        """Summarize index usage
+        :return: report as a string.
+        """
+        return f'Seen-video index: {self.hits} of {self.lookups} lookup(s) skipped, {self._size} indexed video(s), ' \
+               f'{len(self._staged)} new evaluation(s).'
+
+    def save(self):
+        """Append new evaluations to the exact store, then merge them into the index."""
+        with self._lock:
+            staged, self._staged = self._staged, {}
+
+            if not staged:
+                return
+
+            os.makedirs(os.path.dirname(self.store_path) or '.', exist_ok=True)
+
+            with open(self.store_path, 'a', encoding='utf8', newline='') as store_file:
+                csv.writer(store_file, lineterminator='\n').writerows(
+                    (video_id, REASONS[code - 1], (EPOCH + dt.timedelta(days=day)).isoformat())
+                    for video_id, code, day in staged.values())
+
+            records = {key: (code, day) for key, day, code in
+                       (RECORD.unpack_from(self._mmap, idx * RECORD.size) for idx in range(self._size))}
+            records.update((key, (code, day)) for key, (_, code, day) in staged.items())
+            self._write(records)
+            self._open()
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+import datetime as dt
+import email.utils
+import http.client
+import random
+import socket
+import threading
+import time
+
+"""File Information
+@file_name: transport.py
+@author: Dylan "dyl-m" Monfret
+Resilient execution of YouTube API requests: transient failures (5xx, rate limits, connection resets) are retried with
+jittered exponential backoff, 'Retry-After' being respected, within a per-run retry budget. Quota errors are raised as
+'QuotaExceededError'.
+"""
+
+"GLOBAL"
+
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}  # Transient 403 / 429 reasons
+QUOTA_REASONS = {'quotaExceeded', 'dailyLimitExceeded'}
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError, socket.timeout, http.client.HTTPException)
+
+"CLASSES"
+
+
+class QuotaExceededError(Exception):
+    """Daily quota of the YouTube project exceeded: no request can succeed before the quota is reset."""
+
+
+class RetryPolicy:
+    """Retry policy shared by threads: attempts per request, backoff bounds and retries allowed per run."""
+
+    def __init__(self, max_attempts: int = 5, base: float = 1.0, cap: float = 32.0, budget: int = 50,
+                 max_retry_after: float = 60.0):
+        """Initialize the policy
+        :param max_attempts: maximum number of attempts of a request
+        :param base: first backoff upper bound (seconds), doubled at each attempt
+        :param cap: maximum backoff (seconds)
+        :param budget: maximum number of retries during the run, all requests included
+        :param max_retry_after: longest 'Retry-After' delay (seconds) waited for, the request failing beyond.
+        """
+        self.max_attempts = max_attempts
+        self.base = base
+        self.cap = cap
+        self.budget = budget
+        self.max_retry_after = max_retry_after
+        self.retries, self.given_up = 0, 0
+        self._lock = threading.Lock()
+
+    def backoff(self, error: Exception, attempt: int):
+        """Decide if a failed attempt is retried, consuming the retry budget if it is
+        :param error: exception raised by the attempt
+        :param attempt: number of attempts made so far
+        :return: delay (seconds) to wait before the next attempt, None if the error must be raised.
+        """
+        if not is_transient(error):
+            return None
+
+        delay = retry_after(error)
+
+        if delay is None:  # Full jitter: uniform delay up to the exponential bound
+            delay = random.uniform(0, min(self.cap, self.base * 2 ** (attempt - 1)))
+
+        with self._lock:
+            if attempt >= self.max_attempts or self.retries >= self.budget or delay > self.max_retry_after:
+                self.given_up += 1
+                return None
+
+            self.retries += 1
+
+        return delay
+
+    def report(self):
+        """Summarize retries
+        :return: report as a string.
+        """
+        return f'Transport: {self.retries} retry(ies) of {self.budget} allowed, {self.given_up} request(s) given up.'
+
+
+"FUNCTIONS"
+
+
+def error_reason(error: Exception):
+    """Get the reason of an API error
+    :param error: exception raised by a request
+    :return: reason (e.g. 'quotaExceeded') or None if the error is not an API error with details.
+    """
+    details = getattr(error, 'error_details', None)
+
+    if isinstance(details, list) and details and isinstance(details[0], dict):
+        return details[0].get('reason')
+
+    return None
+
+
+def status_code(error: Exception):
+    """Get the HTTP status code of an API error
+    :param error: exception raised by a request
+    :return: status code or None if the error is not an HTTP error.
+    """
+    resp = getattr(error, 'resp', None)
+    return getattr(resp, 'status', None)
+
+
+def is_transient(error: Exception):
+    """Check if a request failure may not happen again
+    :param error: exception raised by a request
+    :return: True for server errors, rate limits and connection failures.
+    """
+    if isinstance(error, TRANSIENT_ERRORS):  # Connection reset, timeout... (not file or certificate errors)
+        return True
+
+    status = status_code(error)
+
+    if status is None:
+        return False
+
+    return status >= 500 or status == 429 or (status == 403 and error_reason(error) in RATE_LIMIT_REASONS)
+
+
+def retry_after(error: Exception):
+    """Get the delay requested by the server with a 'Retry-After' header
+    :param error: exception raised by a request
+    :return: delay in seconds, None if there is no (valid) header.
+    """
+    resp = getattr(error, 'resp', None)
+    value = resp.get('retry-after') if hasattr(resp, 'get') else None
+
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:  # HTTP date
+        return max((email.utils.parsedate_to_datetime(value) - dt.datetime.now(tz=dt.timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def check_quota(error: Exception):
+    """Raise 'QuotaExceededError' if an API error is a quota error
+    :param error: exception raised by a request.
+    """
+    if error_reason(error) in QUOTA_REASONS:
+        raise QuotaExceededError(str(error)) from error
+
+
+def execute(send, policy: RetryPolicy = None, on_retry=None):
+    """Send a request, retrying transient failures according to a policy
+    :param send: function sending the request and returning its response
+    :param policy: retry policy (a single attempt if None)
+    :param on_retry: function called with the error and the delay before each retry
+    :return: response.
+    """
+    attempt = 0
+
+    while 1:
+        attempt += 1
+
+        try:
+            return send()
+
+        except Exception as error:  # skipcq: PYL-W0703 - Raised again unless it is retried
+            check_quota(error)
+            delay = policy.backoff(error, attempt) if policy is not None else None
+
+            if delay is None:
+                raise
+
+            if on_retry is not None:
+                on_retry(error, delay)
+
+            time.sleep(delay)
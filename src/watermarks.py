@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import datetime as dt
+import json
+import os
+import threading
+
+"""File Information
+@file_name: watermarks.py
+@author: Dylan "dyl-m" Monfret
+Per-uploads-playlist watermarks: newest video ID and publish time processed for each followed channel.
+"""
+
+"CLASSES"
+
+
+class WatermarkStore:
+    """Persistent watermarks, new ones are staged during a run and only saved once the run succeeded."""
+
+    def __init__(self, path: str = '../data/watermarks.json'):
+        """Load watermarks
+        :param path: watermarks JSON file path.
+        """
+        self.path = path
+        self._staged = {}
+        self._lock = threading.Lock()
+        self._marks = {}
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf8') as marks_file:
+                self._marks = json.load(marks_file)
+
+    def get(self, playlist_id: str):
+        """Get the watermark of a playlist
+        :param playlist_id: a YouTube uploads playlist ID
+        :return: {'video_id': ..., 'published_at': datetime.datetime} or None if the playlist has never been processed.
+        """
+        mark = self._marks.get(playlist_id)
+
+        if mark is None:
+            return None
+
+        return {'video_id': mark['video_id'], 'published_at': dt.datetime.fromisoformat(mark['published_at'])}
+
+    def stage(self, playlist_id: str, items: list, processed_until: dt.datetime):
+        """Stage the new watermark of a playlist after browsing it
+        :param playlist_id: a YouTube uploads playlist ID
+        :param items: playlist items retrieved (newer than the current watermark)
+        :param processed_until: upper bound of the release dates browsed, used when no item has ever been retrieved.
+        """
+        dated = [item for item in items if item['release_date']]
+
+        if dated:
+            newest = max(dated, key=lambda item: item['release_date'])
+            mark = {'video_id': newest['video_id'], 'published_at': newest['release_date'].isoformat()}
+
+        elif playlist_id not in self._marks:
+            mark = {'video_id': None, 'published_at': processed_until.isoformat()}
+
+        else:  # Nothing new, current watermark is kept
+            return
+
+        with self._lock:
+            self._staged[playlist_id] = mark
+
+    def save(self):
+        """Apply staged watermarks and save them."""
+        with self._lock:
+            self._marks.update(self._staged)
+            self._staged = {}
+
+        with open(self.path, 'w', encoding='utf8') as marks_file:
+            json.dump(dict(sorted(self._marks.items())), marks_file, indent=2)
@@ -1,28 +1,39 @@
 # -*- coding: utf-8 -*-
 
-import ast
+from __future__ import annotations
+
 import base64
-import bs4
+import collections
+import concurrent.futures
+import contextlib
 import datetime as dt
-import googleapiclient.discovery
-import googleapiclient.errors
-import isodate
 import itertools
 import json
 import logging
 import os
-import pandas as pd
 import random
-import re
-import requests
 import sys
-import tqdm
-import tzlocal
-
-from google.auth.exceptions import RefreshError
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
+import threading
+import time
+
+import feeds
+import history_store
+import playlist_diff
+import quota
+import transport
+from context import RunContext, lazy_import
+from feeds import FeedCache
+from rate_limit import HostRateLimiter, TokenBucket
+from poll_scheduler import PollScheduler
+from watermarks import WatermarkStore
+
+# Heavy dependencies, loaded on first use
+googleapiclient = lazy_import('googleapiclient')
+lazy_import('googleapiclient.discovery')
+lazy_import('googleapiclient.errors')
+isodate = lazy_import('isodate')
+requests = lazy_import('requests')
+tqdm = lazy_import('tqdm')
 
 """File Information
 @file_name: youtube_req.py
@@ -30,49 +41,75 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 Script containing methods using YouTube API or doing scrapping / GET-requests on youtube.com.
 """
 
-"OPTIONS"
+"GLOBAL"
 
-pd.set_option('display.max_columns', None)  # pd.set_option('display.max_rows', None)
-pd.set_option('display.width', 250)
+CONTEXT = None  # 'context.RunContext' object, see 'init'
+YOUTUBE_URL = 'https://www.youtube.com'  # Channel pages location (a local server in benchmarks, see 'fake_youtube')
+CACHEABLE_METHODS = {'youtube.playlistItems.list'}  # API methods served through the response cache
+NON_IDEMPOTENT_METHODS = {'youtube.playlistItems.insert'}  # Never sent again blindly: a failed attempt may have worked
+RESPONSE_CACHE = None  # 'http_cache.ResponseCache' object, set by the caller to enable conditional requests
+DISCOVERY_URL = 'https://youtube.googleapis.com/$discovery/rest?version=v3'  # Used if no document is bundled
+DISCOVERY_DOC = None  # Parsed discovery document, see 'discovery_document'
+TOKEN_MARGIN = 600  # Seconds before expiry from which an access token is refreshed (it must outlive the run)
+BATCH_SIZE = 50  # Maximum number of requests in a batch request
+STATS_COLUMNS = ['video_id', 'views', 'likes', 'comments', 'duration', 'live_status']  # 'get_stats' items keys
+QUOTA_LEDGER = None  # 'quota.QuotaLedger' object, set by the caller to count API units spent
+CHANNEL_CACHE = None  # 'metadata_cache.MetadataCache' object of subscribers counts, set by the caller
+VIDEO_CACHE = None  # 'metadata_cache.MetadataCache' object of immutable video fields (no TTL), set by the caller
+VOLATILE_CACHE = None  # 'metadata_cache.MetadataCache' object of video counters and live status, set by the caller
+LOOKUP = None  # 'lookup.LookupService' object, set by the caller to fetch each video or channel once per run
+RELEASE_HISTOGRAM = None  # 'release_histogram.ReleaseHistogram' object, updated with records written in history
+SEEN_INDEX = None  # 'seen_index.SeenIndex' object, set by the caller to skip videos already evaluated
+RETRY_POLICY = None  # 'transport.RetryPolicy' object, set by the caller to retry transient failures
+METRICS = None  # 'metrics.Metrics' object, set by the caller to time API calls and channel pages requests
+WORKER_STATE = threading.local()  # HTTP transport ('http') and rate limiter ('limiter') of worker threads
 
-"GLOBAL"
+"LOGGERS"
 
+# Create loggers (file handler is attached by 'init')
+history = logging.Logger(name='history', level=0)
 
-def last_exe_date():
-    """Extract last execution datetime from a log file (supposing first line is containing the right datetime).
-    :return date: last execution date.
-    """
-    with open('../log/last_exe.log', 'r', encoding='utf8') as log_file:
-        first_log = log_file.readlines()[0]  # Get first log
+"CONTEXT"
 
-    d_str = re.search(r'(\d{4}(-\d{2}){2})\s(\d{2}:?){3}.[\d:]+', first_log).group()  # Extract date
-    date = dt.datetime.strptime(d_str, '%Y-%m-%d %H:%M:%S%z')  # Parse to datetime object
-    return date
 
+def init(context: RunContext = None, log: bool = True):
+    """Set up the run context: configuration, clock and logging
+    :param context: run context (created from the repository files if None)
+    :param log: to attach the history file handler or not
+    :return CONTEXT: the run context.
+    """
+    global CONTEXT  # skipcq: PYL-W0603 - Module-level run context
 
-with open('../data/add-on.json') as add_on_file:
-    ADD_ON = json.load(add_on_file)
+    CONTEXT = context or RunContext.create()
 
-NOW = dt.datetime.now(tz=tzlocal.get_localzone())
-LAST_EXE = last_exe_date()
+    if log:
+        CONTEXT.attach_log(history)
 
-"LOGGERS"
+    return CONTEXT
 
-# Create loggers
-history = logging.Logger(name='history', level=0)
 
-# Create file handlers
-history_file = logging.FileHandler(filename='../log/history.log')  # mode='a'
+def get_context():
+    """Get the run context, initialized with default values on first use
+    :return: the run context.
+    """
+    if CONTEXT is None:
+        return init()
+    return CONTEXT
 
-# Create formatter
-formatter = logging.Formatter(fmt='%(asctime)s [%(levelname)s] - %(message)s', datefmt='%Y-%m-%d %H:%M:%S%z')
 
-# Set file handlers' level
-history_file.setLevel(logging.DEBUG)
+def __getattr__(name: str):
+    """Former module constants, now resolved from the run context
+    :param name: attribute name
+    :return: attribute value.
+    """
+    if name == 'ADD_ON':
+        return get_context().add_on
+    if name == 'NOW':
+        return get_context().now
+    if name == 'LAST_EXE':
+        return get_context().last_exe
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
-# Assign file handlers and formatter to loggers
-history_file.setFormatter(formatter)
-history.addHandler(history_file)
 
 "FUNCTIONS"
 
@@ -111,22 +148,188 @@ def encode_key(json_path: str, export_dir: str = None, export_name: str = None):
             key_file.write(key_b64)
 
 
+def init_worker(service: googleapiclient.discovery, limiter: TokenBucket = None):
+    """Initialize a worker thread: requests executed by the thread use its own authorised HTTP transport (httplib2
+    transports are not thread-safe) and wait for the shared rate limiter
+    :param service: a YouTube service build with 'googleapiclient.discovery'
+    :param limiter: rate limiter shared by workers (no limit if None).
+    """
+    import google_auth_httplib2  # Only needed by parallel workers
+    import httplib2
+
+    http = httplib2.Http()
+
+    if isinstance(service._http, google_auth_httplib2.AuthorizedHttp):  # skipcq: PYL-W0212 - Same credentials
+        http = google_auth_httplib2.AuthorizedHttp(service._http.credentials, http=http)  # skipcq: PYL-W0212
+
+    WORKER_STATE.http = http
+    WORKER_STATE.limiter = limiter
+
+
+def execute_request(request):
+    """Execute a YouTube API request, through the response cache when enabled and the method is cacheable, charge
+    each attempt processed by the API to the quota ledger and time it. Transient failures of idempotent requests are
+    retried according to the retry policy (see 'execute_batch' for other ones) and quota errors raised as
+    'transport.QuotaExceededError'. In worker threads, the request is sent through the worker's transport
+    :param request: a googleapiclient.http.HttpRequest object
+    :return: response as a dictionary.
+    """
+    if getattr(WORKER_STATE, 'limiter', None) is not None:
+        WORKER_STATE.limiter.acquire()
+
+    if getattr(WORKER_STATE, 'http', None) is not None:
+        request.http = WORKER_STATE.http
+
+    def attempt():
+        """Send the request once, charging it if the API processed it
+        :return: response as a dictionary.
+        """
+        try:
+            response = send_request(request)
+
+        except Exception as error:  # skipcq: PYL-W0703 - Raised again once charged
+            charge_quota(request.methodId, error=error)
+            raise
+
+        charge_quota(request.methodId)
+        return response
+
+    timer = METRICS.timer(request.methodId, units=quota.COSTS.get(request.methodId, 0)) if METRICS is not None \
+        else contextlib.nullcontext({'retries': 0})
+
+    with timer as measure:
+        response = transport.execute(attempt,
+                                     policy=None if request.methodId in NON_IDEMPOTENT_METHODS else RETRY_POLICY,
+                                     on_retry=lambda _error, _delay: measure.update(retries=measure['retries'] + 1))
+
+        if METRICS is not None:
+            measure['size'] = len(json.dumps(response, separators=(',', ':')))  # Decoded response size
+
+    return response
+
+
+def charge_quota(method_id: str, error: Exception = None):
+    """Charge a request to the quota ledger if the API processed it: every attempt is charged, retries included, but
+    requests rejected for quota reasons or which did not reach the API (connection errors) are not
+    :param method_id: API method ID (e.g. 'youtube.videos.list')
+    :param error: exception raised by the request, None if it succeeded.
+    """
+    if QUOTA_LEDGER is None:
+        return
+
+    if error is not None and (transport.status_code(error) is None or
+                              transport.error_reason(error) in transport.QUOTA_REASONS):
+        return
+
+    QUOTA_LEDGER.charge(method_id)
+
+
+def send_request(request):
+    """Send a YouTube API request, through the response cache when enabled and the method is cacheable
+    :param request: a googleapiclient.http.HttpRequest object
+    :return: response as a dictionary.
+    """
+    if RESPONSE_CACHE is not None and request.methodId in CACHEABLE_METHODS:
+        return RESPONSE_CACHE.execute(request)
+
+    return request.execute()
+
+
+def discovery_document():
+    """Get the YouTube Data API discovery document without network round trip (document bundled with
+    'googleapiclient', or disk-cached one, downloaded once if none of them exists), parsed once per process
+    :return: discovery document as a dictionary.
+    """
+    global DISCOVERY_DOC  # skipcq: PYL-W0603
+
+    if DISCOVERY_DOC is None:
+        from googleapiclient.discovery_cache import get_static_doc  # Only needed to build services
+
+        content = get_static_doc('youtube', 'v3')
+        cache_path = get_context().path('cache', 'discovery_youtube_v3.json')
+
+        if content is None and os.path.exists(cache_path):
+            with open(cache_path, 'r', encoding='utf8') as doc_file:
+                content = doc_file.read()
+
+        if content is None:
+            response = requests.get(DISCOVERY_URL, timeout=(5, 5))
+            response.raise_for_status()
+            content = response.text
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+            with open(cache_path, 'w', encoding='utf8') as doc_file:
+                doc_file.write(content)
+
+        DISCOVERY_DOC = json.loads(content)
+
+    return DISCOVERY_DOC
+
+
+def build_service(credentials=None, http=None, root_url: str = None):
+    """Build a YouTube service from the discovery document, cheap enough to build one per worker
+    :param credentials: authentication credentials (google.oauth2.credentials.Credentials object)
+    :param http: HTTP transport, used instead of 'credentials'
+    :param root_url: API URL replacing the real one (e.g. a local server)
+    :return: a Google API service object build with 'googleapiclient.discovery.build_from_document'.
+    """
+    document = discovery_document()
+
+    if root_url:
+        document = {**document, 'rootUrl': root_url, 'baseUrl': root_url}
+
+    return googleapiclient.discovery.build_from_document(document, credentials=credentials, http=http)
+
+
+def token_expiring(creds, margin: int = TOKEN_MARGIN):
+    """Check if an access token is missing or expires soon (access tokens are reused until then)
+    :param creds: google.oauth2.credentials.Credentials object
+    :param margin: number of seconds before expiry from which the token is considered as expiring
+    :return: True if the token must be refreshed.
+    """
+    if not creds.token:
+        return True
+
+    if creds.expiry is None:  # Token without expiry date
+        return False
+
+    now = dt.datetime.now(tz=dt.timezone.utc).replace(tzinfo=None)  # Credentials expiry is a naive UTC date
+    return creds.expiry - now < dt.timedelta(seconds=margin)
+
+
+def service_expiring(service: googleapiclient.discovery, margin: int = TOKEN_MARGIN):
+    """Check if the access token of a service expires soon (a warm service must then be created again)
+    :param service: a YouTube service build with 'googleapiclient.discovery'
+    :param margin: number of seconds before expiry from which the token is considered as expiring
+    :return: True if the service must be created again, False for services without credentials.
+    """
+    creds = getattr(service._http, 'credentials', None)  # skipcq: PYL-W0212 - Authorized transport credentials
+    return hasattr(creds, 'expiry') and token_expiring(creds, margin=margin)  # Not 'httplib2.Http' credentials
+
+
 def create_service_local(log: bool = True):
     """Retrieve authentication credentials at specified path or create new ones, mostly inspired by this source
     code: https://learndataanalysis.org/google-py-file-source-code/
     :param log: to apply logging or not
-    :return service: a Google API service object build with 'googleapiclient.discovery.build'.
+    :return service: a Google API service object build with 'googleapiclient.discovery.build_from_document'.
     """
-    oauth_file = '../tokens/oauth.json'  # OAUTH 2.0 ID path
+    from google.auth.exceptions import RefreshError  # Authentication libraries are only loaded here
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
+    start = time.perf_counter()
+    oauth_file = get_context().path('tokens', 'oauth.json')  # OAUTH 2.0 ID path
+    cred_path = get_context().path('tokens', 'credentials.json')
     scopes = ['https://www.googleapis.com/auth/youtube', 'https://www.googleapis.com/auth/youtube.force-ssl']
     instance_fail_message = 'Failed to create service instance for YouTube'
     cred = None
 
-    if os.path.exists('../tokens/credentials.json'):
-        cred = Credentials.from_authorized_user_file('../tokens/credentials.json')  # Retrieve credentials
+    if os.path.exists(cred_path):
+        cred = Credentials.from_authorized_user_file(cred_path)  # Retrieve credentials
 
-    if not cred or not cred.valid:  # Cover outdated credentials
-        if cred and cred.expired and cred.refresh_token:
+    if not cred or token_expiring(cred):  # Cover missing, outdated or soon outdated credentials
+        if cred and cred.refresh_token:
             try:
                 cred.refresh(Request())
 
@@ -139,14 +342,13 @@ def create_service_local(log: bool = True):
             flow = InstalledAppFlow.from_client_secrets_file(oauth_file, scopes)  # Create a Flow from 'oauth_file'
             cred = flow.run_local_server()  # Run authentication process
 
-        with open('../tokens/credentials.json', 'w') as cred_file:  # Save credentials as a JSON file
-            # noinspection PyTypeChecker
-            json.dump(ast.literal_eval(cred.to_json()), cred_file, ensure_ascii=False, indent=4)
+        with open(cred_path, 'w') as cred_file:  # Save credentials as a JSON file
+            json.dump(json.loads(cred.to_json()), cred_file, ensure_ascii=False, indent=4)
 
     try:
-        service = googleapiclient.discovery.build('youtube', 'v3', credentials=cred)
+        service = build_service(credentials=cred)
         if log:
-            history.info('YouTube service created successfully.')
+            history.info('YouTube service created successfully (%.0f ms).', (time.perf_counter() - start) * 1000)
 
         return service
 
@@ -159,8 +361,10 @@ def create_service_local(log: bool = True):
 
 def create_service_workflow():
     """Retrieve authentication credentials from dedicated repository secrets
-    :return service: a Google API service object build with 'googleapiclient.discovery.build'.
+    :return service: a Google API service object build with 'googleapiclient.discovery.build_from_document'.
     """
+    from google.auth.transport.requests import Request  # Authentication libraries are only loaded here
+    from google.oauth2.credentials import Credentials
 
     def import_env_var(var_name: str):
         """Import variable environment and perform base64 decoding
@@ -169,21 +373,20 @@ def create_service_workflow():
         """
         v_b64 = os.environ.get(var_name)  # Get environment variable
         v_str = base64.urlsafe_b64decode(v_b64).decode(encoding='utf8')  # Decode
-        value = ast.literal_eval(v_str)  # Eval
+        value = json.loads(v_str)  # Parse
         return value
 
+    start = time.perf_counter()
     creds_b64 = os.environ.get('CREDS_B64')  # Initialisation of Base64 version of Credentials object
     creds_dict = import_env_var(var_name='CREDS_B64')  # Import pre-registered credentials
     creds = Credentials.from_authorized_user_info(creds_dict)  # Conversion to suitable object
     instance_fail_message = 'Failed to create service instance for YouTube'
 
-    if not creds.valid:  # Cover outdated credentials
-        if creds.expired and creds.refresh_token:
+    if token_expiring(creds):  # Cover outdated or soon outdated credentials, valid access token being reused
+        if creds.refresh_token:
             creds.refresh(Request())  # Refresh token
 
-            # Get refreshed token as JSON-like string
-            creds_str = json.dumps(ast.literal_eval(creds.to_json())).encode('utf-8')
-
+            creds_str = creds.to_json().encode('utf-8')  # Get refreshed token as JSON string
             creds_b64 = str(base64.urlsafe_b64encode(creds_str))[2:-1]  # Encode token
             os.environ['CREDS_B64'] = creds_b64  # Update environment variable value
             history.info('API credentials refreshed.')
@@ -193,8 +396,8 @@ def create_service_workflow():
             sys.exit()
 
     try:
-        service = googleapiclient.discovery.build('youtube', 'v3', credentials=creds)  # Build service.
-        history.info('YouTube service created successfully.')
+        service = build_service(credentials=creds)  # Build service.
+        history.info('YouTube service created successfully (%.0f ms).', (time.perf_counter() - start) * 1000)
         return service, creds_b64
 
     except Exception as error:  # skipcq: PYL-W0703 - No known errors at the moment.
@@ -202,14 +405,28 @@ def create_service_workflow():
         sys.exit()
 
 
+def create_service_fake(api_url: str):
+    """Create a service without credentials, sending API requests (batch requests included) to a local server
+    ('fake_youtube.py'), channel pages being requested to the same server
+    :param api_url: server URL (e.g. 'http://127.0.0.1:8765/')
+    :return service: a Google API service object build with 'googleapiclient.discovery.build_from_document'.
+    """
+    import httplib2  # Only needed without credentials
+
+    global YOUTUBE_URL  # skipcq: PYL-W0603
+    YOUTUBE_URL = api_url.rstrip('/')
+    return build_service(http=httplib2.Http(), root_url=api_url)
+
+
 def get_playlist_items(service: googleapiclient.discovery, playlist_id: str, day_ago: int = None,
-                       with_last_exe: bool = False, latest_d: dt.datetime = NOW):
+                       with_last_exe: bool = False, latest_d: dt.datetime = None, watermark: dict = None):
     """Get the videos in a YouTube playlist
     :param service: a YouTube service build with 'googleapiclient.discovery'
     :param playlist_id: a YouTube playlist ID
     :param day_ago: day difference with a reference date, delimits items' collection field
-    :param latest_d: the latest reference date
+    :param latest_d: the latest reference date (run context date by default)
     :param with_last_exe: to use last execution date extracted from log or not
+    :param watermark: newest item already processed ({'video_id': ..., 'published_at': ...}), paging stops there
     :return p_items: playlist items (videos) as a list.
     """
 
@@ -227,37 +444,55 @@ def get_playlist_items(service: googleapiclient.discovery, playlist_id: str, day
     p_items = []
     next_page_token = None
     date_format = '%Y-%m-%dT%H:%M:%S%z'
+    latest_d = (latest_d or get_context().now).replace(minute=0, second=0, microsecond=0)  # Round hour to XX:00:00.0
+    oldest_d = None  # Items published before this date are not kept (the playlist must be ordered chronologically!)
+
+    if watermark is not None:  # In case we want to keep videos published since the last one processed
+        oldest_d = watermark['published_at']
+
+    elif with_last_exe:  # In case we want to keep videos published between last exe date and your latest_d
+        oldest_d = get_context().last_exe.replace(minute=0, second=0, microsecond=0)  # Round hour to XX:00:00.0
+
+    elif day_ago is not None:  # In case we want to keep videos published x days ago from your latest_d
+        oldest_d = latest_d - dt.timedelta(days=day_ago)  # Days subtraction
 
     while 1:
         try:
-            request = service.playlistItems().list(part=['snippet', 'contentDetails', 'status'],
-                                                   playlistId=playlist_id,
-                                                   maxResults=50,
-                                                   pageToken=next_page_token).execute()  # Request playlist's items
-
-            p_items += [{'video_id': item['contentDetails']['videoId'],
-                         'item_id': item['id'],
-                         'release_date': get_and_format_date(ytb_item=item, d_format=date_format),
-                         'status': item['status']['privacyStatus'],
-                         'channel_id': item['snippet'].get('videoOwnerChannelId'),
-                         'channel_name': item['snippet'].get('videoOwnerChannelTitle')}
-                        for item in request['items']]  # Keep necessary data
-
-            if with_last_exe:  # In case we want to keep videos published between last exe date and your latest_d
-                oldest_d = LAST_EXE.replace(minute=0, second=0, microsecond=0)  # Round hour to XX:00:00.0
-                latest_d = latest_d.replace(minute=0, second=0, microsecond=0)  # Round hour to XX:00:00.0
-                p_items = [item for item in p_items if item['release_date']]  # Filter 1 - 'release_date' exists
-                p_items = [item for item in p_items if latest_d > item['release_date'] > oldest_d]  # Filter 2 - Date
-
-                if len(p_items) <= 50:  # No need for more requests (the playlist must be ordered chronologically!)
-                    break
+            request = execute_request(service.playlistItems().list(part=['snippet', 'contentDetails', 'status'],
+                                                                   playlistId=playlist_id,
+                                                                   maxResults=50,
+                                                                   pageToken=next_page_token))  # Request items
+
+            page_items = [{'video_id': item['contentDetails']['videoId'],
+                           'item_id': item['id'],
+                           'release_date': get_and_format_date(ytb_item=item, d_format=date_format),
+                           'status': item['status']['privacyStatus'],
+                           'channel_id': item['snippet'].get('videoOwnerChannelId'),
+                           'channel_name': item['snippet'].get('videoOwnerChannelTitle')}
+                          for item in request['items']]  # Keep necessary data
+
+            if oldest_d is None:
+                p_items += page_items
 
-            elif day_ago is not None:  # In case we want to keep videos published x days ago from your latest_d
-                latest_d = latest_d.replace(minute=0, second=0, microsecond=0)  # Round hour to XX:00:00.0
-                date_delta = latest_d - dt.timedelta(days=day_ago)  # Days subtraction
-                p_items = [item for item in p_items if latest_d > item['release_date'] > date_delta]  # Filtering
+            else:
+                reached = False  # Stop paging as soon as an item older than 'oldest_d' (or the watermark) is met
 
-                if len(p_items) <= 50:  # No need for more requests (the playlist must be ordered chronologically!)
+                for item in page_items:
+                    if watermark is not None and item['video_id'] == watermark['video_id']:
+                        reached = True
+                        break
+
+                    if not item['release_date']:  # Not published yet
+                        continue
+
+                    if item['release_date'] <= oldest_d:
+                        reached = True
+                        break
+
+                    if item['release_date'] < latest_d:
+                        p_items.append(item)
+
+                if reached:
                     break
 
             next_page_token = request.get('nextPageToken')
@@ -268,12 +503,8 @@ def get_playlist_items(service: googleapiclient.discovery, playlist_id: str, day
         except googleapiclient.errors.HttpError as http_error:
             error_reason = http_error.error_details[0]['reason']
 
-            if error_reason == 'quotaExceeded':
-                history.warning('Quota exceeded for YouTube projects.')
-                sys.exit()
-
             if error_reason == 'playlistNotFound':
-                if f'UC{playlist_id[2:]}' not in ADD_ON['playlistNotFoundPass']:
+                if f'UC{playlist_id[2:]}' not in get_context().add_on['playlistNotFoundPass']:
                     history.warning('Playlist not found: %s', playlist_id)
                 break
 
@@ -283,73 +514,176 @@ def get_playlist_items(service: googleapiclient.discovery, playlist_id: str, day
     return p_items
 
 
-def get_videos(service: googleapiclient.discovery, videos_list: list):
+def list_items(service: googleapiclient.discovery, resource: str, ids: list, parts: list):
+    """Get YouTube resources by ID ('videos.list', 'channels.list'), through the run lookup service when enabled
+    :param service: a YouTube service build with 'googleapiclient.discovery'
+    :param resource: resource name ('videos', 'channels')
+    :param ids: list of resource IDs
+    :param parts: resource parts needed
+    :return items: resources found as a list.
+    """
+    if LOOKUP is not None:  # IDs already fetched during the run are not requested again
+        return LOOKUP.get(service, resource, ids, parts=parts)
+
+    items = []
+
+    for i in range(0, len(ids), 50):  # Split task in chunks of size 50
+        items += execute_request(getattr(service, resource)().list(part=parts, id=','.join(ids[i:i + 50]),
+                                                                   maxResults=50)).get('items', [])
+
+    return items
+
+
+def prefetch(resource: str, ids: list):
+    """Announce IDs which will be needed later in the run, so they can fill incomplete batches of the lookup service
+    :param resource: resource name ('videos', 'channels')
+    :param ids: list of resource IDs.
+    """
+    if LOOKUP is not None:
+        LOOKUP.prefetch(resource, ids, optional=True)
+
+
+def get_videos(service: googleapiclient.discovery, videos_list: list, parts: list = None):
     """Get information from YouTube videos
     :param service: a YouTube service build with 'googleapiclient.discovery'
     :param videos_list: list of YouTube video IDs
+    :param parts: video parts needed ('snippet', 'contentDetails' and 'statistics' if None)
     :return: request results.
     """
-    return service.videos().list(part=['snippet', 'contentDetails', 'statistics'],
-                                 id=','.join(videos_list),
-                                 maxResults=50).execute()
+    return {'items': list_items(service, 'videos', list(videos_list),
+                                parts=parts or ['snippet', 'contentDetails', 'statistics'])}
 
 
 def get_subs(service: googleapiclient.discovery, channel_list: list):
-    """Get number of subscribers for several YouTube channels
+    """Get number of subscribers for several YouTube channels, from the channel cache when enabled
     :param service: a YouTube service build with 'googleapiclient.discovery'
     :param channel_list: list of YouTube channel IDs
     :return: playlist items (channels' information) as a list.
     """
-    ch_filter = [channel_id for channel_id in channel_list if channel_id is not None]
+    ch_filter = list(dict.fromkeys(channel_id for channel_id in channel_list if channel_id is not None))
+    subscribers = {}
+
+    if CHANNEL_CACHE is not None:  # Only stale or missing channels are requested
+        subscribers, ch_filter = CHANNEL_CACHE.get_many(ch_filter)
 
     # Split task in chunks of size 50 to request on a maximum of 50 channels at each iteration.
     channels_chunks = [ch_filter[i:i + min(50, len(ch_filter))] for i in range(0, len(ch_filter), 50)]
     raw_chunk = []
 
     for chunk in channels_chunks:
-        req = service.channels().list(part=['statistics'], id=','.join(chunk), maxResults=50).execute()
-        raw_chunk += req.get('items', [])
+        raw_chunk += list_items(service, 'channels', chunk, parts=['statistics'])
 
-    items = [{'channel_id': item['id'],
-              'subscribers': item['statistics'].get('subscriberCount', 0)} for item in raw_chunk]
+    for item in raw_chunk:
+        subscribers[item['id']] = item['statistics'].get('subscriberCount', 0)
+
+        if CHANNEL_CACHE is not None:
+            CHANNEL_CACHE.set(item['id'], subscribers[item['id']])
+
+    items = [{'channel_id': channel_id, 'subscribers': subs} for channel_id, subs in subscribers.items()]
 
     return items
 
 
-def find_livestreams(channel_id: str):
+def create_session(pool_size: int = 10):
+    """Create an HTTP session keeping connections alive, to be shared between threads scraping youtube.com
+    :param pool_size: number of connections kept in the pool (should be at least the number of workers)
+    :return session: a requests.Session object.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def decode_object(page: bytes, obj_start: int, size: int = 4096):
+    """Decode the JSON object starting at a position of a page, without decoding the rest of the page
+    :param page: page content as bytes
+    :param obj_start: position of the object's opening brace
+    :param size: initial window size (bytes), multiplied by 4 until the object is complete
+    :return: decoded object.
+    """
+    decoder = json.JSONDecoder()
+
+    while 1:  # Decode a growing window until the object is complete
+        chunk = page[obj_start:obj_start + size].decode('utf8', errors='ignore')
+
+        try:
+            return decoder.raw_decode(chunk)[0]
+
+        except json.JSONDecodeError:
+            if obj_start + size >= len(page):
+                raise
+            size *= 4
+
+
+def extract_featured_videos(page: bytes):
+    """Extract featured videos (running livestreams) from a YouTube channel page without parsing the whole page: the
+    'ytInitialData' payload is located in raw bytes and only the first section of the first tab is decoded, if the tab
+    contains a 'channelFeaturedContentRenderer' object (featured content is the first item of the first section)
+    :param page: channel page content as bytes
+    :return: list of featured video IDs (empty list if there is no featured content)
+    :raise ValueError: if the page contains no 'ytInitialData' payload with channel sections.
+    """
+    start = page.find(b'var ytInitialData = ')
+
+    if start == -1 or page.find(b'"sectionListRenderer"', start) == -1:
+        raise ValueError('ytInitialData not found')
+
+    browse = page.find(b'"twoColumnBrowseResultsRenderer"', start)
+
+    if browse == -1:
+        return []
+
+    # First tab of 'twoColumnBrowseResultsRenderer', i.e. up to the second tab
+    second_tab = page.find(b'"tabRenderer"', page.find(b'"tabRenderer"', browse) + 1)
+    tab_end = second_tab if second_tab != -1 else len(page)
+    sections = page.find(b'"sectionListRenderer"', browse, tab_end)
+
+    if sections == -1 or page.find(b'"channelFeaturedContentRenderer":', sections, tab_end) == -1:
+        return []
+
+    contents = page.find(b'"contents"', sections, tab_end)
+    first_section = page.find(b'[', contents, tab_end) + 1 if contents != -1 else 0
+
+    if not first_section or page[first_section:first_section + 64].lstrip()[:1] != b'{':  # No section
+        return []
+
+    section = decode_object(page, page.index(b'{', first_section))
+
+    try:
+        item = section['itemSectionRenderer']['contents'][0]
+        return [video['videoRenderer']['videoId'] for video in item['channelFeaturedContentRenderer']['items']]
+
+    except (KeyError, IndexError):  # First item is not featured content
+        return []
+
+
+def find_livestreams(channel_id: str, session: requests.Session = None, limiter: HostRateLimiter = None):
     """Find livestreams on YouTube using a channel ID
     :param channel_id: a YouTube channel ID
+    :param session: HTTP session to reuse connections from (a new connection is opened if None)
+    :param limiter: per-host rate limiter to wait for before sending the request
     :return live_list: list of livestream ID (or empty list if no livestream at the moment).
     """
     try:
         cookies = {'CONSENT': f'YES+cb.20210328-17-p0.en-GB+FX+{random.randint(100, 999)}'}  # Cookies settings
-        url = f'https://www.youtube.com/channel/{channel_id}'
-        web_page = requests.get(url, cookies=cookies, timeout=(5, 5))  # Page request
-        soup = bs4.BeautifulSoup(web_page.text, 'html.parser')  # HTML parsing
+        url = f'{YOUTUBE_URL}/channel/{channel_id}'
 
-        # Filtering JS part only, then convert to string
-        js_scripts = [script for script in soup.find_all('script') if 'sectionListRenderer' in str(script)][0].text
-        sections_as_dict = json.loads(js_scripts.replace('var ytInitialData = ', '')[:-1])  # Parse JS as dictionary
+        if limiter:
+            limiter.acquire(url)
 
-        # Extract content from page tabs
-        tab = sections_as_dict['contents']['twoColumnBrowseResultsRenderer']['tabs'][0]['tabRenderer']['content']
+        with METRICS.timer('youtube.channelPage') if METRICS else contextlib.nullcontext({}) as measure:
+            web_page = (session or requests).get(url, cookies=cookies, timeout=(5, 5))  # Page request
+            measure['size'] = len(web_page.content)
 
-        try:
-            # Extract content from channel page items
-            section = tab['sectionListRenderer']['contents'][0]['itemSectionRenderer']['contents'][0]
-
-            if 'channelFeaturedContentRenderer' in section.keys():  # If at least one livestream is running
-                # Extract each livestream item
-                featured = section['channelFeaturedContentRenderer']['items']
-                # Extract livestream IDs channel_id
-                livestream_ids = [{'channel_id': channel_id, 'video_id': item['videoRenderer']['videoId']}
-                                  for item in featured]
-                return livestream_ids
-
-        except KeyError:  # No content on the channel
-            return []
+        featured = extract_featured_videos(web_page.content)  # Parse 'ytInitialData' featured content only
+        return [{'channel_id': channel_id, 'video_id': video_id} for video_id in featured]
+
+    except KeyError:  # No content on the channel
+        return []
 
-    except IndexError:
+    except ValueError:
         # No content found (due to channel termination by YouTube by mistake, most of the time)
         history.warning('Can not found content for the following channel: %s', channel_id)
         return []
@@ -380,22 +714,18 @@ def check_if_live(service: googleapiclient.discovery, videos_list: list):
                        'live_status': item['snippet']['liveBroadcastContent']} for item in request['items']]
 
         except googleapiclient.errors.HttpError as http_error:
-            error_reason = http_error.error_details[0]['reason']
-
-            if error_reason == 'quotaExceeded':
-                history.warning('Quota exceeded for YouTube projects.')
-                sys.exit()
-
             history.error(http_error.error_details)
             sys.exit()
 
     return items
 
 
-def get_stats(service: googleapiclient.discovery, videos_list: list):
-    """Get duration, views and live status of YouTube video with their ID
+def get_stats(service: googleapiclient.discovery, videos_list: list, fresh: bool = False):
+    """Get duration, views and live status of YouTube video with their ID. When video caches are enabled, immutable
+    fields (duration, channel) are kept permanently and volatile ones (counters, live status) until their TTL expires
     :param service: a YouTube service build with 'googleapiclient.discovery'
     :param videos_list: list of YouTube video IDs
+    :param fresh: to request volatile fields even if they are cached (e.g. before archiving videos)
     :return items: playlist items (videos) as a list.
     """
     items = []
@@ -406,6 +736,22 @@ def get_stats(service: googleapiclient.discovery, videos_list: list):
     except TypeError:
         videos_ids = videos_list
 
+    videos_ids = list(dict.fromkeys(videos_ids))
+
+    if VIDEO_CACHE is not None and VOLATILE_CACHE is not None and not fresh:  # Serve fully cached videos
+        to_request = []
+
+        for video_id in videos_ids:
+            immutable = VIDEO_CACHE.get(video_id)
+            volatile = VOLATILE_CACHE.get(video_id) if immutable is not None else None
+
+            if immutable is None or volatile is None:
+                to_request.append(video_id)
+            else:
+                items.append({'video_id': video_id, **volatile, 'duration': immutable['duration']})
+
+        videos_ids = to_request
+
     # Split task in chunks of size 50 to request on a maximum of 50 videos at each iteration.
     videos_chunks = [videos_ids[i:i + min(50, len(videos_ids))] for i in range(0, len(videos_ids), 50)]
 
@@ -413,222 +759,580 @@ def get_stats(service: googleapiclient.discovery, videos_list: list):
         try:
             request = get_videos(service=service, videos_list=chunk)
 
-            # Keep necessary data
-            items += [{'video_id': item['id'],
-                       'views': item['statistics'].get('viewCount', 0),
-                       'likes': item['statistics'].get('likeCount', 0),
-                       'comments': item['statistics'].get('commentCount', 0),
-                       'duration': isodate.parse_duration(item['contentDetails'].get('duration', 'PT0S')).seconds,
-                       'live_status': item['snippet'].get('liveBroadcastContent')} for item in request['items']]
-
         except googleapiclient.errors.HttpError as http_error:
-            error_reason = http_error.error_details[0]['reason']
-
-            if error_reason == 'quotaExceeded':
-                history.warning('Quota exceeded for YouTube projects.')
-                sys.exit()
-
             history.error(http_error.error_details)
             sys.exit()
 
+        for item in request['items']:  # Keep necessary data
+            immutable = {'duration': isodate.parse_duration(item['contentDetails'].get('duration', 'PT0S')).seconds,
+                         'channel_id': item['snippet'].get('channelId')}
+            volatile = {'views': item['statistics'].get('viewCount', 0),
+                        'likes': item['statistics'].get('likeCount', 0),
+                        'comments': item['statistics'].get('commentCount', 0),
+                        'live_status': item['snippet'].get('liveBroadcastContent')}
+            items.append({'video_id': item['id'], **volatile, 'duration': immutable['duration']})
+
+            if VIDEO_CACHE is not None and volatile['live_status'] == 'none':  # Duration is final once published
+                VIDEO_CACHE.set(item['id'], immutable)
+
+            if VOLATILE_CACHE is not None:
+                VOLATILE_CACHE.set(item['id'], volatile)
+
     return items
 
 
-def iter_livestreams(channel_list: list, prog_bar: bool = True):
+def iter_livestreams(channel_list: list, prog_bar: bool = True, workers: int = 1, rate: float = None,
+                     deadline: float = None):
     """Apply 'find_livestreams' for a collection of YouTube channel
     :param channel_list: list of YouTube channel IDs
     :param prog_bar: to use tqdm progress bar or not
+    :param workers: number of channel pages requested concurrently (1 to request them one after another)
+    :param rate: maximum number of requests per second sent to the same host (no limit if None)
+    :param deadline: maximum duration in seconds of the whole discovery, pending channels are skipped once reached
     :return: IDs of current live based on channels collection.
     """
-    all_channels = channel_list + ADD_ON['certified']
+    all_channels = channel_list + get_context().add_on['certified']
+
+    if workers <= 1 and rate is None and deadline is None:  # Sequential discovery
+        if prog_bar:
+            lives_it = [find_livestreams(chan_id)
+                        for chan_id in tqdm.tqdm(all_channels, desc='Looking for livestreams')]
+        else:
+            lives_it = [find_livestreams(chan_id) for chan_id in all_channels]
+
+        return list(itertools.chain.from_iterable(lives_it))
+
+    limiter = HostRateLimiter(rate=rate, burst=workers) if rate else None
+    lives_it = [[] for _ in all_channels]  # Results kept in the same order as the channel list
+    session = create_session(pool_size=workers)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    futures = {executor.submit(find_livestreams, chan_id, session, limiter): idx
+               for idx, chan_id in enumerate(all_channels)}
 
     if prog_bar:
-        lives_it = [find_livestreams(chan_id) for chan_id in tqdm.tqdm(all_channels, desc='Looking for livestreams')]
-    else:
-        lives_it = [find_livestreams(chan_id) for chan_id in all_channels]
+        progress = tqdm.tqdm(total=len(futures), desc='Looking for livestreams')
+
+    try:
+        for future in concurrent.futures.as_completed(futures, timeout=deadline):
+            try:
+                lives_it[futures[future]] = future.result()
+
+            except requests.exceptions.Timeout:  # A slow channel must not cancel the whole discovery
+                history.warning('Timeout with this channel: %s', all_channels[futures[future]])
+
+            if prog_bar:
+                progress.update()
+
+    except concurrent.futures.TimeoutError:
+        skipped = sum(not future.done() for future in futures)
+        history.warning('Livestreams discovery deadline reached (%ss): %s channel(s) skipped.', deadline, skipped)
+
+    finally:
+        if prog_bar:
+            progress.close()
+
+        executor.shutdown(wait=True, cancel_futures=True)  # Pending channels are dropped, running ones end on timeout
+        session.close()
 
     return list(itertools.chain.from_iterable(lives_it))
 
 
+def get_feed_items(channel_id: str, watermark: dict, feed_cache: FeedCache, latest_d: dt.datetime,
+                   session: requests.Session = None):
+    """Get uploads newer than a watermark from a channel feed (no API quota), with a conditional request. The feed is
+    parsed while it is downloaded, the download stopping at the watermark
+    :param channel_id: a YouTube channel ID
+    :param watermark: newest item already processed ({'video_id': ..., 'published_at': ...})
+    :param feed_cache: feeds conditional GET validators, new ones are staged
+    :param latest_d: the latest reference date, newer uploads being left to the next run
+    :param session: HTTP session to reuse connections from (a new connection is opened if None)
+    :return items: new items (same keys as 'get_playlist_items' ones), None if the feed can not be used (request or
+    parsing failure, or watermark older than every feed entry).
+    """
+    url = f'{YOUTUBE_URL}/feeds/videos.xml?channel_id={channel_id}'
+    items, reached, entries, deferred = [], False, 0, False
+
+    if getattr(WORKER_STATE, 'limiter', None) is not None:
+        WORKER_STATE.limiter.acquire()
+
+    try:
+        with METRICS.timer('youtube.feed') if METRICS else contextlib.nullcontext({'size': 0}) as measure, \
+                (session or requests).get(url, headers=feed_cache.headers(channel_id), timeout=(5, 5),
+                                          stream=True) as response:
+            if response.status_code == 304:  # Feed unchanged since it was last processed
+                feed_cache.count('unchanged')
+                return []
+
+            response.raise_for_status()
+
+            def chunks():
+                """Read the response content by chunks, counting its size."""
+                for chunk in response.iter_content(chunk_size=8192):
+                    measure['size'] += len(chunk)
+                    yield chunk
+
+            for entry in feeds.parse_feed(chunks()):
+                entries += 1
+
+                if entry['video_id'] == watermark['video_id'] or \
+                        (entry['release_date'] and entry['release_date'] <= watermark['published_at']):
+                    reached = True
+                    break
+
+                if entry['release_date'] and entry['release_date'] >= latest_d:  # As 'get_playlist_items' does
+                    deferred = True
+                    continue
+
+                items.append({**entry, 'item_id': None, 'status': 'public'})
+
+    except (requests.exceptions.RequestException, feeds.ElementTree.ParseError):
+        return None
+
+    if not reached and entries >= feeds.FEED_SIZE:  # Older uploads may be missing from the feed
+        return None
+
+    if not deferred:  # Feed downloaded again next run otherwise (deferred uploads would be unchanged)
+        feed_cache.stage(channel_id, etag=response.headers.get('ETag'),
+                         last_modified=response.headers.get('Last-Modified'))
+
+    feed_cache.count('fetched')
+    return items
+
+
+def channel_playlists(channels: list):
+    """Get uploads playlists of a collection of YouTube channels, certified channels included
+    :param channels: list of YouTube channel IDs
+    :return: list of YouTube uploads playlist IDs.
+    """
+    add_on = get_context().add_on
+    all_channels = channels + add_on['certified']
+    return [f'UU{channel_id[2:]}' for channel_id in all_channels if channel_id not in add_on['toPass']]
+
+
+def iter_channel_items(service: googleapiclient.discovery, playlists: list, day_ago: int = None,
+                       with_last_exe: bool = True, latest_d: dt.datetime = None, watermarks: WatermarkStore = None,
+                       workers: int = 1, rate: float = None, limiter: TokenBucket = None,
+                       scheduler: PollScheduler = None, feed_cache: FeedCache = None):
+    """Browse uploads playlists and yield their new items as soon as they are available, in playlists order
+    :param service: a YouTube service build with 'googleapiclient.discovery'
+    :param playlists: list of YouTube uploads playlist IDs
+    :param day_ago: day difference with a reference date, delimits items' collection field
+    :param with_last_exe: to use last execution date extracted from log or not
+    :param latest_d: the latest reference date (run context date by default)
+    :param watermarks: per-playlist watermarks, used instead of the other criteria for playlists having one. New
+    watermarks are staged, the caller saves them once videos have been processed
+    :param workers: number of playlists browsed concurrently, each worker having its own HTTP transport (1 to browse
+    them one after another)
+    :param rate: maximum number of API requests per second, shared by workers (no limit if None)
+    :param limiter: rate limiter shared with other threads, used instead of 'rate'
+    :param scheduler: poll scheduler the playlists have been selected with, poll dates of browsed playlists are staged
+    and saved by the caller with watermarks
+    :param feed_cache: feeds validators, to discover new uploads of playlists having a watermark with channel feeds
+    rather than with the API ('get_playlist_items' being used if a feed fails). New validators are staged and saved
+    by the caller with watermarks
+    :return: generator of playlist items lists, one per playlist.
+    """
+    latest_d = latest_d or get_context().now
+    session = create_session(pool_size=max(workers, 1)) if feed_cache is not None else None
+
+    def browse(playlist_id: str):
+        """Get new items of an uploads playlist and stage its watermark
+        :param playlist_id: a YouTube uploads playlist ID
+        :return items: playlist items.
+        """
+        watermark = watermarks.get(playlist_id) if watermarks is not None else None
+        items = None
+
+        if feed_cache is not None and watermark is not None:
+            items = get_feed_items(f'UC{playlist_id[2:]}', watermark, feed_cache,
+                                   latest_d=latest_d.replace(minute=0, second=0, microsecond=0), session=session)
+
+            if items is None:
+                feed_cache.count('fallbacks')
+
+        if items is None:
+            items = get_playlist_items(service=service, playlist_id=playlist_id, day_ago=day_ago, latest_d=latest_d,
+                                       with_last_exe=with_last_exe, watermark=watermark)
+
+        if watermarks is not None:
+            watermarks.stage(playlist_id, items, processed_until=latest_d.replace(minute=0, second=0, microsecond=0))
+
+        if scheduler is not None:
+            scheduler.stage(playlist_id)
+
+        return items
+
+    if workers <= 1 and rate is None and limiter is None:  # Sequential browsing
+        for playlist_id in playlists:
+            yield browse(playlist_id)
+        return
+
+    if limiter is None and rate:
+        limiter = TokenBucket(rate=rate, burst=workers)
+
+    pending = collections.deque()  # Futures in playlists order, at most '2 * workers' ahead of the consumer
+    playlist_it = iter(playlists)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, initializer=init_worker,
+                                                     initargs=(service, limiter))
+
+    try:
+        for playlist_id in itertools.islice(playlist_it, 2 * workers):
+            pending.append(executor.submit(browse, playlist_id))
+
+        while pending:
+            items = pending.popleft().result()  # Failure of a worker (e.g. quota exceeded) is raised here
+
+            for playlist_id in itertools.islice(playlist_it, 1):
+                pending.append(executor.submit(browse, playlist_id))
+
+            yield items
+
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)  # Pending playlists are dropped if a worker failed
+
+
 def iter_channels(service: googleapiclient.discovery, channels: list, day_ago: int = None, with_last_exe: bool = True,
-                  latest_d: dt.datetime = NOW, prog_bar: bool = True):
+                  latest_d: dt.datetime = None, prog_bar: bool = True, watermarks: WatermarkStore = None,
+                  workers: int = 1, rate: float = None, scheduler: PollScheduler = None,
+                  feed_cache: FeedCache = None):
     """Apply 'get_playlist_items' for a collection of YouTube playlists
     :param channels: list of YouTube channel IDs
     :param service: a YouTube service build with 'googleapiclient.discovery'
     :param day_ago: day difference with a reference date, delimits items' collection field
-    :param latest_d: the latest reference date
+    :param latest_d: the latest reference date (run context date by default)
     :param with_last_exe: to use last execution date extracted from log or not
     :param prog_bar: to use tqdm progress bar or not
+    :param watermarks: per-playlist watermarks (see 'iter_channel_items')
+    :param workers: number of playlists browsed concurrently (1 to browse them one after another)
+    :param rate: maximum number of API requests per second, shared by workers (no limit if None)
+    :param scheduler: poll scheduler selecting the playlists browsed (all playlists if None)
+    :param feed_cache: feeds validators, to discover new uploads with channel feeds (see 'iter_channel_items')
     :return: videos retrieved in playlists.
     """
-    all_channels = channels + ADD_ON['certified']
-    playlists = [f'UU{channel_id[2:]}' for channel_id in all_channels if channel_id not in ADD_ON['toPass']]
+    playlists = channel_playlists(channels)
+
+    if scheduler is not None:
+        playlists = scheduler.select(playlists)
+
+    item_it = iter_channel_items(service, playlists, day_ago=day_ago, with_last_exe=with_last_exe, latest_d=latest_d,
+                                 watermarks=watermarks, workers=workers, rate=rate, scheduler=scheduler,
+                                 feed_cache=feed_cache)
 
     if prog_bar:
-        item_it = [get_playlist_items(service=service, playlist_id=playlist_id, day_ago=day_ago, latest_d=latest_d,
-                                      with_last_exe=with_last_exe)
-                   for playlist_id in tqdm.tqdm(playlists, desc='Looking for videos to add')]
-    else:
-        item_it = [get_playlist_items(service=service, playlist_id=playlist_id, day_ago=day_ago, latest_d=latest_d,
-                                      with_last_exe=with_last_exe) for playlist_id in playlists]
+        item_it = tqdm.tqdm(item_it, total=len(playlists), desc='Looking for videos to add')
+
     return list(itertools.chain.from_iterable(item_it))
 
 
 def update_playlist(service: googleapiclient.discovery, playlist_id: str, videos_to_add: list, is_live: bool = False,
-                    min_duration: int = 10, del_day_ago: int = 7, ref_date: dt.datetime = NOW, prog_bar: bool = True,
-                    log: bool = True):
+                    min_duration: int = 10, del_day_ago: int = 7, ref_date: dt.datetime = None, prog_bar: bool = True,
+                    log: bool = True, in_playlist: list = None):
     """Update a YouTube playlist with temporal criteria
     :param service: a YouTube service build with 'googleapiclient.discovery'
     :param playlist_id: a YouTube playlist ID
     :param videos_to_add: list of YouTube video IDs to potentially add to a specified playlist
     :param is_live: to update a list containing specifically livestreams only (or not)
-    :param del_day_ago: day difference with NOW, to keep in playlist video published in the last 'del_day_ago' days
-    :param ref_date: reference date (NOW by default)
+    :param del_day_ago: day difference with 'ref_date', to keep videos published in the last 'del_day_ago' days
+    :param ref_date: reference date (run context date by default)
     :param min_duration: minimal video duration filter
     :param prog_bar: to use tqdm progress bar or not
-    :param log: to apply logging or not.
+    :param log: to apply logging or not
+    :param in_playlist: items already in the playlist, if retrieved by the caller ('get_playlist_items' output)
+    :return: update plan (playlist_diff.Plan).
     """
 
-    def add_and_remove(_service, _playlist_id, _to_add_df, _to_delete_df, _is_live: bool, _log: bool = True):
+    def add_and_remove(_service, _playlist_id, _to_add, _to_delete, _is_live: bool, _log: bool = True):
         """Perform a playlist update, avoid code duplication
         :param _service: a YouTube service build with 'googleapiclient.discovery'
         :param _playlist_id: a YouTube playlist ID
-        :param _to_add_df: pd.DataFrame of videos to add to the playlist
-        :param _to_delete_df: pd.DataFrame of videos to remove from the playlist
+        :param _to_add: list of video IDs to add to the playlist
+        :param _to_delete: list of playlist_diff.PlaylistItem to remove from the playlist
         :param _is_live: specify if the updated playlist contains specifically livestreams only (or not)
-        :param _log: to apply logging or not.
+        :param _log: to apply logging or not
+        :return _added: list of video IDs added (failed insertions excluded).
         """
-        _type = 'video'
+        _type, _added = 'video', []
 
         if _is_live:
             _type = 'livestream'
 
-        if not _to_add_df.empty:  # If there are videos to add
-            add_to_playlist(service=_service, playlist_id=_playlist_id, videos_list=_to_add_df.video_id,
-                            prog_bar=prog_bar)
+        if _to_add:  # If there are videos to add
+            _added = add_to_playlist(service=_service, playlist_id=_playlist_id, videos_list=_to_add,
+                                     prog_bar=prog_bar)
             if _log:
-                history.info('%s new %s(s) added.', _to_add_df.shape[0], _type)
+                history.info('%s new %s(s) added.', len(_added), _type)
 
-        if not _to_delete_df.empty:  # If there are videos to delete
-            item_list = [{'item_id': it_id, 'video_id': vid_id}
-                         for it_id, vid_id in zip(_to_delete_df.item_id.tolist(), _to_delete_df.video_id.tolist())]
+        if _to_delete:  # If there are videos to delete
+            item_list = [{'item_id': item.item_id, 'video_id': item.video_id} for item in _to_delete]
 
             del_from_playlist(service=_service, playlist_id=_playlist_id, items_list=item_list,
                               prog_bar=prog_bar)
             if _log:
-                history.info('%s %s(s) removed.', _to_delete_df.shape[0], _type)
+                history.info('%s %s(s) removed.', len(_to_delete), _type)
 
-        if _to_add_df.empty and _to_delete_df.empty and _log:
+        if not _to_add and not _to_delete and _log:
             history.info('No %s added or removed.', _type)
 
-    # Pass playlist as pandas Dataframes (for easier filtering)
-    in_playlist = pd.DataFrame(get_playlist_items(service=service, playlist_id=playlist_id))  # Get videos already in
-    to_del = pd.DataFrame()  # In case there is no video to remove from the playlist
+        return _added
 
-    if not in_playlist.empty:  # If there is at least one video in the playlist
+    if in_playlist is None:  # Get videos already in
+        in_playlist = get_playlist_items(service=service, playlist_id=playlist_id)
+
+    in_playlist = playlist_diff.to_items(in_playlist)
+    to_del = []  # In case there is no video to remove from the playlist
+
+    if not is_live:  # Videos already in the playlist or already evaluated are not enriched again
+        in_ids = {item.video_id for item in in_playlist}
+        videos_to_add = unseen_videos([video for video in videos_to_add if video['video_id'] not in in_ids])
+
+    if in_playlist:  # If there is at least one video in the playlist
         if is_live:  # If the update is done on a YouTube livestreams playlist
-            live_status = pd.DataFrame(check_if_live(service=service, videos_list=in_playlist.video_id))  # Get status
-            in_playlist = in_playlist.merge(live_status, how='outer')
+            prefetch('videos', [video['video_id'] for video in videos_to_add])  # New livestreams are sorted later
+            live_status = {item['video_id']: item['live_status']  # Get status
+                           for item in check_if_live(service=service, videos_list=[it.video_id for it in in_playlist])}
+            to_del = playlist_diff.ended_livestreams(in_playlist, live_status)  # Keep active and public livestreams
 
-            # Delete condition
-            del_cond = (in_playlist.status.isin({'private', 'privacyStatusUnspecified'})) | \
-                       (in_playlist.live_status != 'live')
+        else:
+            date_delta = (ref_date or get_context().now) - dt.timedelta(days=del_day_ago)  # Days subtraction
+            to_del = playlist_diff.expired_items(in_playlist, date_delta)  # Keep public and newest videos.
+            to_del_filter = [item for item in to_del if item.channel_id is not None]
 
-            to_del = in_playlist.loc[del_cond]  # Keep active and public livestreams
+            if to_del_filter:  # Save deleted videos in history, with up-to-date stats
+                prefetch('videos', [video['video_id'] for video in videos_to_add])  # Requested just below
+                video_stats = {item['video_id']: item for item in get_stats(
+                    service=service, videos_list=[item.video_id for item in to_del_filter], fresh=True)}
+                channel_stats = {item['channel_id']: item['subscribers'] for item in get_subs(
+                    service=service, channel_list=[str(item.channel_id) for item in to_del_filter])}
 
-        else:  # Get videos stats
-            video_stats = pd.DataFrame(get_stats(service=service, videos_list=in_playlist.video_id))
-            channel_stats = pd.DataFrame(get_subs(
-                service=service,  # Filter empty values + ensure string format
-                channel_list=in_playlist.channel_id.dropna().astype(str).tolist())
-            )
-            in_playlist = in_playlist \
-                .merge(channel_stats, how='outer') \
-                .merge(video_stats, how='outer') \
-                .drop_duplicates()
+                records = playlist_diff.history_records(to_del_filter, channel_stats, video_stats)
+                written = history_store.append(records, history_dir=get_context().path('data', 'history'))
 
-            date_delta = ref_date - dt.timedelta(days=del_day_ago)  # Days subtraction
-            del_cond = (in_playlist.status == 'private') | (in_playlist.release_date < date_delta)  # Delete condition
-            to_del = in_playlist.loc[del_cond]  # Keep public and newest videos.
+                if RELEASE_HISTOGRAM is not None:
+                    RELEASE_HISTOGRAM.add(written)
 
-            if not to_del.empty:  # Save deleted videos as CSV
-                to_del_filter = to_del.loc[to_del.channel_id.notna()]
-                mix_history = pd.read_csv('../data/mix_history.csv', encoding='utf8', low_memory=False)
-                mix_history = pd.concat([mix_history, to_del_filter], ignore_index=True)
-                mix_history.to_csv('../data/mix_history.csv', encoding='utf8', index=False)
+                if SEEN_INDEX is not None:
+                    SEEN_INDEX.add([record['video_id'] for record in written], 'archived')
 
-    to_add = pd.DataFrame(videos_to_add)
+    add_stats = None  # Livestreams are not filtered on their stats
 
-    if not to_add.empty:  # Check if there are videos to add
-        if not is_live:  # If the update is done on a YouTube livestreams playlist
-            add_stats = pd.DataFrame(get_stats(service=service, videos_list=videos_to_add))  # Get stats of new videos
-            to_add = to_add.merge(add_stats)
-            # Keep videos with duration above `min_duration` minutes and don't keep "Premiere" type videos
-            to_add = to_add.loc[(to_add.duration >= min_duration * 60) & (to_add.live_status != 'upcoming')]
+    if videos_to_add and not is_live:  # Get stats of new videos
+        add_stats = {item['video_id']: item for item in get_stats(service=service, videos_list=videos_to_add)}
 
-        to_add = to_add.loc[~to_add.video_id.isin(in_playlist.video_id)]  # Keep videos not already in playlist
+    # Keep videos with duration above `min_duration` minutes, no "Premiere" type videos and not already in playlist
+    to_add = playlist_diff.new_videos(videos_to_add, in_playlist, stats=add_stats, min_duration=min_duration)
 
-    add_and_remove(_service=service, _playlist_id=playlist_id, _to_add_df=to_add, _to_delete_df=to_del, _log=log,
-                   _is_live=is_live)
+    added = add_and_remove(_service=service, _playlist_id=playlist_id, _to_add=to_add, _to_delete=to_del, _log=log,
+                           _is_live=is_live)
 
+    if add_stats is not None:  # Only inserted videos are marked as added, failed ones are evaluated again next run
+        mark_seen(added, add_stats, min_duration)
 
-def add_to_playlist(service: googleapiclient.discovery, playlist_id: str, videos_list: list, prog_bar: bool = True):
-    """Add a list of video to a YouTube playlist
+    return playlist_diff.Plan(to_add=to_add, to_del=to_del)
+
+
+def unseen_videos(videos_list: list):
+    """Drop videos already evaluated (added, rejected or archived) according to the seen-video index
+    :param videos_list: list of dictionaries with (at least) a 'video_id' key
+    :return: list of dictionaries, videos never evaluated only.
+    """
+    if SEEN_INDEX is None:
+        return videos_list
+
+    return [video for video in videos_list if video['video_id'] not in SEEN_INDEX]
+
+
+def mark_seen(added: list, stats: dict, min_duration: int):
+    """Record evaluated videos in the seen-video index: added ones and ones rejected for their duration (others, like
+    premieres or videos not found, may be accepted later)
+    :param added: list of video IDs added
+    :param stats: {video ID: 'get_stats' item} of evaluated videos
+    :param min_duration: minimal video duration (minutes).
+    """
+    if SEEN_INDEX is not None:
+        SEEN_INDEX.add(added, 'added')
+        SEEN_INDEX.add(playlist_diff.short_videos(stats, min_duration), 'short')
+
+
+def send_batch(service: googleapiclient.discovery, requests_list: list):
+    """Send requests in a single batch request, whole batch failures being retried according to the retry policy if
+    every request is idempotent (raised otherwise)
     :param service: a YouTube service build with 'googleapiclient.discovery'
-    :param playlist_id: a YouTube playlist ID
-    :param videos_list: list of YouTube video IDs
-    :param prog_bar: to use tqdm progress bar or not.
+    :param requests_list: list of (label, request) tuples (at most 'BATCH_SIZE')
+    :return failures: list of ((label, request), googleapiclient.errors.HttpError) of failed requests.
     """
-    if prog_bar:
-        add_iterator = tqdm.tqdm(videos_list, desc=f'Adding videos to the playlist ({playlist_id})')
 
-    else:
-        add_iterator = videos_list
+    def send():
+        """Build and execute the batch request (a batch request object can not be executed twice)
+        :return: failures.
+        """
+        failures = []
 
-    for video_id in add_iterator:
-        r_body = {'snippet': {'playlistId': playlist_id, 'resourceId': {'kind': 'youtube#video', 'videoId': video_id}}}
-        request = service.playlistItems().insert(part='snippet', body=r_body)
+        def callback(request_id, _response, exception):
+            """Collect errors of batched requests
+            :param request_id: batched request ID (index in list)
+            :param _response: batched request response
+            :param exception: googleapiclient.errors.HttpError object, None if request succeeded.
+            """
+            if exception is not None:
+                failures.append((requests_list[int(request_id)], exception))
 
-        try:
-            request.execute()
+        batch = service.new_batch_http_request(callback=callback)
 
-        except googleapiclient.errors.HttpError as http_error:  # skipcq: PYL-W0703
-            error_reason = http_error.error_details[0]['reason']
+        for idx, (_, request) in enumerate(requests_list):
+            batch.add(request, request_id=str(idx))
 
-            if error_reason == 'quotaExceeded':
-                history.warning('Quota exceeded for YouTube projects.')
-                sys.exit()
+        batch.execute(http=getattr(WORKER_STATE, 'http', None))  # Worker's transport in worker threads
+        errors = {id(labelled_request): error for labelled_request, error in failures}
 
-            history.warning('(%s) - %s', video_id, http_error.error_details)
+        for labelled_request in requests_list:  # Sub-requests are charged one by one, once the batch is processed
+            charge_quota(labelled_request[1].methodId, error=errors.get(id(labelled_request)))
 
+        return failures
 
-def del_from_playlist(service: googleapiclient.discovery, playlist_id: str, items_list: list, prog_bar: bool = True):
-    """Delete a list of video from a YouTube playlist
+    timer = METRICS.timer(requests_list[0][1].methodId, count=len(requests_list),
+                          units=sum(quota.COSTS.get(request.methodId, 0) for _, request in requests_list)) \
+        if METRICS else contextlib.nullcontext({'retries': 0})
+
+    idempotent = all(request.methodId not in NON_IDEMPOTENT_METHODS for _, request in requests_list)
+
+    with timer as measure:
+        failures = transport.execute(send, policy=RETRY_POLICY if idempotent else None,
+                                     on_retry=lambda _error, _delay: measure.update(retries=measure['retries'] + 1))
+        measure['errors'] = len(failures)
+
+    return failures
+
+
+def execute_batch(service: googleapiclient.discovery, requests_list: list, desc: str, ordered: bool = False,
+                  prog_bar: bool = True, reconcile=None):
+    """Execute write requests grouped in batch requests (one HTTPS round trip per 50 requests), failed requests being
+    sent again in a new batch request if their failure is transient (see 'transport.RetryPolicy'). A failed
+    non-idempotent request may have been processed anyway: it is only sent again once checked with 'reconcile'
     :param service: a YouTube service build with 'googleapiclient.discovery'
-    :param playlist_id: a YouTube playlist ID
-    :param items_list: list of YouTube playlist items [{"item_id": ..., "video_id": ...}]
-    :param prog_bar: to use tqdm progress bar or not.
+    :param requests_list: list of (label, request) tuples, label (a video ID) being used for logging
+    :param desc: progress bar description
+    :param ordered: to execute requests one after another, in list order (batched requests order is not guaranteed)
+    :param prog_bar: to use tqdm progress bar or not
+    :param reconcile: function of the (label, request) tuples to send again, returning those which did not take effect
+    (non-idempotent requests are not sent again if None)
+    :return failed: list of labels of failed requests (quota errors being raised as 'transport.QuotaExceededError').
     """
+
+    def send_chunk(pending: list):
+        """Send requests of a chunk, in a batch request or one by one if ordered
+        :param pending: list of (label, request) tuples
+        :return: list of ((label, request), error) of failed requests.
+        """
+        try:
+            if not ordered:
+                return send_batch(service, pending)
+
+            execute_request(pending[0][1])
+            return []
+
+        except Exception as error:  # skipcq: PYL-W0703 - Raised again unless it is a failure of the chunk requests
+            if isinstance(error, transport.QuotaExceededError):
+                raise
+
+            if ordered and isinstance(error, googleapiclient.errors.HttpError):  # Failure of the single request
+                return [(pending[0], error)]
+
+            if transport.is_transient(error) and any(request.methodId in NON_IDEMPOTENT_METHODS
+                                                     for _, request in pending):  # Not retried by 'send_batch'
+                return [(labelled_request, error) for labelled_request in pending]
+
+            raise
+
+    batch_size = 1 if ordered else BATCH_SIZE
+    failed = []
+    chunks = [requests_list[i:i + batch_size] for i in range(0, len(requests_list), batch_size)]
+
     if prog_bar:
-        del_iterator = tqdm.tqdm(items_list, desc=f'Deleting videos from the playlist ({playlist_id})')
+        progress = tqdm.tqdm(total=len(requests_list), desc=desc)
 
-    else:
-        del_iterator = items_list
+    for chunk in chunks:
+        errors = []
+        pending, attempt = chunk, 0
 
-    for item in del_iterator:
-        request = service.playlistItems().delete(id=item['item_id'])
+        while pending:
+            attempt += 1
+            to_retry, delays = [], []
 
-        try:
-            request.execute()
+            for labelled_request, error in send_chunk(pending):
+                transport.check_quota(error)
+                if labelled_request[1].methodId in NON_IDEMPOTENT_METHODS:
+                    retried = reconcile is not None  # Only sent again once checked
+                else:
+                    retried = not ordered  # Requests sent one by one are already retried by 'execute_request'
 
-        except googleapiclient.errors.HttpError as http_error:  # skipcq: PYL-W0703
-            error_reason = http_error.error_details[0]['reason']
+                delay = RETRY_POLICY.backoff(error, attempt) if retried and RETRY_POLICY is not None else None
 
-            if error_reason == 'quotaExceeded':
-                history.warning('Quota exceeded for YouTube projects.')
-                sys.exit()
+                if delay is None:
+                    errors.append((labelled_request[0], error))
+                else:
+                    to_retry.append(labelled_request)
+                    delays.append(delay)
+
+            if to_retry:
+                time.sleep(max(delays))
+
+                if any(request.methodId in NON_IDEMPOTENT_METHODS for _, request in to_retry):
+                    to_retry = reconcile(to_retry)  # Requests processed despite their failure are not sent again
 
-            history.warning('(%s) - %s', item['video_id'], http_error.error_details)
+            pending = to_retry
+
+        for label, error in errors:
+            history.warning('(%s) - %s', label, getattr(error, 'error_details', None) or error)
+            failed.append(label)
+
+        if prog_bar:
+            progress.update(len(chunk))
+
+    if prog_bar:
+        progress.close()
+
+    return failed
+
+
+def add_to_playlist(service: googleapiclient.discovery, playlist_id: str, videos_list: list, prog_bar: bool = True,
+                    ordered: bool = False):
+    """Add a list of video to a YouTube playlist
+    :param service: a YouTube service build with 'googleapiclient.discovery'
+    :param playlist_id: a YouTube playlist ID
+    :param videos_list: list of YouTube video IDs
+    :param prog_bar: to use tqdm progress bar or not
+    :param ordered: to add videos one after another, keeping list order at the end of the playlist
+    :return: list of video IDs added (failed insertions excluded).
+    """
+    requests_list = []
+
+    def not_added(to_retry: list):
+        """Keep insertions of videos which are not in the playlist yet (a failed insertion may have been processed)
+        :param to_retry: list of (video ID, request) tuples of failed insertions
+        :return: insertions to send again.
+        """
+        in_playlist = {item['video_id'] for item in get_playlist_items(service=service, playlist_id=playlist_id)}
+        return [(video_id, request) for video_id, request in to_retry if video_id not in in_playlist]
+
+    for video_id in videos_list:
+        r_body = {'snippet': {'playlistId': playlist_id, 'resourceId': {'kind': 'youtube#video', 'videoId': video_id}}}
+        requests_list.append((video_id, service.playlistItems().insert(part='snippet', body=r_body)))
+
+    failed = set(execute_batch(service=service, requests_list=requests_list, ordered=ordered, prog_bar=prog_bar,
+                               desc=f'Adding videos to the playlist ({playlist_id})', reconcile=not_added))
+    return [video_id for video_id in videos_list if video_id not in failed]
+
+
+def del_from_playlist(service: googleapiclient.discovery, playlist_id: str, items_list: list, prog_bar: bool = True):
+    """Delete a list of video from a YouTube playlist
+    :param service: a YouTube service build with 'googleapiclient.discovery'
+    :param playlist_id: a YouTube playlist ID
+    :param items_list: list of YouTube playlist items [{"item_id": ..., "video_id": ...}]
+    :param prog_bar: to use tqdm progress bar or not.
+    """
+    requests_list = [(item['video_id'], service.playlistItems().delete(id=item['item_id'])) for item in items_list]
+    execute_batch(service=service, requests_list=requests_list, prog_bar=prog_bar,
+                  desc=f'Deleting videos from the playlist ({playlist_id})')
 
 
 def sort_livestreams(service: googleapiclient.discovery, playlist_id: str, prog_bar: bool = True):
@@ -637,64 +1341,44 @@ def sort_livestreams(service: googleapiclient.discovery, playlist_id: str, prog_
     :param playlist_id: a YouTube playlist ID
     :param prog_bar: to use tqdm progress bar or not.
     """
-    livestreams = get_playlist_items(service=service, playlist_id=playlist_id)  # Retrieve livestreams
-    livestreams_df = pd.DataFrame(livestreams).loc[:, ['video_id', 'item_id']]
-    livestreams_df['position'] = livestreams_df.index
+    livestreams = playlist_diff.to_items(get_playlist_items(service=service, playlist_id=playlist_id))  # Livestreams
     req = {}
 
-    try:
-        req = service.videos().list(part=['statistics', 'liveStreamingDetails'],  # Then statistics
-                                    id=','.join(livestreams_df.video_id.tolist()),
-                                    maxResults=50).execute()
+    try:  # Then statistics, requested by chunks of 50 videos
+        req = get_videos(service=service, videos_list=[item.video_id for item in livestreams],
+                         parts=['statistics', 'liveStreamingDetails'])
 
     except googleapiclient.errors.HttpError as http_error:  # skipcq: PYL-W0703
-        error_reason = http_error.error_details[0]['reason']
-
-        if error_reason == 'quotaExceeded':
-            history.warning('Quota exceeded for YouTube projects.')
-            sys.exit()
-
         history.warning('%s', http_error.error_details)
 
-    stats = [{'video_id': item['id'],
-              'start_time': item['liveStreamingDetails'].get('actualStartTime'),
-              'viewers': int(item['liveStreamingDetails'].get('concurrentViewers', 0)),
-              'total_view': int(item['statistics'].get('viewCount', 0))} for item in req.get('items', [])]
+    stats = {item['id']: (int(item['liveStreamingDetails'].get('concurrentViewers', 0)),
+                          int(item['statistics'].get('viewCount', 0)),
+                          item['liveStreamingDetails'].get('actualStartTime') or '')
+             for item in req.get('items', []) if 'liveStreamingDetails' in item}
 
-    stats_df = pd.DataFrame(stats).sort_values(['viewers', 'total_view', 'start_time'],
-                                               ascending=False, axis=0, ignore_index=True)
-    stats_df['new_position'] = stats_df.index
-
-    # Merge then sort by concurrent viewers
-    df_ordered = livestreams_df.merge(stats_df)
-    df_ordered = df_ordered.loc[df_ordered['new_position'] != df_ordered['position']]. \
-        sort_values('new_position', ascending=True, axis=0, ignore_index=True)
-
-    to_change = df_ordered.to_dict('records')
+    # Sort by concurrent viewers, then total views and start time (livestreams without stats are kept at the end)
+    ranked = sorted((item for item in livestreams if item.video_id in stats), key=lambda it: stats[it.video_id],
+                    reverse=True)
+    target = [item.item_id for item in ranked] + [item.item_id for item in livestreams if item.video_id not in stats]
+    moves = playlist_diff.reorder_moves([item.item_id for item in livestreams], target)  # Minimal set of moves
+    video_ids = {item.item_id: item.video_id for item in livestreams}
+    to_change = [{'item_id': item_id, 'video_id': video_ids[item_id], 'new_position': position}
+                 for item_id, position in moves]
 
     if to_change:  # If an update is needed, change position in the playlist
-        if prog_bar:
-            change_iterator = tqdm.tqdm(to_change, desc=f'Moving livestreams in the playlist ({playlist_id})')
-
-        else:
-            change_iterator = to_change
+        requests_list = []
 
-        for change in change_iterator:
+        for change in to_change:
             r_body = {'id': change['item_id'],
                       'snippet': {'playlistId': playlist_id,
                                   'resourceId': {'kind': 'youtube#video', 'videoId': change['video_id']},
                                   'position': change['new_position']}}
-            try:
-                service.playlistItems().update(part=['snippet', 'id'], body=r_body).execute()
-
-            except googleapiclient.errors.HttpError as http_error:  # skipcq: PYL-W0703
-                error_reason = http_error.error_details[0]['reason']
+            requests_list.append((change['video_id'], service.playlistItems().update(part=['snippet', 'id'],
+                                                                                     body=r_body)))
 
-                if error_reason == 'quotaExceeded':
-                    history.warning('Quota exceeded for YouTube projects.')
-                    sys.exit()
-
-                history.warning('(%s) - %s', change['video_id'], http_error.error_details)
+        # Moves are applied in order: each target position depends on the previous moves
+        execute_batch(service=service, requests_list=requests_list, ordered=True, prog_bar=prog_bar,
+                      desc=f'Moving livestreams in the playlist ({playlist_id})')
 
         history.info('Livestreams playlist sorted.')
 
@@ -718,7 +1402,8 @@ def sort_db(service):
         for chunk in channels_chunks:
             try:
                 # Request channels
-                request = _service.channels().list(part=['snippet'], id=','.join(chunk), maxResults=50).execute()
+                request = execute_request(_service.channels().list(part=['snippet'], id=','.join(chunk),
+                                                                   maxResults=50))
 
                 # Extract upload playlists, channel names and their ID.
                 information += [{'title': an_item['snippet']['title'], 'id': an_item['id']} for an_item in
@@ -734,7 +1419,9 @@ def sort_db(service):
 
         return ids_only
 
-    with open('../data/pocket_tube.json', mode='r', encoding='utf-8') as pt_file:  # Open PocketTube JSON file
+    pt_path = get_context().path('data', 'pocket_tube.json')
+
+    with open(pt_path, mode='r', encoding='utf-8') as pt_file:  # Open PocketTube JSON file
         channels_db = json.load(pt_file)
 
     categories = [db_keys for db_keys in channels_db.keys() if 'ysc' not in db_keys]  # Get PT categories
@@ -744,6 +1431,6 @@ def sort_db(service):
     for category in categories:  # Rewrite categories in the dict object associated to the PT JSON file
         channels_db[category] = db_sorted[category]
 
-    with open('../data/pocket_tube.json', 'w', encoding='utf-8') as pt_save:  # Export as JSON file
+    with open(pt_path, 'w', encoding='utf-8') as pt_save:  # Export as JSON file
         # noinspection PyTypeChecker
         json.dump(channels_db, pt_save, indent=2, ensure_ascii=False)